@@ -0,0 +1,53 @@
+import asyncio
+import micropython
+import time
+from machine import Pin
+
+class Button:
+    # 按键：中断里只做消抖和记录时刻，处理函数经micropython.schedule推迟到主程序上下文执行，
+    # 再通过ThreadSafeFlag唤醒等待中的空闲循环，空闲时不再轮询
+    def __init__(self, pin, handler=None, debounce_ms=200, trigger=Pin.IRQ_RISING):
+        self.pin = pin
+        self.handler = handler
+        self.debounce_ms = debounce_ms
+        self.last_ms = time.ticks_add(time.ticks_ms(), -debounce_ms)
+        self.pressed_us = 0         # 最近一次有效按键的时刻
+        self.flag = asyncio.ThreadSafeFlag()
+        self.presses = 0
+        self.bounces = 0
+        self.dropped = 0            # schedule队列已满而丢弃的按键
+        # 预先绑定，中断里不分配内存
+        self.dispatch_cb = self.dispatch
+        pin.irq(trigger=trigger, handler=self.irq)
+
+    def irq(self, pin):
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.last_ms) < self.debounce_ms:
+            self.bounces += 1
+            return
+        self.last_ms = now
+        self.pressed_us = time.ticks_us()
+        try:
+            micropython.schedule(self.dispatch_cb, None)
+        except RuntimeError:
+            self.dropped += 1
+
+    def dispatch(self, _):
+        self.presses += 1
+        if self.handler:
+            self.handler(self)
+        self.flag.set()
+
+    async def await_press(self, timeout_ms):
+        try:
+            await asyncio.wait_for_ms(self.flag.wait(), timeout_ms)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def wait(self, timeout_ms):
+        # 阻塞直到按键或超时，按键后立即返回
+        return asyncio.run(self.await_press(timeout_ms))
+
+    def stats(self):
+        return {'presses': self.presses, 'bounces': self.bounces, 'dropped': self.dropped}
@@ -0,0 +1,225 @@
+import binascii
+import hashlib
+import os
+import struct
+from collections import OrderedDict
+
+CLIP_MAGIC = b'clp1'
+CLIP_HEADER_FORMAT = '<4sI'
+CLIP_HEADER_SIZE = 8
+KEY_SIZE = 8
+
+def clip_key(pcm):
+    # 内容寻址：key为PCM数据sha256的前8字节，服务端用同样的方法计算
+    return hashlib.sha256(pcm).digest()[:KEY_SIZE]
+
+class ClipCache:
+    # 常用回复（问候、告别、错误提示）的PCM缓存在flash上，按字节预算做LRU淘汰
+    # 文件头记录数据长度，每次开机后首次使用时重新计算sha256与key比对，不一致的文件直接删除
+    # 使用顺序保存在index文件里，由sync()在空闲时写回，播放命中时不写flash
+    def __init__(self, root='clips', budget=262144, chunk=4096):
+        self.root = root
+        self.budget = budget
+        self.buf = bytearray(chunk)
+        self.mv = memoryview(self.buf)
+        self.header = bytearray(CLIP_HEADER_SIZE)
+        self.entries = OrderedDict()    # key -> 文件大小，最久未使用的在前
+        self.verified = set()
+        self.used = 0
+        self.dirty = False
+
+        self.file = None                # 正在写入的缓存文件
+        self.key = None
+        self.hash = None
+        self.written = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evictions = 0
+        self.corrupt = 0
+        self.rejected = 0               # 超出预算或内容与key不符，未保存
+        self.load()
+
+    def path(self, key):
+        return f"{self.root}/{binascii.hexlify(key).decode()}.pcm"
+
+    def temp_path(self):
+        return f"{self.root}/clip.tmp"
+
+    def index_path(self):
+        return f"{self.root}/index"
+
+    def load(self):
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            os.mkdir(self.root)
+            return
+        sizes = {}
+        for name in names:
+            if name.endswith('.pcm'):
+                sizes[name[:-4]] = os.stat(f"{self.root}/{name}")[6]
+            elif name != 'index':
+                os.remove(f"{self.root}/{name}")
+        try:
+            with open(self.index_path()) as f:
+                for line in f:
+                    name = line.strip()
+                    if name in sizes:
+                        self.entries[binascii.unhexlify(name)] = sizes.pop(name)
+        except OSError:
+            pass
+        # 不在index里的文件视为最久未使用
+        for name, size in sizes.items():
+            entries = OrderedDict()
+            entries[binascii.unhexlify(name)] = size
+            entries.update(self.entries)
+            self.entries = entries
+        for size in self.entries.values():
+            self.used += size
+        self.evict(0)
+
+    def sync(self):
+        if not self.dirty:
+            return
+        tmp = self.index_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            for key in self.entries:
+                f.write(binascii.hexlify(key).decode())
+                f.write('\n')
+        os.rename(tmp, self.index_path())
+        self.dirty = False
+
+    def remove(self, key):
+        size = self.entries.pop(key, None)
+        if size is None:
+            return
+        self.used -= size
+        self.verified.discard(key)
+        self.dirty = True
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def evict(self, size):
+        while self.entries and self.used + size > self.budget:
+            self.remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def verify(self, key):
+        h = hashlib.sha256()
+        try:
+            with open(self.path(key), 'rb') as f:
+                f.readinto(self.header)
+                magic, length = struct.unpack(CLIP_HEADER_FORMAT, self.header)
+                if magic != CLIP_MAGIC or length + CLIP_HEADER_SIZE != self.entries[key]:
+                    return False
+                while True:
+                    n = f.readinto(self.buf)
+                    if not n:
+                        break
+                    h.update(self.mv[:n])
+                    length -= n
+        except OSError:
+            return False
+        return length == 0 and h.digest()[:KEY_SIZE] == key
+
+    def lookup(self, key):
+        # 命中且内容完好时返回True，之后用play()读出
+        if key not in self.entries:
+            self.misses += 1
+            return False
+        if key not in self.verified:
+            if not self.verify(key):
+                self.corrupt += 1
+                self.misses += 1
+                self.remove(key)
+                return False
+            self.verified.add(key)
+        self.hits += 1
+        return True
+
+    def play(self, key):
+        # 逐段返回缓存的PCM，切片在下一次迭代前有效
+        self.entries[key] = self.entries.pop(key)
+        self.dirty = True
+        with open(self.path(key), 'rb') as f:
+            f.seek(CLIP_HEADER_SIZE)
+            while True:
+                n = f.readinto(self.buf)
+                if not n:
+                    break
+                yield self.mv[:n]
+
+    def begin(self, key):
+        # 缓存未命中：开始保存服务端接着发来的音频
+        self.abort()
+        if len(key) != KEY_SIZE:
+            return
+        self.file = open(self.temp_path(), 'wb')
+        self.file.write(self.header)
+        self.key = bytes(key)
+        self.hash = hashlib.sha256()
+        self.written = 0
+
+    def storing(self):
+        return self.file is not None
+
+    def write(self, data):
+        if self.file is None:
+            return
+        if self.written + len(data) + CLIP_HEADER_SIZE > self.budget:
+            self.rejected += 1
+            self.abort()
+            return
+        self.file.write(data)
+        self.hash.update(data)
+        self.written += len(data)
+
+    def commit(self):
+        if self.file is None:
+            return False
+        key = self.key
+        if self.hash.digest()[:KEY_SIZE] != key:
+            self.rejected += 1
+            self.abort()
+            return False
+        struct.pack_into(CLIP_HEADER_FORMAT, self.header, 0, CLIP_MAGIC, self.written)
+        self.file.seek(0)
+        self.file.write(self.header)
+        self.file.close()
+        self.file = None
+        size = self.written + CLIP_HEADER_SIZE
+        self.remove(key)
+        self.evict(size)
+        os.rename(self.temp_path(), self.path(key))
+        self.entries[key] = size
+        self.used += size
+        self.verified.add(key)
+        self.stored += 1
+        self.dirty = True
+        return True
+
+    def abort(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        try:
+            os.remove(self.temp_path())
+        except OSError:
+            pass
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stored': self.stored,
+            'evictions': self.evictions,
+            'corrupt': self.corrupt,
+            'rejected': self.rejected,
+            'clips': len(self.entries),
+            'bytes': self.used,
+        }
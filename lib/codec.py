@@ -0,0 +1,251 @@
+from array import array
+
+try:
+    import micropython
+except ImportError:
+    # PC上运行基准测试或后台解码时没有micropython模块
+    class micropython:
+        @staticmethod
+        def native(f):
+            return f
+
+# IMA-ADPCM：每个采样4位，4:1压缩
+# 每帧以4字节块头开始：预测值(int16 LE)、步长索引、保留字节，解码端可在任意帧重新同步
+ADPCM_HEADER_SIZE = 4
+
+STEP_TABLE = array('h', [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31,
+    34, 37, 41, 45, 50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143,
+    157, 173, 190, 209, 230, 253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658,
+    724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024,
+    3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899,
+    15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767,
+])
+INDEX_TABLE = array('b', [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8])
+
+@micropython.native
+def adpcm_encode(src, n, dst, pos, pred, index):
+    steps = STEP_TABLE
+    indexes = INDEX_TABLE
+    high = False
+    byte = 0
+    for i in range(0, n - 1, 2):
+        s = src[i] | (src[i + 1] << 8)
+        if s & 0x8000:
+            s -= 0x10000
+        step = steps[index]
+        diff = s - pred
+        code = 0
+        if diff < 0:
+            code = 8
+            diff = -diff
+        delta = step >> 3
+        if diff >= step:
+            code |= 4
+            diff -= step
+            delta += step
+        step >>= 1
+        if diff >= step:
+            code |= 2
+            diff -= step
+            delta += step
+        step >>= 1
+        if diff >= step:
+            code |= 1
+            delta += step
+        if code & 8:
+            pred -= delta
+            if pred < -32768:
+                pred = -32768
+        else:
+            pred += delta
+            if pred > 32767:
+                pred = 32767
+        index += indexes[code]
+        if index < 0:
+            index = 0
+        elif index > 88:
+            index = 88
+        if high:
+            dst[pos] = byte | (code << 4)
+            pos += 1
+        else:
+            byte = code
+        high = not high
+    if high:
+        dst[pos] = byte
+        pos += 1
+    return pos, pred, index
+
+@micropython.native
+def adpcm_decode(src, start, end, dst, pos, pred, index):
+    steps = STEP_TABLE
+    indexes = INDEX_TABLE
+    # 低4位在前
+    for k in range(start * 2, end * 2):
+        code = (src[k >> 1] >> ((k & 1) << 2)) & 0x0F
+        step = steps[index]
+        delta = step >> 3
+        if code & 4:
+            delta += step
+        if code & 2:
+            delta += step >> 1
+        if code & 1:
+            delta += step >> 2
+        if code & 8:
+            pred -= delta
+            if pred < -32768:
+                pred = -32768
+        else:
+            pred += delta
+            if pred > 32767:
+                pred = 32767
+        index += indexes[code]
+        if index < 0:
+            index = 0
+        elif index > 88:
+            index = 88
+        dst[pos] = pred & 0xFF
+        dst[pos + 1] = (pred >> 8) & 0xFF
+        pos += 2
+    return pos, pred, index
+
+class AdpcmEncoder:
+    # 编码状态在帧之间延续，每帧块头记录该帧开始时的状态
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.pred = 0
+        self.index = 0
+
+    @staticmethod
+    def encoded_size(n):
+        return ADPCM_HEADER_SIZE + (n // 2 + 1) // 2
+
+    def encode(self, src, n, dst):
+        pred = self.pred
+        dst[0] = pred & 0xFF
+        dst[1] = (pred >> 8) & 0xFF
+        dst[2] = self.index
+        dst[3] = 0
+        pos, self.pred, self.index = adpcm_encode(src, n, dst, ADPCM_HEADER_SIZE, pred, self.index)
+        return pos
+
+class AdpcmDecoder:
+    @staticmethod
+    def decoded_size(n):
+        return (n - ADPCM_HEADER_SIZE) * 4
+
+    def decode(self, src, n, dst, pos=0):
+        # 返回写入dst后的位置，奇数采样数的帧会多出一个补齐的采样
+        pred = src[0] | (src[1] << 8)
+        if pred & 0x8000:
+            pred -= 0x10000
+        return adpcm_decode(src, ADPCM_HEADER_SIZE, n, dst, pos, pred, src[2])[0]
+
+class AdpcmStreamDecoder:
+    # 下行流式解码：帧数据可能被任意切分，块头跨切片时先攒齐
+    # 解码结果写入固定的输出缓冲区，返回的切片在下一次迭代前有效
+    def __init__(self, size=4096):
+        self.out = bytearray(size)
+        self.mv = memoryview(self.out)
+        self.max_in = size // 4
+        self.header = bytearray(ADPCM_HEADER_SIZE)
+        self.pred = 0
+        self.index = 0
+        self.begin()
+
+    def begin(self):
+        # 每个新帧开始时调用
+        self.header_left = ADPCM_HEADER_SIZE
+
+    def decode(self, chunk):
+        pos = 0
+        n = len(chunk)
+        while self.header_left and pos < n:
+            self.header[ADPCM_HEADER_SIZE - self.header_left] = chunk[pos]
+            self.header_left -= 1
+            pos += 1
+            if not self.header_left:
+                pred = self.header[0] | (self.header[1] << 8)
+                self.pred = pred - 0x10000 if pred & 0x8000 else pred
+                self.index = self.header[2]
+        while pos < n:
+            end = min(n, pos + self.max_in)
+            size, self.pred, self.index = adpcm_decode(chunk, pos, end, self.out, 0, self.pred, self.index)
+            yield self.mv[:size]
+            pos = end
+
+# G.711 µ-law：每个采样8位，2:1压缩，无帧间状态
+ULAW_BIAS = 0x84
+ULAW_CLIP = 32635
+
+def _exp_table():
+    table = bytearray(256)
+    for i in range(256):
+        e = 0
+        v = i >> 1
+        while v:
+            e += 1
+            v >>= 1
+        table[i] = e
+    return bytes(table)
+
+def _ulaw_table():
+    table = array('h', [0] * 256)
+    for u in range(256):
+        v = ~u & 0xFF
+        s = (((v & 0x0F) << 3) + ULAW_BIAS) << ((v >> 4) & 0x07)
+        s -= ULAW_BIAS
+        table[u] = -s if v & 0x80 else s
+    return table
+
+ULAW_EXP_TABLE = _exp_table()
+ULAW_DECODE_TABLE = _ulaw_table()
+
+@micropython.native
+def ulaw_encode(src, n, dst, pos):
+    exps = ULAW_EXP_TABLE
+    for i in range(0, n - 1, 2):
+        s = src[i] | (src[i + 1] << 8)
+        sign = 0
+        if s & 0x8000:
+            s = 0x10000 - s
+            sign = 0x80
+        if s > ULAW_CLIP:
+            s = ULAW_CLIP
+        s += ULAW_BIAS
+        e = exps[(s >> 7) & 0xFF]
+        dst[pos] = ~(sign | (e << 4) | ((s >> (e + 3)) & 0x0F)) & 0xFF
+        pos += 1
+    return pos
+
+@micropython.native
+def ulaw_decode(src, n, dst, pos):
+    table = ULAW_DECODE_TABLE
+    for i in range(n):
+        s = table[src[i]]
+        dst[pos] = s & 0xFF
+        dst[pos + 1] = (s >> 8) & 0xFF
+        pos += 2
+    return pos
+
+class UlawEncoder:
+    def reset(self):
+        pass
+
+    @staticmethod
+    def encoded_size(n):
+        return n // 2
+
+    def encode(self, src, n, dst):
+        return ulaw_encode(src, n, dst, 0)
+
+class UlawDecoder:
+    @staticmethod
+    def decoded_size(n):
+        return n * 2
+
+    def decode(self, src, n, dst, pos=0):
+        return ulaw_decode(src, n, dst, pos)
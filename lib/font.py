@@ -1,12 +1,57 @@
 import framebuf
+from collections import OrderedDict
+
+class LRUCache(object):
+    # 按字节预算淘汰最久未使用的项
+    def __init__(self,budget):
+        self.budget=budget
+        self.used=0
+        self.items=OrderedDict()
+        self.hits=0
+        self.misses=0
+
+    def get(self,key):
+        item=self.items.pop(key,None)
+        if item is None:
+            self.misses+=1
+            return None
+        self.items[key]=item
+        self.hits+=1
+        return item[0]
+
+    def put(self,key,value,size):
+        if size>self.budget:
+            return value
+        while self.used+size>self.budget:
+            oldest=next(iter(self.items))
+            self.used-=self.items.pop(oldest)[1]
+        self.items[key]=(value,size)
+        self.used+=size
+        return value
+
+    def clear(self):
+        self.items=OrderedDict()
+        self.used=0
+
+    def stats(self):
+        return {'hits':self.hits,'misses':self.misses,'items':len(self.items),'bytes':self.used}
+
 class Font(object):
-    def __init__(self,display):
-        self.file24 = open('resource/ASC24', 'rb')
-        self.file32 = open('resource/ASC32', 'rb')
-        self.file16 = open('resource/ASC16', 'rb')
+    # 每个字号一个字形缓存，另有整串文字的渲染结果缓存，滚动动画每帧只需一次blit
+    # 字库文件在第一次用到该字号时才打开
+    FILES={16:'resource/ASC16',24:'resource/ASC24',32:'resource/ASC32'}
+
+    def __init__(self,display,glyph_budget=2048,strip_budget=4096):
+        self.files={}
         self.display=display
+        self.glyphs={16:LRUCache(glyph_budget),24:LRUCache(glyph_budget),32:LRUCache(glyph_budget)}
+        self.strips=LRUCache(strip_budget)
 
     def text(self,tx,x,y,size=16):
+        fb=self.strip(tx,size)
+        if fb is not None:
+            self.display.blit(fb,x,y)
+            return
         for i in tx:
             if size==8:
                 self.f8(i,x,y)
@@ -21,6 +66,56 @@ class Font(object):
                 self.f16(i,x,y)
                 x=x+8
 
+    def width(self,size):
+        if size==24:
+            return 12
+        if size==32:
+            return 16
+        return 8
+
+    def strip(self,tx,size=16):
+        # 返回整串文字渲染好的FrameBuffer，超出缓存预算时返回None由调用方逐字绘制
+        # 8号字用内置text绘制，背景透明，不走缓存
+        if size==8:
+            return None
+        key=(tx,size)
+        fb=self.strips.get(key)
+        if fb is not None:
+            return fb
+        w=self.width(size)*len(tx)
+        nbytes=w*size//8
+        if not w or nbytes>self.strips.budget:
+            return None
+        return self.strips.put(key,self.render(tx,size),nbytes)
+
+    def render(self,tx,size=16):
+        # 把整串文字画进一块新的FrameBuffer，不经过缓存
+        w=self.width(size)*len(tx)
+        fb=framebuf.FrameBuffer(bytearray(w*size//8),w,size,framebuf.MONO_VLSB)
+        if size==8:
+            # 8号字没有字库文件，用FrameBuffer内置的8x8字体
+            fb.text(tx,0,0,1)
+            return fb
+        x=0
+        for i in tx:
+            fb.blit(self.glyph(i,size),x,0)
+            x=x+self.width(size)
+        return fb
+
+    def file(self,size):
+        f=self.files.get(size)
+        if f is None:
+            f=open(Font.FILES[size],'rb')
+            self.files[size]=f
+        return f
+
+    def glyph(self,alp,size):
+        if size==24:
+            return self.g24(alp)
+        if size==32:
+            return self.g32(alp)
+        return self.g16(alp)
+
     def p61(self,tx,x,y):
         c=list(tx)
         c.reverse()
@@ -32,26 +127,47 @@ class Font(object):
 
     def f8(self,alp,x,y):
         self.display.text(alp,x,y,1)
+    def g16(self,alp):
+        fb=self.glyphs[16].get(alp)
+        if fb is None:
+            f=self.file(16)
+            f.seek(ord(alp) * 16)
+            font_code = f.read(16)
+            fb = framebuf.FrameBuffer(bytearray(font_code), 8, 16, framebuf.MONO_HLSB)
+            self.glyphs[16].put(alp,fb,16)
+        return fb
     def f16(self,alp,x,y):
-        self.file16.seek(ord(alp) * 16)
-        font_code = self.file16.read(16)
-        fb = framebuf.FrameBuffer(bytearray(font_code), 8, 16, framebuf.MONO_HLSB)
-        self.display.blit(fb, x, y)
+        self.display.blit(self.g16(alp), x, y)
     def f16t(self,alp,x,y):
-        self.file16.seek(ord(alp) * 16)
-        font_code = self.file16.read(16)
+        f=self.file(16)
+        f.seek(ord(alp) * 16)
+        font_code = f.read(16)
         fb = framebuf.FrameBuffer(bytearray(font_code), 8, 16, framebuf.MONO_HMSB)
         self.display.blit(fb, x, y)
+    def g24(self,alp):
+        fb=self.glyphs[24].get(alp)
+        if fb is None:
+            f=self.file(24)
+            f.seek((ord(alp)-32) * 36)
+            font_code = f.read(36)
+            fb = framebuf.FrameBuffer(bytearray(font_code), 12, 24, framebuf.MONO_VLSB)
+            self.glyphs[24].put(alp,fb,36)
+        return fb
     def f24(self,alp,x,y):
-        self.file24.seek((ord(alp)-32) * 36)
-        font_code = self.file24.read(36)
-        fb = framebuf.FrameBuffer(bytearray(font_code), 12, 24, framebuf.MONO_VLSB)
-        self.display.blit(fb, x, y)
+        self.display.blit(self.g24(alp), x, y)
+    def g32(self,alp):
+        fb=self.glyphs[32].get(alp)
+        if fb is None:
+            f=self.file(32)
+            f.seek((ord(alp)) * 64)
+            font_code = f.read(64)
+            fb = framebuf.FrameBuffer(bytearray(font_code), 16, 32, framebuf.MONO_HLSB)
+            self.glyphs[32].put(alp,fb,64)
+        return fb
     def f32(self,alp,x,y):
-        self.file32.seek((ord(alp)) * 64)
-        font_code = self.file32.read(64)
-        fb = framebuf.FrameBuffer(bytearray(font_code), 16, 32, framebuf.MONO_HLSB)
-        self.display.blit(fb, x, y)
+        self.display.blit(self.g32(alp), x, y)
     def show(self):
         self.display.show()
-    
\ No newline at end of file
+    def stats(self):
+        return {'files':sorted(self.files),'glyph16':self.glyphs[16].stats(),'glyph24':self.glyphs[24].stats(),
+                'glyph32':self.glyphs[32].stats(),'strip':self.strips.stats()}
@@ -0,0 +1,79 @@
+class FrameSizer:
+    # 按实测吞吐自适应帧长：帧长取吞吐 × 目标时长（target_ms，RTT较大时取RTT的一半），
+    # 链路快时帧变大、减少逐帧开销，链路慢时帧变小、一帧不会占住链路太久
+    # 帧长限制在[min_size, max_size]内并取min_size乘2的幂，增大时每次最多翻倍，减小时直接到位
+    # hold为True时（播放起步、重新缓冲）固定用最小帧，让第一批音频尽快到达
+    def __init__(self, min_size, max_size, target_ms=40, alpha=4):
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.target_ms = target_ms
+        self.alpha = alpha          # 吞吐估计的EWMA权重为1/alpha
+        self.size = min_size
+        self.rate = 0               # 吞吐估计，字节/秒
+        self.rtt_ms = 0
+        self.hold = False
+
+        self.frames = 0
+        self.bytes = 0
+        self.busy_us = 0            # 发送阻塞或等待接收的累计时长
+        self.changes = 0
+        self.smallest = 0
+        self.largest = 0
+
+    def limit(self, max_size):
+        # 协商结果等外部上限变化时调用
+        self.max_size = max(self.min_size, max_size)
+        if self.size > self.max_size:
+            self.size = self.want()
+
+    def sample(self, n, us):
+        # n字节用时us微秒
+        self.frames += 1
+        self.bytes += n
+        self.busy_us += us
+        if n < self.smallest or not self.smallest:
+            self.smallest = n
+        if n > self.largest:
+            self.largest = n
+        rate = n * 1000000 // max(us, 1)
+        self.rate = rate if not self.rate else self.rate + (rate - self.rate) // self.alpha
+        self.adjust()
+
+    def want(self):
+        if self.hold or not self.rate:
+            return self.min_size
+        budget = self.rate * max(self.target_ms, self.rtt_ms // 2) // 1000
+        size = self.min_size
+        while size * 2 <= budget and size * 2 <= self.max_size:
+            size *= 2
+        return size
+
+    def adjust(self):
+        size = self.want()
+        if size > self.size:
+            size = min(size, self.size * 2)
+        if size != self.size:
+            self.size = size
+            self.changes += 1
+        return self.size
+
+    def reset(self):
+        self.frames = 0
+        self.bytes = 0
+        self.busy_us = 0
+        self.changes = 0
+        self.smallest = 0
+        self.largest = 0
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'frames': self.frames,
+            'avg': self.bytes // max(self.frames, 1),
+            'min': self.smallest,
+            'max': self.largest,
+            'kBps': self.rate // 1024,
+            'busy_ms': self.busy_us // 1000,
+            'changes': self.changes,
+            'rtt_ms': self.rtt_ms,
+        }
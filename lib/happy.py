@@ -1,23 +1,41 @@
-import machine
-import network
-import binascii
 import time
-from machine import Pin, SoftI2C
+from machine import Pin, SoftI2C, I2C
 from .ssd1306 import SSD1306_I2C
 from .font import Font
-import asyncio
-import os
+
+# network、binascii、json、asyncio只在用到的地方导入，只用OLED时不加载Wi-Fi相关模块
 
 class Network:
-    def __init__(self, ssid, password):
+    # fast=True时走快速启动：用flash上记住的BSSID/信道直连，可选静态IP跳过DHCP，缩短轮询间隔，
+    # NTP在后台线程里按截止时间同步，RTC已有效时跳过。BootStats()返回各阶段耗时
+    POLL_MS = 20
+    TIMEOUT_MS = 6666
+    CACHED_TIMEOUT_MS = 3000    # 用缓存的BSSID连不上时改为常规连接
+    VALID_YEAR = 2024           # RTC年份不早于此视为已同步
+
+    def __init__(self, ssid, password, fast=False, static=None, cache_file='wifi.json', ntp_deadline_ms=15000):
         self.ssid = ssid
         self.password = password
+        self.static = static        # (ip, netmask, gateway, dns)，None时用DHCP或缓存里的配置
+        self.cache_file = cache_file
+        self.ntp_deadline_ms = ntp_deadline_ms
+        self.boot = {}
+        begin = time.ticks_ms()
+        import network
         self.wlan = network.WLAN(network.STA_IF)
         self.wlan.active(True)
-        self.Connect()
-        self.SyncTime()
+        self.boot['active_ms'] = time.ticks_diff(time.ticks_ms(), begin)
+        if fast:
+            self.FastConnect()
+            self.SyncTimeBackground()
+        else:
+            self.Connect()
+            begin = time.ticks_ms()
+            self.boot['ntp'] = 'sync' if self.SyncTime() else 'failed'
+            self.boot['ntp_ms'] = time.ticks_diff(time.ticks_ms(), begin)
 
     def Scan(self):
+        import binascii
         security_str = ['open', 'WEP', 'WPA-PSK', 'WPA2-PSK', 'WPA/WPA2-PSK']
         hidden_str = ['visible', 'hidden']
         result = self.wlan.scan()
@@ -35,8 +53,92 @@ class Network:
                     self.wlan.disconnect()
                     raise Exception(f'connect network timeout, costtime:{time.ticks_diff(time.ticks_ms(), begin)}ms')
                 time.sleep(0.5)
+            self.boot['connect_ms'] = time.ticks_diff(time.ticks_ms(), begin)
+        print('network config:', self.wlan.ifconfig())
+
+    def LoadCache(self):
+        import json
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+            if cache.get('ssid') == self.ssid:
+                return cache
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def SaveCache(self, cache):
+        import json
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(cache, f)
+        except OSError as e:
+            print('save wifi cache failed:', e)
+
+    def FindAP(self):
+        # 首次启动没有缓存：扫描一次，选信号最强的同名AP
+        best = None
+        for item in self.wlan.scan():
+            if item[0].decode('utf-8') == self.ssid and (best is None or item[3] > best[3]):
+                best = item
+        return best
+
+    def WaitConnected(self, timeout_ms):
+        begin = time.ticks_ms()
+        while not self.wlan.isconnected():
+            if time.ticks_diff(time.ticks_ms(), begin) > timeout_ms:
+                return False
+            time.sleep_ms(Network.POLL_MS)
+        return True
+
+    def FastConnect(self):
+        import binascii
+        print('connecting to network (fast)...')
+        if self.wlan.isconnected():
+            self.boot['connect'] = 'up'
+            return
+        begin = time.ticks_ms()
+        cache = self.LoadCache()
+        static = self.static or (cache and cache.get('static'))
+        if static:
+            # 先设置静态IP，连接后不再等待DHCP
+            self.wlan.ifconfig(tuple(static))
+        mode = 'cached'
+        if cache is None:
+            mode = 'scan'
+            ap = self.FindAP()
+            self.boot['scan_ms'] = time.ticks_diff(time.ticks_ms(), begin)
+            cache = {'ssid': self.ssid}
+            if ap:
+                cache['bssid'] = binascii.hexlify(ap[1]).decode()
+                cache['channel'] = ap[2]
+        connected = False
+        if cache.get('bssid'):
+            try:
+                self.wlan.config(channel=cache['channel'])
+            except Exception:
+                pass
+            self.wlan.connect(self.ssid, self.password, bssid=binascii.unhexlify(cache['bssid']))
+            connected = self.WaitConnected(Network.CACHED_TIMEOUT_MS)
+            if not connected:
+                # AP换了或信道变了，去掉BSSID重新连接
+                self.wlan.disconnect()
+                cache.pop('bssid', None)
+                cache.pop('channel', None)
+        if not connected:
+            mode = 'fallback' if mode == 'cached' else mode
+            self.wlan.connect(self.ssid, self.password)
+            if not self.WaitConnected(Network.TIMEOUT_MS):
+                self.wlan.disconnect()
+                raise Exception(f'connect network timeout, costtime:{time.ticks_diff(time.ticks_ms(), begin)}ms')
+        self.boot['connect'] = mode
+        self.boot['connect_ms'] = time.ticks_diff(time.ticks_ms(), begin)
+        if self.static:
+            cache['static'] = list(self.static)
+        if mode != 'cached' or self.static:
+            self.SaveCache(cache)
         print('network config:', self.wlan.ifconfig())
-    
+
     def Ifconfig(self):
         return self.wlan.ifconfig()
 
@@ -49,7 +151,10 @@ class Network:
 
     def IsConnected(self):
         return self.wlan.isconnected()
-    
+
+    def TimeValid(self):
+        return time.localtime()[0] >= Network.VALID_YEAR
+
     def SyncTime(self):
         ntp_source = ['ntp1.aliyun.com', 'ntp2.aliyun.com', 'ntp3.aliyun.com', 'ntp4.aliyun.com', 'ntp5.aliyun.com', 'ntp6.aliyun.com', 'ntp7.aliyun.com', 's1a.time.edu.cn', 's1b.time.edu.cn', 's1c.time.edu.cn', 's1d.time.edu.cn', 's1e.time.edu.cn', 's2a.time.edu.cn', 's2b.time.edu.cn', 's2c.time.edu.cn', 's2d.time.edu.cn', 's2e.time.edu.cn', 's2f.time.edu.cn', 's2g.time.edu.cn', 's2h.time.edu.cn', 's2j.time.edu.cn', 's2k.time.edu.cn', 's2m.time.edu.cn']
         import ntptime
@@ -61,13 +166,248 @@ class Network:
                 try:
                     ntptime.host = source
                     ntptime.settime()
-                    return
+                    return True
                 except:
                     pass
+        return False
+
+    def SyncTimeDeadline(self, deadline_ms):
+        # 每个服务器只试一次，超过截止时间就放弃，下次开机再同步
+        import ntptime
+        ntptime.NTP_DELTA = 3155644800
+        ntptime.timeout = 1
+        begin = time.ticks_ms()
+        for source in ('ntp1.aliyun.com', 'ntp2.aliyun.com', 'ntp3.aliyun.com', 's1a.time.edu.cn', 's2c.time.edu.cn',
+                       'ntp4.aliyun.com', 'ntp5.aliyun.com', 's1b.time.edu.cn', 's2d.time.edu.cn'):
+            if time.ticks_diff(time.ticks_ms(), begin) > deadline_ms:
+                self.boot['ntp'] = 'deadline'
+                break
+            try:
+                ntptime.host = source
+                ntptime.settime()
+                self.boot['ntp'] = 'sync'
+                break
+            except Exception:
+                pass
+        else:
+            self.boot['ntp'] = 'failed'
+        self.boot['ntp_ms'] = time.ticks_diff(time.ticks_ms(), begin)
+
+    def SyncTimeBackground(self):
+        if self.TimeValid():
+            self.boot['ntp'] = 'skipped'
+            return
+        self.boot['ntp'] = 'running'
+        try:
+            import _thread
+            _thread.start_new_thread(self.SyncTimeDeadline, (self.ntp_deadline_ms,))
+        except ImportError:
+            self.SyncTimeDeadline(self.ntp_deadline_ms)
+
+    def BootStats(self):
+        return self.boot
+
+class ScrollRow:
+    # 一行滚动文字：文字只渲染一次，每帧按偏移量把strip的一段blit到屏幕上
+    RIGHT_TO_LEFT = 0
+    INNER_PING_PONG = 1
+    OVERFLOW_PING_PONG = 2
+
+    def __init__(self, strip, y, height, kind, span, window_size, speed = 2):
+        self.strip = strip
+        self.y = y
+        self.height = height
+        self.kind = kind
+        self.span = span
+        self.window_size = window_size
+        self.speed = speed
+        self.i = 0
+        import asyncio
+        self.done = asyncio.Event()
+
+    def offset(self):
+        i = self.i
+        if self.kind == ScrollRow.RIGHT_TO_LEFT:
+            return -i if i < self.span else self.window_size - i
+        if self.kind == ScrollRow.INNER_PING_PONG:
+            return i if i < self.span else self.window_size - i
+        return -i if i < self.span else -(self.window_size - i)
+
+    def draw(self, display):
+        display.rect(0, self.y, display.width, self.height, 0, True)
+        display.blit(self.strip, self.offset(), self.y)
+        self.i += self.speed
+        return self.i <= self.window_size
+
+class ScrollEngine:
+    # 统一的帧调度：所有滚动行在同一帧内绘制，只调用一次show()
+    def __init__(self, display, fps = 20):
+        self.display = display
+        self.fps = fps
+        self.rows = []
+        self.task = None
+        self.frames = 0
+        self.late = 0
+        self.frame_ms = 0
+        self.max_frame_ms = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if self.task is None:
+            import asyncio
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        import asyncio
+        period = 1000 // self.fps
+        try:
+            while self.rows:
+                begin = time.ticks_ms()
+                for row in self.rows:
+                    if not row.draw(self.display):
+                        row.done.set()
+                self.rows = [row for row in self.rows if not row.done.is_set()]
+                self.display.show()
+                cost = time.ticks_diff(time.ticks_ms(), begin)
+                self.frames += 1
+                self.frame_ms += cost
+                if cost > self.max_frame_ms:
+                    self.max_frame_ms = cost
+                if cost > period:
+                    self.late += 1
+                await asyncio.sleep_ms(max(0, period - cost))
+        finally:
+            for row in self.rows:
+                row.done.set()
+            self.rows = []
+            self.task = None
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'late': self.late,
+            'avg_frame_ms': self.frame_ms // self.frames if self.frames else 0,
+            'max_frame_ms': self.max_frame_ms,
+        }
+
+class TextArea:
+    # 流式文字区域：标题占第一行，其余行显示逐段到达的文字，只画新到的字，按字宽折行，写满后整体上移一行
+    # append()只改显存，refresh()按interval_ms把多次append合并成一次show()，I2C传输不会频繁挤占音频写入
+    # 字库只有ASCII：UTF-8多字节字符画成一个'?'，被拆在两段里的字符也能正确处理
+    def __init__(self, display, font, title=None, font_size=16, interval_ms=200):
+        self.display = display
+        self.font = font
+        self.title = title
+        self.font_size = font_size
+        self.interval_ms = interval_ms
+        self.char_width = font.width(font_size)
+        self.cols = display.width // self.char_width
+        self.y = font_size if title else 0
+        self.rows = max(1, (display.height - self.y) // font_size)
+        self.lines = [bytearray(self.cols) for _ in range(self.rows)]
+        self.lengths = [0] * self.rows
+        self.reset()
+
+    def reset(self):
+        # 新一轮开始：清屏，统计从零算起
+        self.row = 0
+        self.col = 0
+        self.chars = 0
+        self.appends = 0
+        self.refreshes = 0
+        self.show_us = 0
+        self.max_show_us = 0
+        for i in range(self.rows):
+            self.lengths[i] = 0
+        self.display.fill(0)
+        if self.title:
+            self.font.text(self.title, 0, 0, self.font_size)
+        self.dirty = True
+        # 第一段文字到达时立即显示
+        self.shown = time.ticks_add(time.ticks_ms(), -self.interval_ms)
+
+    def append(self, data, start=0):
+        for i in range(start, len(data)):
+            c = data[i]
+            if c == 10:
+                self.newline()
+                continue
+            if c >= 0x80:
+                if c < 0xc0:
+                    continue        # 多字节字符的后续字节
+                c = 63
+            elif c < 32:
+                continue
+            if self.col >= self.cols:
+                self.newline()
+                if c == 32:
+                    continue        # 折行处的空格不画
+            self.lines[self.row][self.col] = c
+            self.draw(c, self.col, self.row)
+            self.col += 1
+            self.lengths[self.row] = self.col
+            self.chars += 1
+        self.appends += 1
+        self.dirty = True
+
+    def draw(self, c, col, row):
+        self.display.blit(self.font.glyph(chr(c), self.font_size),
+                          col * self.char_width, self.y + row * self.font_size)
+
+    def newline(self):
+        self.col = 0
+        if self.row + 1 < self.rows:
+            self.row += 1
+            self.lengths[self.row] = 0
+            return
+        # 满屏：行缓冲循环上移，重画整个区域
+        self.lines.append(self.lines.pop(0))
+        self.lengths.pop(0)
+        self.lengths.append(0)
+        self.display.rect(0, self.y, self.display.width, self.rows * self.font_size, 0, True)
+        for row in range(self.rows - 1):
+            line = self.lines[row]
+            for col in range(self.lengths[row]):
+                self.draw(line[col], col, row)
+
+    def wait_ms(self):
+        # 距离下一次允许刷新还有多少毫秒
+        return max(0, self.interval_ms - time.ticks_diff(time.ticks_ms(), self.shown))
+
+    def refresh(self, force=False):
+        # 返回是否刷新了屏幕
+        if not self.dirty:
+            return False
+        now = time.ticks_ms()
+        if not force and time.ticks_diff(now, self.shown) < self.interval_ms:
+            return False
+        begin = time.ticks_us()
+        self.display.show()
+        cost = time.ticks_diff(time.ticks_us(), begin)
+        self.show_us += cost
+        if cost > self.max_show_us:
+            self.max_show_us = cost
+        self.shown = now
+        self.dirty = False
+        self.refreshes += 1
+        return True
+
+    def stats(self):
+        return {
+            'chars': self.chars,
+            'appends': self.appends,
+            'refreshes': self.refreshes,
+            'avg_show_ms': self.show_us // self.refreshes // 1000 if self.refreshes else 0,
+            'max_show_ms': self.max_show_us // 1000,
+        }
 
 class Oled:
-    def __init__(self, scl = 22, sda = 21, width = 128, height = 64):
-        i2c = SoftI2C(scl = Pin(scl), sda = Pin(sda))
+    def __init__(self, scl = 22, sda = 21, width = 128, height = 64, i2c_id = None, freq = 400000):
+        # i2c_id为None时使用软件I2C，否则使用对应编号的硬件I2C外设
+        if i2c_id is None:
+            i2c = SoftI2C(scl = Pin(scl), sda = Pin(sda), freq = freq)
+        else:
+            i2c = I2C(i2c_id, scl = Pin(scl), sda = Pin(sda), freq = freq)
         self.width = width
         self.height = height
         self.display = SSD1306_I2C(width, height, i2c)
@@ -75,6 +415,10 @@ class Oled:
         self.head_y = 0
         self.body_y = 20
         self.tail_y = 48
+        self.scroller = ScrollEngine(self.display)
+
+    def TextArea(self, title = None, font_size = 16, interval_ms = 200):
+        return TextArea(self.display, self.f_display, title, font_size, interval_ms)
 
     def Text(self, text, x, y, font_size = 16):
         self.f_display.text(text, x, y, font_size)
@@ -88,6 +432,9 @@ class Oled:
     def Buffer(self, fb, x, y):
         self.display.blit(fb, x, y)
 
+    def CacheStats(self):
+        return self.f_display.stats()
+
     def fontWidth(self, font_size):
         if font_size == 8:
             return 8
@@ -156,18 +503,19 @@ class Oled:
     async def TailGridText(self, txt_list):
         await self.gridTextWrapper(txt_list, self.TailText, 16)
 
+    async def scroll(self, txt, y, font_size, kind, span, window_size, speed):
+        strip = self.f_display.strip(txt, font_size) or self.f_display.render(txt, font_size)
+        row = ScrollRow(strip, y, font_size, kind, span, window_size, speed)
+        self.scroller.add(row)
+        await row.done.wait()
+
+    def ScrollStats(self):
+        return self.scroller.stats()
+
     async def ScrollRightToLeft(self, txt, y, font_size = 16, speed = 2):
         font_width = self.fontWidth(font_size)
         txt_len = len(txt) * font_width
-        window_size = txt_len + self.width
-        for i in range(0, window_size + 1, speed):
-            x = -i
-            if i >= txt_len:
-                x = window_size - i
-            self.clearRow(y, font_size)
-            self.Text(txt, x, y, font_size)
-            self.display.show()
-            await asyncio.sleep(0.05)
+        await self.scroll(txt, y, font_size, ScrollRow.RIGHT_TO_LEFT, txt_len, txt_len + self.width, speed)
 
     async def ScrollPingPong(self, txt, y, font_size = 16, speed = 2):
         font_width = self.fontWidth(font_size)
@@ -180,26 +528,10 @@ class Oled:
         font_width = self.fontWidth(font_size)
         txt_len = len(txt) * font_width
         hole_len = self.width - txt_len
-        window_size = hole_len * 2
-        for i in range(0, window_size + 1, speed):
-            x = i
-            if i >= hole_len:
-                x = window_size - i
-            self.clearRow(y, font_size)
-            self.Text(txt, x, y, font_size)
-            self.display.show()
-            await asyncio.sleep(0.05)
+        await self.scroll(txt, y, font_size, ScrollRow.INNER_PING_PONG, hole_len, hole_len * 2, speed)
 
     async def overflowScrollPingPong(self, txt, y, font_size = 16, speed = 2):
         font_width = self.fontWidth(font_size)
         txt_len = len(txt) * font_width
         overflow_len = txt_len - self.width
-        window_size = overflow_len * 2
-        for i in range(0, window_size + 1, speed):
-            x = -i
-            if i >= overflow_len:
-                x = -(window_size - i)
-            self.clearRow(y, font_size)
-            self.Text(txt, x, y, font_size)
-            self.display.show()
-            await asyncio.sleep(0.05)
\ No newline at end of file
+        await self.scroll(txt, y, font_size, ScrollRow.OVERFLOW_PING_PONG, overflow_len, overflow_len * 2, speed)
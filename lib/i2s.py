@@ -0,0 +1,90 @@
+import time
+from machine import I2S
+
+class I2SPort:
+    # 板上只有一个I2S外设：录音和播放分时复用同一个I2S对象，切换用户时用init()重新配置，
+    # 不再每轮对话新建对象并分配缓冲。播放时按写入的字节数推算队列排空时刻，收尾时只等待剩余样本的时长
+    def __init__(self, id=0, bits=16, format=I2S.MONO, ibuf=32768, tail_ms=10):
+        self.id = id
+        self.bits = bits
+        self.format = format
+        self.ibuf = ibuf
+        self.tail_ms = tail_ms
+        self.i2s = None
+        self.owner = None
+        self.mode = None
+        self.rate = 0
+        self.bytes_per_ms = 0
+        self.queue_end = 0          # 播放队列预计排空的时刻(ticks_us)
+        self.silence = None
+
+        self.inits = 0
+        self.reuses = 0
+        self.init_us = 0            # 配置外设累计耗时
+        self.drain_us = 0           # 等待播放排空累计耗时
+
+    def open(self, owner, mode, sck, ws, sd, rate):
+        # 同一个用户以相同的模式和采样率连续使用时直接复用，否则重新配置（协商可能在两轮之间改变采样率）
+        if self.i2s is not None and self.owner is owner and self.mode == mode and self.rate == rate:
+            self.reuses += 1
+            return self.i2s
+        begin = time.ticks_us()
+        if self.i2s is None:
+            self.i2s = I2S(self.id, sck=sck, ws=ws, sd=sd, mode=mode, bits=self.bits, format=self.format,
+                           rate=rate, ibuf=self.ibuf)
+        else:
+            # init()会先释放旧的配置
+            self.i2s.init(sck=sck, ws=ws, sd=sd, mode=mode, bits=self.bits, format=self.format,
+                          rate=rate, ibuf=self.ibuf)
+        self.init_us += time.ticks_diff(time.ticks_us(), begin)
+        self.inits += 1
+        self.owner = owner
+        self.mode = mode
+        self.rate = rate
+        channels = 2 if self.format == I2S.STEREO else 1
+        self.bytes_per_ms = rate * self.bits // 8 * channels // 1000
+        self.queue_end = time.ticks_us()
+        if mode == I2S.TX:
+            n = self.tail_ms * self.bytes_per_ms
+            if self.silence is None or len(self.silence) != n:
+                self.silence = bytearray(n)
+        return self.i2s
+
+    def readinto(self, buf):
+        return self.i2s.readinto(buf)
+
+    def write(self, data):
+        # 队列空了从当前时刻开始播放，否则接在队尾
+        now = time.ticks_us()
+        start = self.queue_end if time.ticks_diff(self.queue_end, now) > 0 else now
+        n = self.i2s.write(data)
+        self.queue_end = time.ticks_add(start, n * 1000 // self.bytes_per_ms)
+        return n
+
+    def queued_us(self):
+        return max(0, time.ticks_diff(self.queue_end, time.ticks_us()))
+
+    def drain(self):
+        # 补一小段静音把最后的有效样本推出DMA，再等待队列中剩余样本播完
+        if self.mode != I2S.TX:
+            return 0
+        self.write(self.silence)
+        wait = self.queued_us()
+        if wait:
+            time.sleep_us(wait)
+        self.drain_us += wait
+        return wait
+
+    def abort(self):
+        # 丢弃队列中尚未播放的音频，下次open时重新配置
+        if self.i2s is not None:
+            self.i2s.deinit()
+        self.owner = None
+        self.queue_end = time.ticks_us()
+
+    def close(self):
+        self.abort()
+        self.i2s = None
+
+    def stats(self):
+        return {'inits': self.inits, 'reuses': self.reuses, 'init_us': self.init_us, 'drain_us': self.drain_us}
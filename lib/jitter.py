@@ -0,0 +1,119 @@
+import time
+
+class JitterBuffer:
+    # 播放抖动缓冲：先攒够target_ms的音频再开始写I2S，播空后重新缓冲
+    # 根据到达时间相对音频时长的偏移估计网络抖动，每轮对话结束后调整target_ms
+    def __init__(self, rate, preroll_ms=120, min_ms=60, max_ms=400, sample_bytes=2):
+        self.bytes_per_ms = rate * sample_bytes // 1000
+        self.buf = bytearray(max_ms * self.bytes_per_ms)
+        self.mv = memoryview(self.buf)
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.target_ms = preroll_ms
+        self.sink = None
+
+    def set_rate(self, rate, sample_bytes=2):
+        # 协商后的播放采样率，缓冲区按开机时的采样率分配，不重新分配
+        self.bytes_per_ms = rate * sample_bytes // 1000
+
+    def start(self, sink):
+        self.sink = sink
+        self.begin = time.ticks_ms()
+        self.level = 0
+        self.playing = False
+        self.play_base = 0          # 本段连续播放的起始时刻
+        self.written = 0            # 本段连续播放已写入I2S的字节数
+        self.media_ms = 0           # 已收到音频的累计时长
+        self.delay_min = None
+        self.jitter_ms = 0          # 本轮观测到的最大迟到时长
+
+        self.chunks = 0
+        self.bytes = 0
+        self.underruns = 0          # I2S播空次数
+        self.overruns = 0           # 缓冲区写满被迫提前开播次数
+        self.gap_ms = 0             # 播空造成的静音总时长
+        self.first_audio_ms = -1    # 从start到第一次写I2S
+
+    def now(self):
+        return time.ticks_diff(time.ticks_ms(), self.begin)
+
+    def play_end(self):
+        return self.play_base + self.written // self.bytes_per_ms
+
+    def track(self, now, n):
+        delay = now - self.media_ms
+        if self.delay_min is None or delay < self.delay_min:
+            self.delay_min = delay
+        late = delay - self.delay_min
+        if late > self.jitter_ms:
+            self.jitter_ms = late
+        self.media_ms += n // self.bytes_per_ms
+
+    def write(self, data, now):
+        if self.first_audio_ms < 0:
+            self.first_audio_ms = now
+        self.sink.write(data)
+        self.written += len(data)
+
+    def play(self, now):
+        self.playing = True
+        self.play_base = now
+        self.written = 0
+        if self.level:
+            self.write(self.mv[:self.level], now)
+            self.level = 0
+
+    def push(self, chunk):
+        now = self.now()
+        n = len(chunk)
+        self.chunks += 1
+        self.bytes += n
+        self.track(now, n)
+
+        if self.playing:
+            end = self.play_end()
+            if now <= end:
+                self.write(chunk, now)
+                return
+            # 已播空，提高目标深度后重新缓冲
+            self.underruns += 1
+            self.gap_ms += now - end
+            self.playing = False
+            self.target_ms = min(self.target_ms + self.min_ms, self.max_ms)
+
+        if self.level + n > len(self.buf):
+            self.overruns += 1
+            self.play(now)
+            self.write(chunk, now)
+            return
+
+        self.buf[self.level:self.level + n] = chunk
+        self.level += n
+        if self.level >= self.target_ms * self.bytes_per_ms:
+            self.play(now)
+
+    def flush(self):
+        if not self.playing and self.level:
+            self.play(self.now())
+        self.adapt()
+        return self.stats()
+
+    def adapt(self):
+        # 无欠载时逐步收敛到实测抖动，欠载时按次数加大
+        if self.underruns:
+            target = self.target_ms + self.underruns * self.min_ms
+        else:
+            target = (self.target_ms * 3 + self.jitter_ms + self.min_ms) // 4
+        self.target_ms = max(self.min_ms, min(target, self.max_ms))
+
+    def stats(self):
+        return {
+            'chunks': self.chunks,
+            'bytes': self.bytes,
+            'underruns': self.underruns,
+            'overruns': self.overruns,
+            'gap_ms': self.gap_ms,
+            'first_audio_ms': self.first_audio_ms,
+            'jitter_ms': self.jitter_ms,
+            'target_ms': self.target_ms,
+        }
@@ -0,0 +1,132 @@
+import random
+import select
+import socket
+import time
+from .protocol import Frame, Request
+
+class Link:
+    # 长连接管理：缓存DNS解析结果，空闲时发送心跳帧，断线后按带抖动的指数退避在后台重连
+    # maintain()由空闲循环定期调用，按键后ensure()直接拿到已建立的连接
+    def __init__(self, host, port, keepalive_ms=15000, dns_ttl_ms=600000,
+                 backoff_min_ms=500, backoff_max_ms=30000, on_connect=None):
+        self.host = host
+        self.port = port
+        self.keepalive_ms = keepalive_ms
+        self.dns_ttl_ms = dns_ttl_ms
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.on_connect = on_connect
+
+        self.socket = None
+        self.poller = None
+        self.addr = None
+        self.addr_time = 0
+        self.active_time = 0
+        self.retry_time = 0
+        self.backoff_ms = 0
+        self.frame = Frame()
+
+        self.connects = 0
+        self.failures = 0
+        self.drops = 0
+        self.keepalives = 0
+        self.dns_lookups = 0
+
+    def address(self):
+        now = time.ticks_ms()
+        if self.addr is None or time.ticks_diff(now, self.addr_time) > self.dns_ttl_ms:
+            self.addr = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0][-1]
+            self.addr_time = now
+            self.dns_lookups += 1
+        return self.addr
+
+    def connect(self):
+        self.close()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.address())
+        except Exception:
+            sock.close()
+            self.failures += 1
+            # 连续失败可能是地址变了，下次重新解析
+            self.addr = None
+            self.schedule_retry()
+            raise
+        self.socket = sock
+        self.poller = select.poll()
+        self.poller.register(sock, select.POLLIN)
+        self.backoff_ms = 0
+        self.connects += 1
+        self.touch()
+        if self.on_connect:
+            try:
+                self.on_connect(sock)
+            except Exception:
+                # 连接后的握手失败，当作连接失败处理
+                self.drop()
+                raise
+        return sock
+
+    def ensure(self):
+        # 按键后立即尝试，不受退避限制
+        if self.socket:
+            return self.socket
+        return self.connect()
+
+    def close(self):
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+            self.poller = None
+
+    def drop(self):
+        # 连接出错：关闭并安排后台重连
+        if self.socket:
+            self.drops += 1
+        self.close()
+        self.schedule_retry()
+
+    def schedule_retry(self):
+        if self.backoff_ms:
+            self.backoff_ms = min(self.backoff_ms * 2, self.backoff_max_ms)
+        else:
+            self.backoff_ms = self.backoff_min_ms
+        # 在[backoff/2, backoff)之间随机，避免多台设备同时重连
+        half = self.backoff_ms // 2
+        self.retry_time = time.ticks_add(time.ticks_ms(), half + random.getrandbits(16) % max(half, 1))
+
+    def touch(self):
+        self.active_time = time.ticks_ms()
+
+    def maintain(self):
+        # 空闲时调用：检测对端关闭、发送心跳、到期后重连
+        now = time.ticks_ms()
+        if self.socket is None:
+            if time.ticks_diff(now, self.retry_time) >= 0:
+                try:
+                    self.connect()
+                except Exception as e:
+                    print('reconnect failed:', e)
+            return
+        # 空闲时服务端不会主动发数据，可读即对端已关闭
+        if self.poller.poll(0):
+            print('connection closed by peer')
+            self.drop()
+            return
+        if self.keepalive_ms and time.ticks_diff(now, self.active_time) >= self.keepalive_ms:
+            try:
+                self.frame.send(self.socket, Request.KEEPALIVE, b'')
+                self.keepalives += 1
+                self.touch()
+            except Exception as e:
+                print('keepalive failed:', e)
+                self.drop()
+
+    def stats(self):
+        return {
+            'connects': self.connects,
+            'failures': self.failures,
+            'drops': self.drops,
+            'keepalives': self.keepalives,
+            'dns_lookups': self.dns_lookups,
+        }
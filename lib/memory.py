@@ -0,0 +1,110 @@
+import gc
+import time
+from array import array
+from lib.profiler import mem_alloc, mem_free
+
+PHASES = ('idle', 'record', 'uplink', 'downlink', 'oled')
+
+def largest_free(limit=None):
+    # 二分查找能分配的最大bytearray，衡量碎片；探测期间关闭自动GC，分配失败只抛MemoryError不触发回收
+    # 每次探测都要扫描堆，只在安全点调用
+    hi = limit or mem_free()
+    lo = 0
+    enabled = gc.isenabled() if hasattr(gc, 'isenabled') else True
+    gc.disable()
+    try:
+        while hi - lo > 64:
+            mid = (lo + hi) // 2
+            try:
+                buf = bytearray(mid)
+                del buf
+                lo = mid
+            except MemoryError:
+                hi = mid
+    finally:
+        if enabled:
+            gc.enable()
+    return lo
+
+class Memory:
+    # 按阶段统计堆分配：switch()切换当前阶段，两次切换之间新分配的字节数记在前一个阶段上
+    # 设备上的对象只在GC时释放，已分配字节数变少说明这段时间里发生了自动GC，计入该阶段的gcs
+    # 安全点（回合之间、空闲时）主动回收，并把gc.threshold设为回收后剩余堆减去reserve，
+    # 一轮对话的分配不超过这个额度就不会在播放中触发自动GC
+    IDLE = 0
+    RECORD = 1      # 读麦克风、VAD
+    UPLINK = 2      # 编码和发送
+    DOWNLINK = 3    # 收帧、解码、写I2S
+    OLED = 4
+
+    def __init__(self, enabled=True, policy=True, reserve=16384, idle_bytes=4096):
+        self.enabled = enabled
+        self.policy = policy
+        self.reserve = reserve
+        self.idle_bytes = idle_bytes    # 空闲时分配超过这么多才回收，免得每次维护连接都GC
+        self.phase = Memory.IDLE
+        self.mark = 0
+        self.alloc = array('I', [0] * len(PHASES))
+        self.gcs = array('H', [0] * len(PHASES))
+        self.min_free = array('i', [-1] * len(PHASES))
+        self.collected = mem_alloc()    # 上次主动回收后的已分配字节数
+        self.collects = 0
+        self.collect_us = 0
+        self.largest = 0
+        self.threshold = 0
+
+    def start(self):
+        # 新一轮开始
+        for i in range(len(PHASES)):
+            self.alloc[i] = 0
+            self.gcs[i] = 0
+            self.min_free[i] = -1
+        self.phase = Memory.IDLE
+        self.mark = mem_alloc()
+
+    def switch(self, phase):
+        # 返回之前的阶段，临时切换（如OLED）后可切回
+        prev = self.phase
+        if not self.enabled or phase == prev:
+            return prev
+        now = mem_alloc()
+        if now >= self.mark:
+            self.alloc[prev] += now - self.mark
+        else:
+            self.gcs[prev] += 1
+        self.mark = now
+        self.phase = phase
+        free = mem_free()
+        if self.min_free[phase] < 0 or free < self.min_free[phase]:
+            self.min_free[phase] = free
+        return prev
+
+    def collect(self):
+        begin = time.ticks_us()
+        gc.collect()
+        self.collect_us = time.ticks_diff(time.ticks_us(), begin)
+        self.collects += 1
+        self.collected = mem_alloc()
+        self.mark = self.collected
+        if self.policy and hasattr(gc, 'threshold'):
+            free = mem_free()
+            self.threshold = max(free - self.reserve, free // 2)
+            gc.threshold(self.threshold)
+
+    def safe_point(self, idle=False):
+        # 回合之间总是回收；空闲时只在分配够多时回收，顺便测一次最大空闲块
+        if not self.policy:
+            return
+        if idle and mem_alloc() - self.collected < self.idle_bytes:
+            return
+        self.collect()
+        if self.enabled:
+            self.largest = largest_free()
+
+    def finish(self):
+        self.switch(Memory.IDLE)
+        stats = {'collect_ms': self.collect_us // 1000, 'largest': self.largest, 'threshold': self.threshold}
+        for i, name in enumerate(PHASES):
+            if self.alloc[i] or self.gcs[i]:
+                stats[name] = (self.alloc[i], self.gcs[i], self.min_free[i])
+        return stats
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+class BufferPool:
+    # 预分配的录音缓冲池，开机时分配一次，每轮对话复用，避免录音过程中触发GC
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        self.bufs = [bytearray(size) for _ in range(count)]
+        self.mvs = [memoryview(buf) for buf in self.bufs]
+        self.lens = [0] * count
+
+class CapturePipeline:
+    # 录音与上传流水线：fill任务从I2S读入空闲缓冲，drain任务把已填满的缓冲发往socket
+    # 缓冲按环形顺序轮转，filled/sent为累计块数，二者之差即为排队深度
+    def __init__(self, pool, source, sink, total, vad=None, trace=None, stop=None, chunk=None):
+        self.pool = pool
+        self.source = source        # asyncio.StreamReader(I2S)
+        self.sink = sink            # async sink(data, is_finish)
+        self.total = total          # 录音时长上限
+        self.vad = vad              # 端点检测，判定说话结束后提前发送eof
+        self.trace = trace
+        self.stop = stop            # 返回True时提前结束录音（录音中按键）
+        self.chunk = chunk          # 返回下一块录音字节数（即上行帧长）的函数，None时按缓冲区大小
+
+        self.filled = 0
+        self.sent = 0
+        self.captured = 0
+        self.eof_at = -1            # 最后一块的序号，未确定前为-1
+        self.error = None           # 录音任务的异常，发送任务结束后由run()抛出
+        self.can_fill = asyncio.Event()
+        self.can_send = asyncio.Event()
+
+        # 统计信息
+        self.overruns = 0           # 缓冲池耗尽、录音被迫等待发送的次数
+        self.fill_blocked_us = 0    # 录音任务等待空闲缓冲的总时长
+        self.send_blocked_us = 0    # 发送任务阻塞在socket上的总时长
+        self.max_depth = 0
+        self.capture_us = 0         # 从开始到录音结束
+        self.tail_us = 0            # 录音结束到最后一个字节发出
+
+    async def fill(self):
+        # 录音出错时把已读到的块发完，最后一块带eof，再唤醒发送任务，免得它一直等下一块
+        try:
+            await self.capture()
+        except Exception as e:
+            self.error = e
+            self.eof_at = self.filled - 1
+            self.can_send.set()
+
+    async def capture(self):
+        pool = self.pool
+        while self.eof_at < 0:
+            if self.filled - self.sent >= pool.count:
+                self.overruns += 1
+                begin = time.ticks_us()
+                while self.filled - self.sent >= pool.count:
+                    self.can_fill.clear()
+                    await self.can_fill.wait()
+                self.fill_blocked_us += time.ticks_diff(time.ticks_us(), begin)
+
+            i = self.filled % pool.count
+            size = min(self.total - self.captured, self.chunk() if self.chunk else pool.size, pool.size)
+            ret = await self.source.readinto(pool.mvs[i][:size])
+            pool.lens[i] = ret
+            self.captured += ret
+            trace = self.trace
+            if trace:
+                # 常量从实例上取，关闭跟踪时不必导入lib.trace
+                trace.mark(trace.MIC)
+                trace.add(trace.STAGE_MIC, ret)
+            if (self.captured >= self.total or (self.vad and self.vad.feed(pool.bufs[i], ret))
+                    or (self.stop and self.stop())):
+                self.eof_at = self.filled
+                self.capture_us = time.ticks_diff(time.ticks_us(), self.begin)
+            self.filled += 1
+            depth = self.filled - self.sent
+            if depth > self.max_depth:
+                self.max_depth = depth
+            self.can_send.set()
+
+    async def drain(self):
+        pool = self.pool
+        while True:
+            while self.sent == self.filled:
+                if self.error is not None:
+                    return
+                self.can_send.clear()
+                await self.can_send.wait()
+
+            i = self.sent % pool.count
+            is_finish = 1 if self.sent == self.eof_at else 0
+            begin = time.ticks_us()
+            await self.sink(pool.mvs[i][:pool.lens[i]], is_finish)
+            self.send_blocked_us += time.ticks_diff(time.ticks_us(), begin)
+            self.sent += 1
+            self.can_fill.set()
+            if is_finish:
+                break
+
+    async def run(self):
+        self.begin = time.ticks_us()
+        filler = asyncio.create_task(self.fill())
+        try:
+            await self.drain()
+            await filler
+        finally:
+            if not filler.done():
+                filler.cancel()
+        if self.error is not None:
+            raise self.error
+        end = time.ticks_diff(time.ticks_us(), self.begin)
+        self.tail_us = end - self.capture_us
+        return self.captured
+
+    def stats(self):
+        return {
+            'bytes': self.captured,
+            'chunks': self.sent,
+            'overruns': self.overruns,
+            'fill_blocked_us': self.fill_blocked_us,
+            'send_blocked_us': self.send_blocked_us,
+            'max_depth': self.max_depth,
+            'capture_us': self.capture_us,
+            'tail_us': self.tail_us,
+        }
@@ -0,0 +1,45 @@
+import gc
+import time
+
+def mem_alloc():
+    # PC上的gc没有mem_alloc/mem_free，返回0
+    return gc.mem_alloc() if hasattr(gc, 'mem_alloc') else 0
+
+def mem_free():
+    return gc.mem_free() if hasattr(gc, 'mem_free') else 0
+
+class Profiler:
+    # 启动阶段的导入和初始化统计：with prof('名称'): ... 记录这一段的耗时、新分配的堆内存和结束时的剩余堆
+    # collect=True时每段前后各做一次GC，堆数据只包含留存的对象，但会拖慢启动
+    def __init__(self, collect=False):
+        self.collect = collect
+        self.steps = []
+        self.stack = []
+        self.name = None
+        self.begin = time.ticks_us()
+
+    def __call__(self, name):
+        self.name = name
+        return self
+
+    def __enter__(self):
+        if self.collect:
+            gc.collect()
+        self.stack.append((self.name, time.ticks_us(), mem_alloc()))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        name, begin, alloc = self.stack.pop()
+        us = time.ticks_diff(time.ticks_us(), begin)
+        if self.collect:
+            gc.collect()
+        self.steps.append((len(self.stack), name, us, mem_alloc() - alloc, mem_free()))
+
+    def report(self):
+        # 嵌套的段缩进显示，按结束顺序排列
+        lines = [f"{'step':24s} {'ms':>7s} {'heap':>7s} {'free':>7s}"]
+        for depth, name, us, alloc, free in self.steps:
+            lines.append(f"{'  ' * depth + name:24s} {us / 1000:7.1f} {alloc:7d} {free:7d}")
+        total = time.ticks_diff(time.ticks_us(), self.begin)
+        lines.append(f"{'total':24s} {total / 1000:7.1f} {'':7s} {mem_free():7d}")
+        return '\n'.join(lines)
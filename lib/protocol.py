@@ -0,0 +1,279 @@
+import struct
+import time
+
+HEADER_FORMAT = '<3sBBBH'
+HEADER_SIZE = 8
+MAGIC = b'bee'
+MAX_LENGTH = 0xFFFF
+
+class Request:
+    HEADER_SIZE = 8
+    MAGIC = b'bee'  # 3字节魔数
+
+    WAV_FORMAT = 1
+    PCM_FORMAT = 2
+    ADPCM_FORMAT = 3    # IMA-ADPCM，见lib/codec.py
+    ULAW_FORMAT = 4     # G.711 µ-law
+    KEEPALIVE = 5       # 空闲心跳，无数据，服务端忽略即可；dummy为Caps.HELLO_FLAG时数据为能力声明
+    CLIP_HIT = 6        # 对Response.TOKEN_CLIP的应答，数据为key：设备直接播放缓存的音频
+    CLIP_MISS = 7       # 同上，缓存未命中：服务端接着发送该段音频，设备边播边存
+    FRAME_HINT = 8      # 数据为uint16：设备期望的下行帧长，协商了Caps.FEATURE_FRAME_HINT才发送，可在下行过程中随时到达
+
+    def __init__(self):
+        self.magic = Request.MAGIC  # 3字节魔数
+        self.type = 0               # 1字节类型
+        self.eof = 0                # 1字节标识结束
+        self.dummy = 0              # 1字节保留字段
+        self.length = 0             # 2字节长度
+
+        self.data = b''
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        req = cls()
+
+        # 使用 struct.unpack_from 解析前 8 字节
+        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
+        unpacked = struct.unpack_from(HEADER_FORMAT, data)
+        req.magic = unpacked[0]
+        req.type = unpacked[1]
+        req.eof = unpacked[2]
+        req.dummy = unpacked[3]
+        req.length = unpacked[4]
+
+        return req
+
+    def to_bytes(self):
+        # 使用 struct.pack 打包数据
+        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
+        packed = struct.pack(HEADER_FORMAT, self.magic, self.type, self.eof, self.dummy, self.length)
+        return packed + self.data
+
+class Response:
+    HEADER_SIZE = 8
+    MAGIC = b'bee'  # 3字节魔数
+    ASR_BIT = 0x2
+    LLM_BIT = 0x1
+    TTS_BIT = 0
+
+    PCM_DATA = 1
+    EXIT_CHAT = 2
+    TOKEN = 3           # 数据第一个字节为TOKEN_*类型，不认识的类型忽略
+    ADPCM_DATA = 4      # 24kHz IMA-ADPCM，帧格式同Request.ADPCM_FORMAT
+    HELLO = 5           # 对能力声明的应答，数据为服务端的选择，见Caps
+
+    # TOKEN_CLIP后跟8字节音频key（PCM的sha256前8字节，见lib/clips.py），设备回CLIP_HIT或CLIP_MISS；
+    # 未命中时服务端发送该段音频，再发一个不带key的TOKEN_CLIP表示结束
+    TOKEN_CLIP = 1
+    # TOKEN_TEXT后跟一段UTF-8文字（LLM流式输出的token），在音频到达之前就可以显示；多字节字符可能被拆在两段里
+    TOKEN_TEXT = 2
+
+    def __init__(self):
+        self.magic = Request.MAGIC  # 3字节魔数
+        self.type = 0               # 1字节类型
+        self.eof = 0                # 1字节标识结束
+        self.is_local = 0           # 1字节标识用的本地还是远端大模型：asr | llm | tts
+        self.length = 0             # 2字节长度
+
+        self.data = b''
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        resp = cls()
+
+        # 使用 struct.unpack_from 解析前 8 字节
+        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
+        unpacked = struct.unpack_from(HEADER_FORMAT, data)
+        resp.magic = unpacked[0]
+        resp.type = unpacked[1]
+        resp.eof = unpacked[2]
+        resp.is_local = unpacked[3]
+        resp.length = unpacked[4]
+
+        return resp
+
+    def to_bytes(self):
+        # 使用 struct.pack 打包数据
+        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
+        packed = struct.pack(HEADER_FORMAT, self.magic, self.type, self.eof, self.is_local, self.length)
+        return packed + self.data
+
+class Frame:
+    # 可复用的帧头编解码对象：帧头打包进预分配的8字节缓冲，数据部分单独发送，不做拼接
+    # recorder：会话录制（lib/session.py），为None时不录制
+    __slots__ = ('magic', 'type', 'eof', 'flags', 'length', 'header', 'header_mv', 'recorder')
+
+    def __init__(self):
+        self.magic = MAGIC
+        self.type = 0
+        self.eof = 0
+        self.flags = 0              # 请求中为dummy，响应中为is_local
+        self.length = 0
+        self.header = bytearray(HEADER_SIZE)
+        self.header_mv = memoryview(self.header)
+        self.recorder = None
+
+    def pack(self, type, eof, length, flags=0):
+        if length > MAX_LENGTH:
+            raise ValueError(f"Frame too long: {length}")
+        self.type = type
+        self.eof = eof
+        self.flags = flags
+        self.length = length
+        struct.pack_into(HEADER_FORMAT, self.header, 0, MAGIC, type, eof, flags, length)
+        return self.header_mv
+
+    def unpack(self, data):
+        self.magic, self.type, self.eof, self.flags, self.length = struct.unpack_from(HEADER_FORMAT, data)
+        if self.magic != MAGIC:
+            raise ValueError(f"Invalid magic: {self.magic}")
+        return self
+
+    def send(self, sock, type, data, eof=0, flags=0):
+        sock.sendall(self.pack(type, eof, len(data), flags))
+        if len(data):
+            sock.sendall(data)
+        if self.recorder:
+            self.recorder.sent(self.header_mv, data)
+
+class FrameReader:
+    # 基于readinto的帧读取：数据读入预分配缓冲区，按需返回缓冲区切片，不为每次recv分配新对象
+    # 帧头可能被TCP分段拆开，不足8字节时继续读取；缓冲区写满时把残留的半个帧头挪回开头
+    def __init__(self, stream, size=4096):
+        self.stream = stream        # 需支持readinto，设备上即socket本身
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.start = 0
+        self.end = 0
+        self.frame = Frame()
+        self.recorder = None
+
+        self.bytes_read = 0
+        self.reads = 0
+        self.wait_us = 0            # 阻塞在readinto上的累计时长，用来估计下行吞吐
+
+    def reset(self, stream):
+        # 重连后复用缓冲区
+        self.stream = stream
+        self.start = 0
+        self.end = 0
+
+    def buffered(self):
+        # 缓冲区里已读入、还没取走的字节数
+        return self.end - self.start
+
+    def fill(self):
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.end == len(self.buf):
+            n = self.end - self.start
+            self.buf[:n] = self.mv[self.start:self.end]
+            self.start = 0
+            self.end = n
+        begin = time.ticks_us()
+        n = self.stream.readinto(self.mv[self.end:])
+        self.wait_us += time.ticks_diff(time.ticks_us(), begin)
+        if not n:
+            raise EOFError("Connection closed")
+        self.end += n
+        self.bytes_read += n
+        self.reads += 1
+
+    def read_header(self):
+        while self.end - self.start < HEADER_SIZE:
+            self.fill()
+        self.frame.unpack(self.mv[self.start:self.start + HEADER_SIZE])
+        if self.recorder:
+            self.recorder.received(self.mv[self.start:self.start + HEADER_SIZE], self.frame.length)
+        self.start += HEADER_SIZE
+        return self.frame
+
+    def payload(self, length):
+        # 逐段返回帧数据，切片在下一次迭代前有效
+        while length > 0:
+            if self.start == self.end:
+                self.fill()
+            n = min(length, self.end - self.start)
+            if self.recorder:
+                self.recorder.data(self.mv[self.start:self.start + n])
+            yield self.mv[self.start:self.start + n]
+            self.start += n
+            length -= n
+
+    def read(self, length):
+        # 读出整个短帧的数据（如TOKEN），返回新分配的bytearray
+        data = bytearray(length)
+        pos = 0
+        for chunk in self.payload(length):
+            data[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        return data
+
+    def skip(self, length):
+        for _ in self.payload(length):
+            pass
+
+class Caps:
+    # 连接能力协商：设备连上后发一个KEEPALIVE帧，flags为HELLO_FLAG，数据为能力声明（offer）；
+    # 老服务端把它当心跳忽略，设备等不到应答就按原来的固定格式工作；新服务端回Response.HELLO，数据为选择结果
+    # 声明：版本、功能位、上行编码位图(1 << Request.*_FORMAT)、下行编码位图(1 << Response.*_DATA)、
+    #       上行最大帧长、下行最大帧长、麦克风采样率个数、播放采样率个数，之后是各采样率（uint16，按偏好排序）
+    # 选择：版本、功能位、上行编码、下行编码、上行帧长、麦克风采样率、播放采样率
+    VERSION = 1
+    HELLO_FLAG = 1
+    OFFER_FORMAT = '<BBBBHHBB'
+    OFFER_SIZE = 10
+    ANSWER_FORMAT = '<BBBBHHH'
+    ANSWER_SIZE = 10
+
+    FEATURE_CLIPS = 1       # 支持Response.TOKEN_CLIP本地缓存
+    FEATURE_FRAME_HINT = 2  # 设备用Request.FRAME_HINT调整下行帧长
+    FEATURE_TEXT = 4        # 设备显示Response.TOKEN_TEXT文字
+
+    def __init__(self, uplink, downlink, frame, mic_rate, play_rate, features=0, version=0):
+        self.version = version      # 0表示没有协商（老服务端），其余字段为本地的默认配置
+        self.features = features
+        self.uplink = uplink
+        self.downlink = downlink
+        self.frame = frame
+        self.mic_rate = mic_rate
+        self.play_rate = play_rate
+
+    @staticmethod
+    def offer(features, uplinks, downlinks, max_up, max_down, mic_rates, play_rates):
+        up = 0
+        for f in uplinks:
+            up |= 1 << f
+        down = 0
+        for f in downlinks:
+            down |= 1 << f
+        rates = tuple(mic_rates) + tuple(play_rates)
+        return (struct.pack(Caps.OFFER_FORMAT, Caps.VERSION, features, up, down, min(max_up, MAX_LENGTH),
+                            min(max_down, MAX_LENGTH), len(mic_rates), len(play_rates))
+                + struct.pack(f'<{len(rates)}H', *rates))
+
+    @staticmethod
+    def parse_offer(data):
+        # 服务端使用：返回dict，编码为Request/Response类型号的列表
+        version, features, up, down, max_up, max_down, n_mic, n_play = struct.unpack_from(Caps.OFFER_FORMAT, data)
+        rates = struct.unpack_from(f'<{n_mic + n_play}H', data, Caps.OFFER_SIZE)
+        return {
+            'version': version, 'features': features,
+            'uplinks': [f for f in range(8) if up & (1 << f)],
+            'downlinks': [f for f in range(8) if down & (1 << f)],
+            'max_up': max_up, 'max_down': max_down,
+            'mic_rates': list(rates[:n_mic]), 'play_rates': list(rates[n_mic:]),
+        }
+
+    def pack(self):
+        return struct.pack(Caps.ANSWER_FORMAT, self.version, self.features, self.uplink, self.downlink,
+                           self.frame, self.mic_rate, self.play_rate)
+
+    @classmethod
+    def unpack(cls, data):
+        version, features, uplink, downlink, frame, mic_rate, play_rate = struct.unpack_from(cls.ANSWER_FORMAT, data)
+        return cls(uplink, downlink, frame, mic_rate, play_rate, features, version)
+
+    def __repr__(self):
+        return (f"Caps(v{self.version} up={self.uplink} down={self.downlink} frame={self.frame} "
+                f"mic={self.mic_rate} play={self.play_rate} features={self.features})")
@@ -0,0 +1,111 @@
+import struct
+import time
+
+# 会话录制文件：文件头之后按时间顺序排列的帧记录，两个方向的帧头原样保存，数据部分可选
+# 文件头：魔数、版本、标志(FLAG_PAYLOAD)、保留
+# 每条记录：方向、距上一条记录的微秒数、随后保存的数据字节数（不保存数据时为0），接着是8字节原始帧头和数据
+FILE_FORMAT = '<4sBBH'
+FILE_SIZE = struct.calcsize(FILE_FORMAT)
+FILE_MAGIC = b'bses'
+FILE_VERSION = 1
+FLAG_PAYLOAD = 1
+
+RECORD_FORMAT = '<BIH'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+FRAME_HEADER_SIZE = 8
+
+UPLINK = 0          # 设备发往服务端的Request帧
+DOWNLINK = 1        # 服务端发往设备的Response帧
+CONNECT = 2         # 建立了新连接，帧头为全0
+DIRECTIONS = ('up', 'down', 'connect')
+
+NO_HEADER = bytes(FRAME_HEADER_SIZE)
+
+class SessionRecorder:
+    # 挂在Frame/FrameReader的recorder上：发送的帧记为sent，收到的帧记为received，数据分块经data()写入
+    # device=False时方向反过来，供PC上扮演服务端的回放工具录制
+    # 文件超过max_bytes后停止录制，不覆盖已有内容，避免占满flash
+    def __init__(self, path, payload=False, max_bytes=262144, device=True):
+        self.path = path
+        self.payload = payload
+        self.max_bytes = max_bytes
+        self.send_direction = UPLINK if device else DOWNLINK
+        self.receive_direction = DOWNLINK if device else UPLINK
+        self.record = bytearray(RECORD_SIZE)
+        self.file = open(path, 'wb')
+        self.file.write(struct.pack(FILE_FORMAT, FILE_MAGIC, FILE_VERSION, FLAG_PAYLOAD if payload else 0, 0))
+        self.size = FILE_SIZE
+        self.last = time.ticks_us()
+        self.accepting = False      # 当前帧的数据是否写入
+        self.frames = 0
+        self.full = False
+
+    def frame(self, direction, header, length):
+        if self.file is None:
+            return
+        if not self.payload:
+            length = 0
+        needed = RECORD_SIZE + FRAME_HEADER_SIZE + length
+        if self.size + needed > self.max_bytes:
+            self.full = True
+            self.close()
+            return
+        now = time.ticks_us()
+        struct.pack_into(RECORD_FORMAT, self.record, 0, direction, time.ticks_diff(now, self.last), length)
+        self.last = now
+        self.file.write(self.record)
+        self.file.write(header)
+        self.size += needed
+        self.frames += 1
+        self.accepting = length > 0
+
+    def sent(self, header, data):
+        self.frame(self.send_direction, header, len(data))
+        if self.accepting:
+            self.file.write(data)
+            self.accepting = False
+
+    def received(self, header, length):
+        self.frame(self.receive_direction, header, length)
+
+    def data(self, chunk):
+        if self.accepting:
+            self.file.write(chunk)
+
+    def connect(self):
+        self.frame(CONNECT, NO_HEADER, 0)
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+        self.accepting = False
+
+    def stats(self):
+        return {'frames': self.frames, 'bytes': self.size, 'full': self.full}
+
+def read(f):
+    # 逐条读出记录：(方向, 距录制开始的微秒数, 8字节帧头, 数据)，未保存数据时数据为None
+    head = f.read(FILE_SIZE)
+    if len(head) < FILE_SIZE:
+        return
+    magic, version, flags, _ = struct.unpack(FILE_FORMAT, head)
+    if magic != FILE_MAGIC or version != FILE_VERSION:
+        raise ValueError(f"Not a session file: {magic}")
+    t = 0
+    while True:
+        record = f.read(RECORD_SIZE)
+        if len(record) < RECORD_SIZE:
+            return
+        direction, delta, length = struct.unpack(RECORD_FORMAT, record)
+        header = f.read(FRAME_HEADER_SIZE)
+        data = f.read(length) if flags & FLAG_PAYLOAD else None
+        if len(header) < FRAME_HEADER_SIZE or (data is not None and len(data) < length):
+            # 录制中途断电，最后一条不完整
+            return
+        t += delta
+        yield direction, t, header, data
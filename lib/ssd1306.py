@@ -2,6 +2,7 @@
 
 from micropython import const
 import framebuf
+import micropython
 
 
 # register definitions
@@ -23,6 +24,25 @@ SET_PRECHARGE = const(0xD9)
 SET_VCOM_DESEL = const(0xDB)
 SET_CHARGE_PUMP = const(0x8D)
 
+# approximate bus bytes spent on the address setup of one refresh window
+WINDOW_COST = const(16)
+
+@micropython.native
+def diff_first(a, b, start, end):
+    for i in range(start, end):
+        if a[i] != b[i]:
+            return i
+    return -1
+
+
+@micropython.native
+def diff_last(a, b, start, end):
+    for i in range(end - 1, start - 1, -1):
+        if a[i] != b[i]:
+            return i
+    return -1
+
+
 # Subclassing FrameBuffer provides support for graphics primitives
 # http://docs.micropython.org/en/latest/pyboard/library/framebuf.html
 class SSD1306(framebuf.FrameBuffer):
@@ -32,11 +52,19 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        self.buffer_mv = memoryview(self.buffer)
+        # shadow holds what the panel currently shows; show() only sends
+        # the column window of each page that differs from it
+        self.shadow = bytearray(len(self.buffer))
+        self.full = True
+        self.dirty0 = [-1] * self.pages
+        self.dirty1 = [0] * self.pages
+        self.window_cmds = bytearray((SET_COL_ADDR, 0, 0, SET_PAGE_ADDR, 0, 0))
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.init_display()
 
     def init_display(self):
-        for cmd in (
+        self.write_cmds(bytes((
             SET_DISP | 0x00,  # off
             # address setting
             SET_MEM_ADDR,
@@ -66,10 +94,10 @@ class SSD1306(framebuf.FrameBuffer):
             # charge pump
             SET_CHARGE_PUMP,
             0x10 if self.external_vcc else 0x14,
-            SET_DISP | 0x01,
-        ):  # on
-            self.write_cmd(cmd)
+            SET_DISP | 0x01,  # on
+        )))
         self.fill(0)
+        self.full = True
         self.show()
 
     def poweroff(self):
@@ -85,20 +113,59 @@ class SSD1306(framebuf.FrameBuffer):
     def invert(self, invert):
         self.write_cmd(SET_NORM_INV | (invert & 1))
 
-    def show(self):
-        x0 = 0
-        x1 = self.width - 1
+    def invalidate(self):
+        self.full = True
+
+    def show(self, full=False):
+        width = self.width
+        if not (full or self.full):
+            # find the changed column range of each page
+            cost = 0
+            for page in range(self.pages):
+                start = page * width
+                c0 = diff_first(self.buffer, self.shadow, start, start + width)
+                if c0 < 0:
+                    self.dirty0[page] = -1
+                    continue
+                c1 = diff_last(self.buffer, self.shadow, c0, start + width) + 1
+                self.dirty0[page] = c0
+                self.dirty1[page] = c1
+                cost += c1 - c0 + WINDOW_COST
+            # many scattered windows cost more than one full transfer
+            full = cost > len(self.buffer)
+        if full or self.full:
+            self.write_window(0, self.pages - 1, 0, width - 1, self.buffer_mv)
+            self.shadow[:] = self.buffer
+            self.full = False
+            return
+        for page in range(self.pages):
+            c0 = self.dirty0[page]
+            if c0 < 0:
+                continue
+            c1 = self.dirty1[page]
+            start = page * width
+            self.write_window(page, page, c0 - start, c1 - start - 1, self.buffer_mv[c0:c1])
+            self.shadow[c0:c1] = self.buffer_mv[c0:c1]
+
+    def write_window(self, page0, page1, x0, x1, buf):
         if self.width == 64:
             # displays with width of 64 pixels are shifted by 32
             x0 += 32
             x1 += 32
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        cmds = self.window_cmds
+        cmds[1] = x0
+        cmds[2] = x1
+        cmds[4] = page0
+        cmds[5] = page1
+        self.write_addressed(cmds, buf)
+
+    def write_cmds(self, cmds):
+        for cmd in cmds:
+            self.write_cmd(cmd)
+
+    def write_addressed(self, cmds, buf):
+        self.write_cmds(cmds)
+        self.write_data(buf)
 
 
 class SSD1306_I2C(SSD1306):
@@ -107,6 +174,10 @@ class SSD1306_I2C(SSD1306):
         self.addr = addr
         self.temp = bytearray(2)
         self.write_list = [b"\x40", None]  # Co=0, D/C#=1
+        self.cmd_list = [b"\x00", None]  # Co=0, D/C#=0
+        # Co=1 before each command byte, then Co=0 D/C#=1 for the data
+        self.addressed = bytearray(b"\x80\x00" * 6 + b"\x40")
+        self.addressed_list = [self.addressed, None]
         super().__init__(width, height, external_vcc)
 
     def write_cmd(self, cmd):
@@ -118,6 +189,18 @@ class SSD1306_I2C(SSD1306):
         self.write_list[1] = buf
         self.i2c.writevto(self.addr, self.write_list)
 
+    def write_cmds(self, cmds):
+        # whole command sequence in one transaction
+        self.cmd_list[1] = cmds
+        self.i2c.writevto(self.addr, self.cmd_list)
+
+    def write_addressed(self, cmds, buf):
+        # address setup and data in one transaction
+        for i in range(len(cmds)):
+            self.addressed[i * 2 + 1] = cmds[i]
+        self.addressed_list[1] = buf
+        self.i2c.writevto(self.addr, self.addressed_list)
+
 
 class SSD1306_SPI(SSD1306):
     def __init__(self, width, height, spi, dc, res, cs, external_vcc=False):
@@ -146,6 +229,14 @@ class SSD1306_SPI(SSD1306):
         self.spi.write(bytearray([cmd]))
         self.cs(1)
 
+    def write_cmds(self, cmds):
+        self.spi.init(baudrate=self.rate, polarity=0, phase=0)
+        self.cs(1)
+        self.dc(0)
+        self.cs(0)
+        self.spi.write(cmds)
+        self.cs(1)
+
     def write_data(self, buf):
         self.spi.init(baudrate=self.rate, polarity=0, phase=0)
         self.cs(1)
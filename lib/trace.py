@@ -0,0 +1,159 @@
+import struct
+import time
+from array import array
+
+# 二进制记录：魔数、版本、结果、轮次、各时间点(us，相对本轮起点，未到达为-1)、各阶段字节数和块数
+RECORD_FORMAT = '<2sBBI9i8I'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_MAGIC = b'tr'
+RECORD_VERSION = 2
+# 版本1没有token、audio两个时间点
+V1_FORMAT = '<2sBBI7i8I'
+V1_SIZE = struct.calcsize(V1_FORMAT)
+
+POINTS = ('press', 'conn', 'mic', 'eof', 'resp', 'play', 'drain', 'token', 'audio')
+STAGES = ('mic', 'up', 'down', 'play')
+RESULTS = ('ok', 'exit', 'error', 'cancel')
+
+class Trace:
+    # 单轮对话的延迟跟踪：各时间点只记录第一次到达的时刻，各阶段累计字节数和块数
+    # 热路径上只有一次比较和数组赋值，不分配内存，可以常开
+    PRESS = 0       # 按键（连续对话时为本轮开始）
+    CONNECT = 1     # 连接就绪
+    MIC = 2         # 第一帧录音
+    EOF = 3         # 最后一帧（eof）发出
+    RESPONSE = 4    # 收到第一个响应头
+    PLAY = 5        # 第一次写I2S
+    DRAIN = 6       # 播放缓冲排空
+    TOKEN = 7       # 第一段文字（TOKEN_TEXT）
+    AUDIO = 8       # 第一帧音频数据（含本地缓存命中）
+
+    STAGE_MIC = 0
+    STAGE_UPLINK = 1
+    STAGE_DOWNLINK = 2
+    STAGE_PLAYBACK = 3
+
+    OK = 0
+    EXIT = 1
+    ERROR = 2
+    CANCEL = 3      # 等待或播放中按键取消
+
+    def __init__(self, path=None, max_bytes=16384):
+        self.path = path            # 记录追加写入的文件，None时只打印摘要
+        self.max_bytes = max_bytes  # 文件超过该大小时清空重写
+        self.points = array('i', [-1] * len(POINTS))
+        self.bytes = array('I', [0] * len(STAGES))
+        self.chunks = array('I', [0] * len(STAGES))
+        self.record = bytearray(RECORD_SIZE)
+        self.pressed = None
+        self.begin = 0
+        self.turn = 0
+
+    def press(self, t=None):
+        # 可在按键中断里调用，t为按键时刻
+        self.pressed = time.ticks_us() if t is None else t
+
+    def start(self):
+        for i in range(len(POINTS)):
+            self.points[i] = -1
+        for i in range(len(STAGES)):
+            self.bytes[i] = 0
+            self.chunks[i] = 0
+        self.turn += 1
+        if self.pressed is None:
+            self.begin = time.ticks_us()
+        else:
+            self.begin = self.pressed
+            self.pressed = None
+            self.points[Trace.PRESS] = 0
+
+    def mark(self, point):
+        if self.points[point] < 0:
+            self.points[point] = time.ticks_diff(time.ticks_us(), self.begin)
+
+    def add(self, stage, n):
+        self.bytes[stage] += n
+        self.chunks[stage] += 1
+
+    def finish(self, result=0):
+        struct.pack_into(RECORD_FORMAT, self.record, 0, RECORD_MAGIC, RECORD_VERSION, result, self.turn,
+                         *self.points, *self.bytes, *self.chunks)
+        print(self.summary(result))
+        if self.path:
+            self.save()
+
+    def save(self):
+        try:
+            mode = 'ab'
+            try:
+                import os
+                if os.stat(self.path)[6] + RECORD_SIZE > self.max_bytes:
+                    mode = 'wb'
+                else:
+                    # 记录定长，旧版本的文件清空重写
+                    with open(self.path, 'rb') as f:
+                        head = f.read(3)
+                    if len(head) == 3 and head[2] != RECORD_VERSION:
+                        mode = 'wb'
+            except OSError:
+                pass
+            with open(self.path, mode) as f:
+                f.write(self.record)
+        except Exception as e:
+            print('trace save failed:', e)
+
+    def summary(self, result=0):
+        # 例：trace 3 ok press 0.0 conn 0.1 mic 5.2 eof 2689.4 resp 2932.0 play 2935.1 drain 4501.7 | mic 86016/21 up ...
+        items = [f"trace {self.turn} {RESULTS[result]}"]
+        for i, name in enumerate(POINTS):
+            t = self.points[i]
+            items.append(f"{name} {t / 1000:.1f}" if t >= 0 else f"{name} -")
+        items.append('|')
+        for i, name in enumerate(STAGES):
+            items.append(f"{name} {self.bytes[i]}/{self.chunks[i]}")
+        return ' '.join(items)
+
+def record_size(buf, offset=0):
+    return V1_SIZE if buf[offset + 2] == 1 else RECORD_SIZE
+
+def is_record(buf, offset=0):
+    # 魔数、版本、结果都对且长度够一条记录；"trace ..."摘要行也以b'tr'开头，不能只看魔数
+    if len(buf) < offset + 4 or buf[offset:offset + 2] != RECORD_MAGIC:
+        return False
+    if buf[offset + 2] not in (1, RECORD_VERSION) or buf[offset + 3] >= len(RESULTS):
+        return False
+    return offset + record_size(buf, offset) <= len(buf)
+
+def unpack(buf, offset=0):
+    # 解析一条二进制记录，时间点单位为ms
+    if not is_record(buf, offset):
+        raise ValueError("Invalid trace record")
+    v1 = buf[offset + 2] == 1
+    fields = struct.unpack_from(V1_FORMAT if v1 else RECORD_FORMAT, buf, offset)
+    n = 7 if v1 else len(POINTS)
+    m = len(STAGES)
+    points = fields[4:4 + n]
+    return {
+        'turn': fields[3],
+        'result': RESULTS[fields[2]],
+        'points': {name: (points[i] / 1000 if points[i] >= 0 else None) for i, name in enumerate(POINTS[:n])},
+        'bytes': dict(zip(STAGES, fields[4 + n:4 + n + m])),
+        'chunks': dict(zip(STAGES, fields[4 + n + m:])),
+    }
+
+def parse(line):
+    # 解析串口日志里的摘要行，格式同unpack的返回值；不是摘要行时返回None
+    line = line.strip()
+    if not line.startswith('trace '):
+        return None
+    head, _, tail = line.partition(' | ')
+    words = head.split()
+    record = {'turn': int(words[1]), 'result': words[2], 'points': {}, 'bytes': {}, 'chunks': {}}
+    for i in range(3, len(words) - 1, 2):
+        record['points'][words[i]] = None if words[i + 1] == '-' else float(words[i + 1])
+    words = tail.split()
+    for i in range(0, len(words) - 1, 2):
+        n, c = words[i + 1].split('/')
+        record['bytes'][words[i]] = int(n)
+        record['chunks'][words[i]] = int(c)
+    return record
@@ -0,0 +1,91 @@
+try:
+    import micropython
+except ImportError:
+    # PC上运行基准测试时没有micropython模块
+    class micropython:
+        @staticmethod
+        def native(f):
+            return f
+
+@micropython.native
+def frame_features(buf, start, end, step):
+    # 16位小端PCM：返回平均幅度和过零次数，每step个采样取一个以降低开销
+    total = 0
+    zc = 0
+    prev = 0
+    count = 0
+    stride = step * 2
+    for i in range(start, end - 1, stride):
+        s = buf[i] | (buf[i + 1] << 8)
+        if s & 0x8000:
+            s -= 0x10000
+            total -= s
+        else:
+            total += s
+        if (s ^ prev) < 0:
+            zc += 1
+        prev = s
+        count += 1
+    if not count:
+        return 0, 0
+    return total // count, zc
+
+class VAD:
+    # 能量+过零率端点检测：检测到语音后连续静音超过hangover_ms即判定说话结束
+    # 一直没有语音时lead_ms后结束，录音总时长上限由调用方的录音长度控制
+    def __init__(self, rate=16000, frame_ms=16, hangover_ms=600, lead_ms=3000, min_speech_ms=160,
+                 ratio=3, min_level=200, zcr_min=40, step=2):
+        self.frame_bytes = rate * frame_ms // 1000 * 2
+        self.frame_ms = frame_ms
+        self.hangover_ms = hangover_ms
+        self.lead_ms = lead_ms
+        self.min_speech_ms = min_speech_ms
+        self.ratio = ratio
+        self.min_level = min_level
+        self.zcr_min = zcr_min      # 每帧过零次数（按step抽样后）
+        self.step = step
+        self.reset()
+
+    def reset(self):
+        self.elapsed_ms = 0
+        self.speech_ms = 0
+        self.silence_ms = 0
+        self.floor = -1
+        self.triggered = False
+        self.done = False
+        self.end_ms = 0             # 最后一帧语音结束的时刻
+
+    def is_speech(self, level, zc):
+        if self.floor < 0:
+            self.floor = min(level, self.min_level)
+        threshold = max(self.floor * self.ratio, self.min_level)
+        if level >= threshold:
+            return True
+        # 清辅音能量低但过零率高
+        if level * 2 >= threshold and zc >= self.zcr_min:
+            return True
+        # 噪声底缓慢跟踪
+        self.floor += (level - self.floor) >> 4
+        return False
+
+    def feed(self, buf, n):
+        # 返回True表示应当结束录音，buf为本次读到的PCM数据
+        fb = self.frame_bytes
+        for start in range(0, n - fb + 1, fb):
+            level, zc = frame_features(buf, start, start + fb, self.step)
+            self.elapsed_ms += self.frame_ms
+            if self.is_speech(level, zc):
+                self.speech_ms += self.frame_ms
+                self.silence_ms = 0
+                self.end_ms = self.elapsed_ms
+                if self.speech_ms >= self.min_speech_ms:
+                    self.triggered = True
+            else:
+                self.silence_ms += self.frame_ms
+                if not self.triggered:
+                    self.speech_ms = 0
+            if self.triggered and self.silence_ms >= self.hangover_ms:
+                self.done = True
+            elif not self.triggered and self.elapsed_ms >= self.lead_ms:
+                self.done = True
+        return self.done
@@ -1,9 +1,24 @@
-from machine import I2S
-from machine import Pin
-from lib import happy
+from lib.profiler import Profiler
+# 启动阶段各模块的导入耗时和堆占用，PROFILE_BOOT为True时开机打印
+prof = Profiler()
+with prof('machine'):
+    from machine import I2S
+    from machine import Pin
+with prof('lib.happy'):
+    from lib import happy
+with prof('lib.jitter'):
+    from lib.jitter import JitterBuffer
+with prof('lib.link'):
+    from lib.link import Link
+with prof('lib.protocol'):
+    from lib.protocol import Request, Response, Frame, FrameReader, Caps, HEADER_SIZE, MAX_LENGTH
+with prof('lib.button'):
+    from lib.button import Button
+with prof('lib.i2s'):
+    from lib.i2s import I2SPort
 import time
-import socket
-import struct
+# lib.pipeline、lib.vad、lib.codec、lib.clips、lib.session、lib.framing、lib.trace、lib.memory和asyncio
+# 按配置在用到时才导入；Trace、Memory在main()里按开关导入为全局名，其余代码只在对象存在时用到
 
 AUDIO_SAMPLE_RATE = 24000
 MIC_SAMPLE_RATE = 16000
@@ -13,127 +28,157 @@ RECORD_TIME_IN_SECONDS = 5
 RECORD_BUF_SIZE = RECORD_TIME_IN_SECONDS * MIC_SAMPLE_RATE * BITS // 8
 
 SOCKET_BUF_SIZE = 4096
+I2S_BUF_SIZE = 32768
+
+# 上行音频格式：Request.PCM_FORMAT / Request.ADPCM_FORMAT(4:1) / Request.ULAW_FORMAT(2:1)，压缩格式需后台支持
+UPLINK_FORMAT = Request.PCM_FORMAT
+
+# 连接能力协商：连上后向服务端声明支持的编码、采样率和帧长，按服务端的选择设置上行编码、录音分块和I2S采样率；
+# 老服务端不应答，HELLO_TIMEOUT_MS后按上面的固定配置工作，为0时不协商
+# 采样率按偏好排序；播放抖动缓冲按开机时的AUDIO_SAMPLE_RATE分配，PLAY_RATES不要超过它
+HELLO_TIMEOUT_MS = 500
+MIC_RATES = (16000, 8000)
+PLAY_RATES = (24000, 16000)
+UPLINK_FORMATS = (Request.PCM_FORMAT, Request.ADPCM_FORMAT, Request.ULAW_FORMAT)
+DOWNLINK_FORMATS = (Response.PCM_DATA, Response.ADPCM_DATA)
+
+# 自适应帧长：上行按实测发送耗时在[FRAME_MIN, SOCKET_BUF_SIZE]内调整每块录音的字节数（不超过协商的帧长）；
+# 上行只会缩小、不会超过SOCKET_BUF_SIZE：4096字节已是128ms的16kHz录音，帧再大最后一块要等更久才能带eof发出，
+# 端点检测省下的时间被吃掉，录音缓冲池和编码缓冲也要按最大帧长预分配，堆放不下，所以上行不做增大；
+# 服务端支持Caps.FEATURE_FRAME_HINT时用Request.FRAME_HINT告诉它期望的下行帧长：播放起步和重新缓冲时用FRAME_MIN，
+# 之后按接收吞吐逐步增大到DOWNLINK_FRAME_MAX；帧长约为吞吐乘FRAME_TARGET_MS。为False时固定用协商的帧长
+# 默认关闭：tools/bench_frames.py在各种链路上都没有测出eof到开始播放的延迟比固定帧长更低
+ADAPTIVE_FRAMES = False
+FRAME_MIN = 1024
+FRAME_TARGET_MS = 40
+DOWNLINK_FRAME_MAX = 16384
+
+# 流式文字：服务端支持时在音频之前发送LLM输出的文字（Response.TOKEN_TEXT），逐段显示在OLED上，写满后向上滚动；
+# 两次刷新屏幕至少间隔TEXT_REFRESH_MS，期间到达的文字合并到下一次刷新
+TEXT_STREAM = True
+TEXT_REFRESH_MS = 200
+
+# 端点检测：说话结束后立即发送eof，不再固定录满RECORD_TIME_IN_SECONDS
+VAD_ENDPOINTING = True
+VAD_MAX_SECONDS = 8
+VAD_MAX_BUF_SIZE = VAD_MAX_SECONDS * MIC_SAMPLE_RATE * BITS // 8
+
+# 录音与上传并行：录音任务和发送任务通过缓冲池解耦，Wi-Fi卡顿时不再阻塞I2S读取
+PIPELINED_CAPTURE = True
+PIPELINE_BUFFERS = 4
+
+# OLED总线：OLED_I2C_ID为None时使用SoftI2C
+OLED_I2C_ID = 0
+OLED_I2C_FREQ = 400000
+
+# 播放抖动缓冲：开播前预缓冲的时长及其自适应范围
+JITTER_PREROLL_MS = 120
+JITTER_MIN_MS = 60
+JITTER_MAX_MS = 400
+
+# 快速启动：记住上次连接的AP（BSSID/信道），可选静态IP (ip, netmask, gateway, dns)，NTP在后台同步
+WIFI_FAST_BOOT = True
+WIFI_STATIC = None
+WIFI_CACHE_FILE = 'wifi.json'
+NTP_DEADLINE_MS = 15000
+
+# 常用回复的本地音频缓存（Response.TOKEN_CLIP），CLIP_CACHE_DIR为None时关闭，所有回复都由服务端发送
+CLIP_CACHE_DIR = 'clips'
+CLIP_CACHE_BYTES = 512 * 1024
+
+# 按键：消抖时间；空闲时最长等待多久调用一次Connection.maintain()（心跳和重连）
+BUTTON_DEBOUNCE_MS = 200
+IDLE_MAINTAIN_MS = 1000
+
+# 开机时打印启动阶段的导入和初始化统计
+PROFILE_BOOT = True
+
+# 每轮对话的延迟跟踪：TRACE为True时每轮打印摘要行，TRACE_FILE不为None时同时把二进制记录追加到该文件，
+# 用tools/trace_hist.py统计；为False时不跟踪，也不导入lib.trace
+TRACE = True
+TRACE_FILE = None
+
+# 会话录制：SESSION_FILE不为None时把每次开机后两个方向的帧头和到达时刻写入该文件，用tools/session.py回放；
+# SESSION_PAYLOAD为True时同时保存音频数据，可按字节复现，但会频繁写flash；文件达到SESSION_MAX_BYTES后停止录制
+SESSION_FILE = None
+SESSION_PAYLOAD = False
+SESSION_MAX_BYTES = 256 * 1024
+
+# 堆内存：MEM_STATS为True时按录音/上行/下行/OLED阶段统计每轮的分配字节数、自动GC次数和最低剩余堆，每轮打印；
+# GC_SAFE_POINTS为True时在回合之间和空闲时主动回收，并把gc.threshold设为回收后剩余堆减去GC_RESERVE_BYTES，
+# 避免自动GC落在播放中造成断音；空闲时新分配超过GC_IDLE_BYTES才回收；两者都为False时不导入lib.memory
+MEM_STATS = True
+GC_SAFE_POINTS = True
+GC_RESERVE_BYTES = 16 * 1024
+GC_IDLE_BYTES = 4096
 
 class AudioPlayer:
-    def __init__(self, sck_pin, ws_pin, sd_pin):
+    def __init__(self, port, sck_pin, ws_pin, sd_pin, trace=None):
+        self.port = port
         self.sck_pin = sck_pin
         self.ws_pin = ws_pin
         self.sd_pin = sd_pin
+        self.trace = trace
+        self.rate = AUDIO_SAMPLE_RATE   # 协商后可能改变
+        self.stopped = False
+        self.written = 0                # 本轮写入的字节数
         # self.audio = I2S(0, sck=self.sck_pin, ws=self.ws_pin, sd=self.sd_pin, mode=I2S.TX, bits=16, format=I2S.STEREO, rate=44100, ibuf=20000)
-        self.audio = I2S(0, sck=self.sck_pin, ws=self.ws_pin, sd=self.sd_pin, mode=I2S.TX, bits=BITS, format=FORMAT, rate=AUDIO_SAMPLE_RATE, ibuf=32768)
 
     def __enter__(self):
+        self.stopped = False
+        self.written = 0
+        self.audio = self.port.open(self, I2S.TX, self.sck_pin, self.ws_pin, self.sd_pin, self.rate)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        empty = False
-        def empty_callback(*args, **kwargs):
-            nonlocal empty
-            empty = True
-        self.audio.irq(empty_callback)
-        self.audio.write(b'\x00\x00')
-        while not empty:
-            print('waiting for empty buffer')
-            time.sleep(0.01)
-        time.sleep(1)
-        del self.audio
+        # 按已写入的样本数等待播放完毕，外设留给下一轮复用
+        # 没播放过（EXIT_CHAT、只有文字）或已取消的轮次不记DRAIN，免得统计里出现没有play的排空时间
+        if not self.stopped:
+            self.port.drain()
+            if self.trace and self.written:
+                self.trace.mark(Trace.DRAIN)
+
+    def stop(self):
+        # 取消播放：丢弃队列中尚未播放的音频
+        self.stopped = True
+        self.port.abort()
 
     def write(self, data):
-        return self.audio.write(data)
+        if self.trace:
+            self.trace.mark(Trace.PLAY)
+            self.trace.add(Trace.STAGE_PLAYBACK, len(data))
+        n = self.port.write(data)
+        self.written += n
+        return n
 
 class MIC:
-    def __init__(self, sck_pin, ws_pin, sd_pin):
+    def __init__(self, port, sck_pin, ws_pin, sd_pin):
+        self.port = port
         self.sck_pin = sck_pin
         self.ws_pin = ws_pin
         self.sd_pin = sd_pin
-        self.mic = I2S(0, sck=self.sck_pin, ws=self.ws_pin, sd=self.sd_pin, mode=I2S.RX, bits=BITS, format=FORMAT, rate=MIC_SAMPLE_RATE, ibuf=32768)
+        self.rate = MIC_SAMPLE_RATE     # 协商后可能改变
 
     def __enter__(self):
+        self.mic = self.port.open(self, I2S.RX, self.sck_pin, self.ws_pin, self.sd_pin, self.rate)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        del self.mic
+        pass
 
     def read(self, data):
         return self.mic.readinto(data)
 
-class Request:
-    HEADER_SIZE = 8
-    MAGIC = b'bee'  # 3字节魔数
-
-    WAV_FORMAT = 1
-    PCM_FORMAT = 2
-
-    def __init__(self):
-        self.magic = Request.MAGIC  # 3字节魔数
-        self.type = 0               # 1字节类型
-        self.eof = 0                # 1字节标识结束
-        self.dummy = 0              # 1字节保留字段
-        self.length = 0             # 2字节长度
-
-        self.data = b''
-
-    @classmethod
-    def from_bytes(cls, data: bytes):
-        req = cls()
-
-        # 使用 struct.unpack_from 解析前 8 字节
-        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
-        unpacked = struct.unpack_from('<3sBBBH', data)
-        req.magic = unpacked[0]
-        req.type = unpacked[1]
-        req.eof = unpacked[2]
-        req.dummy = unpacked[3]
-        req.length = unpacked[4]
-
-        return req
-
-    def to_bytes(self):
-        # 使用 struct.pack 打包数据
-        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
-        packed = struct.pack('<3sBBBH', self.magic, self.type, self.eof, self.dummy, self.length)
-        return packed + self.data
-
-class Response:
-    HEADER_SIZE = 8
-    MAGIC = b'bee'  # 3字节魔数
-    ASR_BIT = 0x2
-    LLM_BIT = 0x1
-    TTS_BIT = 0
-
-    PCM_DATA = 1
-    EXIT_CHAT = 2
-    TOKEN = 3
-
-    def __init__(self):
-        self.magic = Request.MAGIC  # 3字节魔数
-        self.type = 0               # 1字节类型
-        self.eof = 0                # 1字节标识结束
-        self.is_local = 0           # 1字节标识用的本地还是远端大模型：asr | llm | tts
-        self.length = 0             # 2字节长度
-
-        self.data = b''
-
-    @classmethod
-    def from_bytes(cls, data: bytes):
-        resp = cls()
-
-        # 使用 struct.unpack_from 解析前 8 字节
-        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
-        unpacked = struct.unpack_from('<3sBBBH', data)
-        resp.magic = unpacked[0]
-        resp.type = unpacked[1]
-        resp.eof = unpacked[2]
-        resp.is_local = unpacked[3]
-        resp.length = unpacked[4]
-
-        return resp
-
-    def to_bytes(self):
-        # 使用 struct.pack 打包数据
-        # 格式字符串：3s B B B H -> 3字节字符串、1字节无符号char、1字节、1字节、2字节短整型
-        packed = struct.pack('<3sBBBH', self.magic, self.type, self.eof, self.is_local, self.length)
-        return packed + self.data
+    def stream(self):
+        import asyncio
+        return asyncio.StreamReader(self.mic)
+
+class State:
+    # 对话状态：空闲时按键开始录音，录音中按键提前结束录音，等待或播放中按键取消本轮回复回到空闲
+    IDLE = 0
+    RECORDING = 1
+    WAITING = 2
+    PLAYING = 3
 
 class ExitChatException(Exception):
     def __init__(self, *args, **kwargs):
@@ -142,10 +187,49 @@ class ExitChatException(Exception):
 class Connection:
     HOST = 'dev.lan'
     PORT = 3000
+    KEEPALIVE_MS = 15000
+    DNS_TTL_MS = 600000
 
-    def __init__(self, oled):
+    def __init__(self, oled, trace=None, clips=None, recorder=None, mem=None):
         self.socket = None
+        self.writer = None
+        self.reader = FrameReader(None, SOCKET_BUF_SIZE)
         self.oled = oled
+        self.trace = trace
+        self.clips = clips
+        self.mem = mem
+        self.link = Link(Connection.HOST, Connection.PORT, Connection.KEEPALIVE_MS, Connection.DNS_TTL_MS,
+                         on_connect=self.attach)
+        self.tx = Frame()
+        self.recorder = recorder
+        if recorder:
+            self.tx.recorder = recorder
+            self.reader.recorder = recorder
+            self.link.frame.recorder = recorder
+        # 老服务端（不应答能力声明）使用的固定配置
+        self.legacy = Caps(UPLINK_FORMAT, Response.PCM_DATA, SOCKET_BUF_SIZE, MIC_SAMPLE_RATE, AUDIO_SAMPLE_RATE)
+        self.caps = self.legacy
+        features = ((Caps.FEATURE_CLIPS if clips else 0) | (Caps.FEATURE_FRAME_HINT if ADAPTIVE_FRAMES else 0)
+                    | (Caps.FEATURE_TEXT if TEXT_STREAM else 0))
+        self.offer = Caps.offer(features, UPLINK_FORMATS, DOWNLINK_FORMATS,
+                                SOCKET_BUF_SIZE, MAX_LENGTH, MIC_RATES, PLAY_RATES)
+        self.uplink_sizer = None
+        self.downlink_sizer = None
+        if ADAPTIVE_FRAMES:
+            from lib.framing import FrameSizer
+            self.uplink_sizer = FrameSizer(FRAME_MIN, SOCKET_BUF_SIZE, FRAME_TARGET_MS)
+            self.downlink_sizer = FrameSizer(FRAME_MIN, DOWNLINK_FRAME_MAX, FRAME_TARGET_MS)
+        self.hint_buf = bytearray(2)
+        self.hinted = 0             # 最近一次告诉服务端的下行帧长
+        self.wanted = 0             # 下行sizer当前想要的帧长，在两帧之间发出
+        self.rx_bytes = 0
+        self.rx_wait_us = 0
+        self.encoder = None
+        self.encoder_format = Request.PCM_FORMAT
+        self.encode_buf = None
+        self.set_uplink(UPLINK_FORMAT)
+        self.decoder = None         # 收到第一帧ADPCM_DATA时创建
+        self.text = None            # 收到第一段TOKEN_TEXT时创建
 
     def __del__(self):
         self.disconnect()
@@ -160,17 +244,127 @@ class Connection:
         self.connect()
 
     def connect(self):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.connect((Connection.HOST, Connection.PORT))
+        self.link.ensure()
+
+    def attach(self, sock):
+        # Link建立新连接后回调，包括后台重连
+        self.socket = sock
+        self.reader.reset(sock)
+        if self.recorder:
+            self.recorder.connect()
+        self.negotiate()
+
+    def negotiate(self):
+        # 发送能力声明并等待服务端的选择；老服务端把声明当心跳忽略，超时后用固定配置
+        self.caps = self.legacy
+        self.hinted = 0
+        if HELLO_TIMEOUT_MS:
+            begin = time.ticks_ms()
+            self.tx.send(self.socket, Request.KEEPALIVE, self.offer, 0, Caps.HELLO_FLAG)
+            if self.link.poller.poll(HELLO_TIMEOUT_MS):
+                if self.downlink_sizer:
+                    # 握手一来一回即一次RTT
+                    self.uplink_sizer.rtt_ms = self.downlink_sizer.rtt_ms = time.ticks_diff(time.ticks_ms(), begin)
+                resp = self.reader.read_header()
+                data = self.reader.read(resp.length)
+                if resp.type == Response.HELLO:
+                    caps = Caps.unpack(data)
+                    if self.acceptable(caps):
+                        self.caps = caps
+                    else:
+                        print('hello: unsupported choice', caps)
+            else:
+                print('hello: no answer, legacy protocol')
+        self.set_uplink(self.caps.uplink)
+        if self.uplink_sizer:
+            self.uplink_sizer.limit(self.caps.frame)
+        print('caps:', self.caps)
+
+    def frame_size(self):
+        # 本块录音的字节数，即下一个上行帧的长度
+        if self.uplink_sizer:
+            return min(self.uplink_sizer.size, self.caps.frame)
+        return self.caps.frame
+
+    def frame_stats(self):
+        stats = {}
+        if self.uplink_sizer:
+            stats['up'] = self.uplink_sizer.stats()
+            stats['down'] = self.downlink_sizer.stats()
+            self.uplink_sizer.reset()
+            self.downlink_sizer.reset()
+        return stats
+
+    def track_downlink(self, starting):
+        # 每个下行音频帧头到达时调用：用这段时间里阻塞在readinto上的时长和读到的字节数估计吞吐，
+        # 帧长变化后由send_hint()在读下一个帧头之前发FRAME_HINT；读缓冲里已有数据时几乎不阻塞，估计值偏大，
+        # 说明链路跑在播放前面
+        sizer = self.downlink_sizer
+        n = self.reader.bytes_read - self.rx_bytes
+        us = self.reader.wait_us - self.rx_wait_us
+        self.rx_bytes = self.reader.bytes_read
+        self.rx_wait_us = self.reader.wait_us
+        sizer.hold = starting is not None and starting()
+        if n:
+            sizer.sample(n, us)
+        else:
+            sizer.adjust()
+        self.wanted = sizer.size
+
+    def send_hint(self):
+        # 只在两帧之间发送：帧头已记入会话录制、数据还没读完时插入上行帧，录制文件里数据会和帧头错开
+        if self.caps.features & Caps.FEATURE_FRAME_HINT and self.wanted != self.hinted:
+            self.hint(self.wanted)
+
+    def hint(self, size):
+        self.hint_buf[0] = size & 0xFF
+        self.hint_buf[1] = size >> 8
+        self.tx.send(self.socket, Request.FRAME_HINT, self.hint_buf)
+        self.hinted = size
+
+    def acceptable(self, caps):
+        return (caps.uplink in UPLINK_FORMATS and caps.downlink in DOWNLINK_FORMATS
+                and 0 < caps.frame <= SOCKET_BUF_SIZE and caps.mic_rate in MIC_RATES and caps.play_rate in PLAY_RATES)
+
+    def set_uplink(self, format):
+        if self.encoder is not None and format == self.encoder_format:
+            return
+        self.encoder = None
+        if format == Request.ADPCM_FORMAT:
+            from lib.codec import AdpcmEncoder
+            self.encoder = AdpcmEncoder()
+        elif format == Request.ULAW_FORMAT:
+            from lib.codec import UlawEncoder
+            self.encoder = UlawEncoder()
+        self.encoder_format = format
+        if self.encoder:
+            size = self.encoder.encoded_size(SOCKET_BUF_SIZE)
+            if self.encode_buf is None or len(self.encode_buf) < size:
+                self.encode_buf = bytearray(size)
+                self.encode_mv = memoryview(self.encode_buf)
 
     def disconnect(self):
+        self.writer = None
+        self.socket = None
+        self.link.drop()
+
+    def maintain(self):
+        self.link.maintain()
+        self.socket = self.link.socket
+
+    def open_writer(self):
+        import asyncio
+        self.socket.setblocking(False)
+        self.writer = asyncio.StreamWriter(self.socket, {})
+
+    def close_writer(self):
+        self.writer = None
         if self.socket:
-            self.socket.close()
-            self.socket = None
+            self.socket.setblocking(True)
 
     def send(self, filename):
-        req = Request()
-        req.type = Request.PCM_FORMAT
+        buf = bytearray(SOCKET_BUF_SIZE)
+        mv = memoryview(buf)
         with open(filename, 'rb') as f:
             f.seek(0, 2)
             total_size = f.tell() - 44
@@ -178,127 +372,427 @@ class Connection:
             f.seek(44, 0) # Skip the WAV header
             sent = 0
             while True:
-                data = f.read(SOCKET_BUF_SIZE)
-                if not data:
+                n = f.readinto(buf)
+                if not n:
                     break
-                req.length = len(data)
-                req.data = data
-                sent += req.length
-                req.eof = 1 if sent >= total_size else 0
-                self.socket.sendall(req.to_bytes())
-    
+                sent += n
+                self.tx.send(self.socket, Request.PCM_FORMAT, mv[:n], 1 if sent >= total_size else 0)
+
+    def encode(self, data):
+        if not self.encoder:
+            return data
+        n = self.encoder.encode(data, len(data), self.encode_buf)
+        return self.encode_mv[:n]
+
     def sendall(self, data, is_finish):
-        req = Request()
-        req.type = Request.PCM_FORMAT
-        req.length = len(data)
-        req.data = data
-        req.eof = is_finish
-        self.socket.sendall(req.to_bytes())
-
-    def receive_stream(self):
+        prev = self.mem.switch(Memory.UPLINK) if self.mem else None
+        data = self.encode(data)
+        begin = time.ticks_us()
+        self.tx.send(self.socket, self.caps.uplink, data, is_finish)
+        if self.uplink_sizer:
+            self.uplink_sizer.sample(len(data), time.ticks_diff(time.ticks_us(), begin))
+        self.link.touch()
+        self.traced(data, is_finish)
+        if self.mem:
+            self.mem.switch(prev)
+
+    async def asendall(self, data, is_finish):
+        # 等待drain期间录音任务的分配也会记在上行上
+        prev = self.mem.switch(Memory.UPLINK) if self.mem else None
+        data = self.encode(data)
+        begin = time.ticks_us()
+        # 头部和数据分开写入，避免拼接整块数据
+        self.writer.write(self.tx.pack(self.caps.uplink, is_finish, len(data)))
+        self.writer.write(data)
+        await self.writer.drain()
+        if self.uplink_sizer:
+            self.uplink_sizer.sample(len(data), time.ticks_diff(time.ticks_us(), begin))
+        if self.recorder:
+            self.recorder.sent(self.tx.header_mv, data)
+        self.link.touch()
+        self.traced(data, is_finish)
+        if self.mem:
+            self.mem.switch(prev)
+
+    def traced(self, data, is_finish):
+        if self.trace:
+            self.trace.add(Trace.STAGE_UPLINK, len(data))
+            if is_finish:
+                self.trace.mark(Trace.EOF)
+
+    def receive_stream(self, cancel=None, starting=None):
+        # cancel返回True后不再输出音频，但仍读完本轮响应直到eof，保持帧同步，不必断开连接
+        # starting返回True表示播放还没开始或在重新缓冲，此时请服务端用最小的下行帧
         show_meta = True
+        text = None
+        if self.downlink_sizer:
+            self.rx_bytes = self.reader.bytes_read
+            self.rx_wait_us = self.reader.wait_us
+            self.track_downlink(starting)
         while True:
-            resp_header = self.socket.recv(Response.HEADER_SIZE)
-            assert len(resp_header) == Response.HEADER_SIZE
-            resp = Response.from_bytes(resp_header)
+            if self.downlink_sizer:
+                self.send_hint()
+            if text and text.dirty:
+                self.wait_text(text)
+            resp = self.reader.read_header()
+            if self.trace:
+                self.trace.mark(Trace.RESPONSE)
+            if self.mem:
+                self.mem.switch(Memory.DOWNLINK)
+            if resp.type == Response.PCM_DATA or resp.type == Response.ADPCM_DATA:
+                if self.downlink_sizer:
+                    self.track_downlink(starting)
+                if self.trace and resp.length:
+                    self.trace.mark(Trace.AUDIO)
+                if text:
+                    # 音频帧之间把合并的文字刷到屏幕上，没到间隔时直接跳过
+                    self.refresh_text(text)
             # print(f"resp: {resp.magic}, type: {resp.type}, eof: {resp.eof}, length: {resp.length}")
 
-            if resp.magic != Response.MAGIC:
-                raise ValueError(f"Invalid magic: {resp.magic}")
-
-            if show_meta and resp.length > 0:
+            # 服务端会发文字时，先到的TOKEN不触发元信息界面，由标题加文字区域代替
+            if (show_meta and resp.length > 0 and not text
+                    and (resp.type != Response.TOKEN or not self.caps.features & Caps.FEATURE_TEXT)):
                 show_meta = False
-                asr = "offline" if resp.is_local & (1 << Response.ASR_BIT) else "online"
-                llm = "offline" if resp.is_local & (1 << Response.LLM_BIT) else "online"
-                tts = "offline" if resp.is_local & (1 << Response.TTS_BIT) else "online"
+                asr = "offline" if resp.flags & (1 << Response.ASR_BIT) else "online"
+                llm = "offline" if resp.flags & (1 << Response.LLM_BIT) else "online"
+                tts = "offline" if resp.flags & (1 << Response.TTS_BIT) else "online"
+                if self.mem:
+                    self.mem.switch(Memory.OLED)
                 self.oled.oled.Clear()
                 self.oled.oled.Text("RESPONDING...", 0, 0)
                 self.oled.oled.Text(f"ASR {asr}", 0, 16)
                 self.oled.oled.Text(f"LLM {llm}", 0, 32)
                 self.oled.oled.Text(f"TTS {tts}", 0, 48)
                 self.oled.oled.Show()
+                if self.mem:
+                    self.mem.switch(Memory.DOWNLINK)
 
             if resp.type == Response.EXIT_CHAT:
                 self.oled.show("EXIT_CHAT")
                 raise ExitChatException("Received EXIT_CHAT")
 
-            if resp.type != Response.PCM_DATA:
+            eof = resp.eof
+            if resp.type == Response.PCM_DATA:
+                for chunk in self.reader.payload(resp.length):
+                    if self.trace:
+                        self.trace.add(Trace.STAGE_DOWNLINK, len(chunk))
+                    if self.clips:
+                        self.clips.write(chunk)
+                    if cancel and cancel():
+                        continue
+                    yield chunk
+            elif resp.type == Response.ADPCM_DATA:
+                if self.decoder is None:
+                    from lib.codec import AdpcmStreamDecoder
+                    self.decoder = AdpcmStreamDecoder(SOCKET_BUF_SIZE)
+                self.decoder.begin()
+                for chunk in self.reader.payload(resp.length):
+                    if self.trace:
+                        self.trace.add(Trace.STAGE_DOWNLINK, len(chunk))
+                    if cancel and cancel() and not (self.clips and self.clips.storing()):
+                        continue
+                    for pcm in self.decoder.decode(chunk):
+                        if self.clips:
+                            self.clips.write(pcm)
+                        if not (cancel and cancel()):
+                            yield pcm
+            elif resp.type == Response.TOKEN:
+                token = self.reader.read(resp.length)
+                if token and token[0] == Response.TOKEN_CLIP:
+                    for pcm in self.clip(token):
+                        if cancel and cancel():
+                            break
+                        yield pcm
+                elif token and token[0] == Response.TOKEN_TEXT and TEXT_STREAM and not (cancel and cancel()):
+                    if self.trace:
+                        self.trace.mark(Trace.TOKEN)
+                    text = self.show_text(text, token)
+            else:
+                self.reader.skip(resp.length)
                 continue
 
-            read_done = 0
-            while read_done < resp.length:
-                chunk_size = min(SOCKET_BUF_SIZE, resp.length - read_done)
-                data = self.socket.recv(chunk_size) if self.socket else None
-                if not data:
-                    break
-                read_done += len(data)
+            if eof == 1:
+                if text:
+                    self.refresh_text(text, True)
+                if self.clips:
+                    # 没收到结束标记的音频不完整，不保存
+                    self.clips.abort()
+                self.link.touch()
+                break
 
-                yield data
+    def show_text(self, text, token):
+        # 本轮第一段文字时清屏，换成标题加滚动文字区域
+        prev = self.mem.switch(Memory.OLED) if self.mem else None
+        if text is None:
+            if self.text is None:
+                self.text = self.oled.oled.TextArea("RESPONDING...", interval_ms=TEXT_REFRESH_MS)
+            else:
+                self.text.reset()
+            text = self.text
+        text.append(token, 1)
+        text.refresh()
+        if self.mem:
+            self.mem.switch(prev)
+        return text
+
+    def wait_text(self, text):
+        # 还有合并着没显示的文字：读缓冲里没有下一个帧头时在socket上最多等到刷新间隔到期，
+        # 期间没有新帧就刷新，不让最后几段文字一直等到音频开始才显示
+        if self.reader.buffered() >= HEADER_SIZE or self.link.poller is None:
+            return
+        wait = text.wait_ms()
+        if wait and self.link.poller.poll(wait):
+            return
+        self.refresh_text(text)
 
-            if resp.eof == 1:
-                break
+    def refresh_text(self, text, force=False):
+        if not text.dirty:
+            return
+        prev = self.mem.switch(Memory.OLED) if self.mem else None
+        text.refresh(force)
+        if self.mem:
+            self.mem.switch(prev)
+
+    def clip(self, token):
+        key = bytes(token[1:])
+        if not key:
+            # 未命中的音频已发送完毕
+            if self.clips:
+                self.clips.commit()
+            return
+        if self.clips and self.clips.lookup(key):
+            self.tx.send(self.socket, Request.CLIP_HIT, key)
+            self.link.touch()
+            if self.trace:
+                self.trace.mark(Trace.AUDIO)
+            for pcm in self.clips.play(key):
+                yield pcm
+        else:
+            self.tx.send(self.socket, Request.CLIP_MISS, key)
+            self.link.touch()
+            if self.clips:
+                self.clips.begin(key)
 
 class Oled:
-    def __init__(self):
-        self.oled = happy.Oled(scl=5, sda=4)
+    def __init__(self, mem=None):
+        self.oled = happy.Oled(scl=5, sda=4, i2c_id=OLED_I2C_ID, freq=OLED_I2C_FREQ)
+        self.mem = mem
 
     def show(self, text, x=0, y=0):
+        prev = self.mem.switch(Memory.OLED) if self.mem else None
         self.oled.Clear()
         self.oled.Text(text, x, y)
         self.oled.Show()
+        if self.mem:
+            self.mem.switch(prev)
+
+def record(conn, mic, data_mv, total, vad=None, trace=None, stop=None):
+    record_done = 0
+    mem = conn.mem
+    while record_done < total:
+        if mem:
+            mem.switch(Memory.RECORD)
+        size = min(total - record_done, conn.frame_size())
+        ret = mic.read(data_mv[:size])
+        record_done += ret
+        if trace:
+            trace.mark(Trace.MIC)
+            trace.add(Trace.STAGE_MIC, ret)
+        is_finish = (record_done >= total or (vad is not None and vad.feed(data_mv, ret))
+                     or (stop is not None and stop()))
+        conn.sendall(data_mv[:ret], 1 if is_finish else 0)
+        if is_finish:
+            break
+
+async def record_pipelined(conn, mic, pool, total, vad=None, trace=None, stop=None):
+    from lib.pipeline import CapturePipeline
+    pipeline = CapturePipeline(pool, mic.stream(), conn.asendall, total, vad, trace, stop, conn.frame_size)
+    conn.open_writer()
+    try:
+        await pipeline.run()
+    finally:
+        conn.close_writer()
+    print('capture:', pipeline.stats())
 
 def main():
-    wakeup = False
-    oled = Oled()
-    oled.show("INITING...")
-    net = happy.Network("ft", "xiyangxiadebenpao")
-    button = Pin(9, Pin.IN, Pin.PULL_UP)
-    conn = Connection(oled)
-    def button_irq_handler(pin):
-        nonlocal wakeup
-        wakeup = not wakeup
-        conn.disconnect()
-        raise Exception("WAKEUP")
-    button.irq(trigger=Pin.IRQ_RISING, handler=button_irq_handler)
-    oled.show("BUTTON WAKEUP...")
-
-    data = bytearray(SOCKET_BUF_SIZE)
-    data_mv = memoryview(data)
-
+    global Trace, Memory
+    state = State.IDLE
+    stop = False        # 录音中按键：下一块录音即发送eof
+    cancel = False      # 等待或播放中按键：放弃本轮回复
+    # ticks_ms从上电开始计时，此时即为固件启动加导入模块的耗时
+    boot_begin = time.ticks_ms()
+    mem = None
+    if MEM_STATS or GC_SAFE_POINTS:
+        with prof('lib.memory'):
+            from lib.memory import Memory
+        mem = Memory(MEM_STATS, GC_SAFE_POINTS, GC_RESERVE_BYTES, GC_IDLE_BYTES)
+    with prof('oled'):
+        oled = Oled(mem)
+        oled.show("INITING...")
+    with prof('network'):
+        net = happy.Network("ft", "xiyangxiadebenpao", WIFI_FAST_BOOT, WIFI_STATIC, WIFI_CACHE_FILE, NTP_DEADLINE_MS)
+    trace = None
+    if TRACE:
+        with prof('lib.trace'):
+            from lib.trace import Trace
+        trace = Trace(TRACE_FILE)
+    clips = None
+    if CLIP_CACHE_DIR:
+        with prof('clips'):
+            from lib.clips import ClipCache
+            clips = ClipCache(CLIP_CACHE_DIR, CLIP_CACHE_BYTES, SOCKET_BUF_SIZE)
+    recorder = None
+    if SESSION_FILE:
+        from lib.session import SessionRecorder
+        recorder = SessionRecorder(SESSION_FILE, SESSION_PAYLOAD, SESSION_MAX_BYTES)
+    with prof('connection'):
+        conn = Connection(oled, trace, clips, recorder, mem)
+    def on_press(button):
+        # 由micropython.schedule在主程序上下文中调用
+        nonlocal state, stop, cancel
+        if state == State.IDLE:
+            if trace:
+                trace.press(button.pressed_us)
+            state = State.RECORDING
+        elif state == State.RECORDING:
+            stop = True
+        else:
+            cancel = True
+    button = Button(Pin(9, Pin.IN, Pin.PULL_UP), on_press, BUTTON_DEBOUNCE_MS)
+    # 录音和播放共用一个I2S外设，开机时创建一次
+    port = I2SPort(0, BITS, FORMAT, I2S_BUF_SIZE)
+    mic = MIC(port, Pin(10), Pin(3), Pin(2))
+    player = AudioPlayer(port, Pin(1), Pin(12), Pin(0), trace)
+    stopped = lambda: stop
+    cancelled = lambda: cancel
+    starting = lambda: not jitter.playing
+
+    with prof('buffers'):
+        data = bytearray(SOCKET_BUF_SIZE)
+        data_mv = memoryview(data)
+        pool = None
+        if PIPELINED_CAPTURE:
+            with prof('asyncio'):
+                import asyncio
+            from lib.pipeline import BufferPool
+            pool = BufferPool(PIPELINE_BUFFERS, SOCKET_BUF_SIZE)
+        jitter = JitterBuffer(AUDIO_SAMPLE_RATE, JITTER_PREROLL_MS, JITTER_MIN_MS, JITTER_MAX_MS)
+    vad = None
+    if VAD_ENDPOINTING:
+        with prof('vad'):
+            from lib.vad import VAD
+            vad = VAD(MIC_SAMPLE_RATE)
+    record_size = VAD_MAX_BUF_SIZE if VAD_ENDPOINTING else RECORD_BUF_SIZE
+    boot = {'import_ms': boot_begin}
+    boot.update(net.BootStats())
+    boot['ready_ms'] = time.ticks_ms()
+    print('boot:', boot)
+    if PROFILE_BOOT:
+        print(prof.report())
+    if mem:
+        mem.safe_point()
+
+    idle_shown = False
     while True:
-        if not wakeup:
-            oled.show("BUTTON WAKEUP...")
-            time.sleep(0.5)
+        if state == State.IDLE:
+            if not idle_shown:
+                oled.show("BUTTON WAKEUP...")
+                idle_shown = True
+                if recorder:
+                    recorder.flush()
+            conn.maintain()
+            if mem:
+                mem.safe_point(idle=True)
+            # 按键后立即返回，超时只为定期维护连接
+            button.wait(IDLE_MAINTAIN_MS)
             continue
+        idle_shown = False
+        stop = False
+        cancel = False
+        if trace:
+            trace.start()
+        if mem:
+            mem.start()
         try:
             conn.wait_ready()
+            if trace:
+                trace.mark(Trace.CONNECT)
+            caps = conn.caps
+            if mic.rate != caps.mic_rate:
+                # 协商的麦克风采样率变了：VAD按新采样率重建，录音上限按时长重新换算成字节数
+                mic.rate = caps.mic_rate
+                if vad:
+                    vad = VAD(mic.rate)
+                seconds = VAD_MAX_SECONDS if VAD_ENDPOINTING else RECORD_TIME_IN_SECONDS
+                record_size = seconds * mic.rate * BITS // 8
+            if player.rate != caps.play_rate:
+                player.rate = caps.play_rate
+                jitter.set_rate(player.rate)
             oled.show("RECORDING...")
 
-            with MIC(Pin(10), Pin(3), Pin(2)) as mic:
-                record_done = 0
-                while record_done < RECORD_BUF_SIZE:
-                    size = min(RECORD_BUF_SIZE - record_done, SOCKET_BUF_SIZE)
-                    ret = mic.read(data_mv[:size])
-                    record_done += ret
-                    conn.sendall(data_mv[:ret], record_done == RECORD_BUF_SIZE)
-
+            if vad:
+                vad.reset()
+            if mem:
+                mem.switch(Memory.RECORD)
+            with mic:
+                if PIPELINED_CAPTURE:
+                    asyncio.run(record_pipelined(conn, mic, pool, record_size, vad, trace, stopped))
+                else:
+                    record(conn, mic, data_mv, record_size, vad, trace, stopped)
+
+            state = State.WAITING
             oled.show("WAITING...")
             # conn.send('test.wav')
 
-            with AudioPlayer(Pin(1), Pin(12), Pin(0)) as audio:
-                for chunk in conn.receive_stream():
-                    audio.write(chunk)
+            if mem:
+                mem.switch(Memory.DOWNLINK)
+            with player as audio:
+                jitter.start(audio)
+                try:
+                    for chunk in conn.receive_stream(cancelled, starting):
+                        state = State.PLAYING
+                        jitter.push(chunk)
+                finally:
+                    if cancel:
+                        # 已取消：缓冲中剩余的音频不再播放
+                        audio.stop()
+                        print('playback cancelled:', jitter.stats())
+                    else:
+                        # EXIT_CHAT前的告别语音也要播完
+                        print('playback:', jitter.flush())
+            print('i2s:', port.stats())
+            if ADAPTIVE_FRAMES:
+                print('frames:', conn.frame_stats())
+            if conn.text:
+                print('text:', conn.text.stats())
+            if clips:
+                # 回合结束后再把使用顺序写回flash，播放过程中不写
+                clips.sync()
+                print('clips:', clips.stats())
+            if recorder:
+                recorder.flush()
+            if trace:
+                trace.finish(Trace.CANCEL if cancel else Trace.OK)
+            state = State.IDLE if cancel else State.RECORDING
 
         except ExitChatException:
-            wakeup = False
+            if trace:
+                trace.finish(Trace.EXIT)
+            state = State.IDLE
             oled.show("EXIT CHAT...")
-            conn.disconnect()
         except Exception as e:
             # raise
             print(e)
-            wakeup = False
+            if trace:
+                trace.finish(Trace.ERROR)
+            state = State.IDLE
             oled.show("ERROR...")
             conn.disconnect()
+        if mem:
+            if MEM_STATS:
+                print('mem:', mem.finish())
+            # 回合之间是安全点：在这里回收，下一轮录音和播放中不再触发自动GC
+            mem.safe_point()
 
 if __name__ == '__main__':
     main()
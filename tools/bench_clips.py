@@ -0,0 +1,142 @@
+# 回复音频缓存命中率测试（在PC上运行）：python3 tools/bench_clips.py [对话日志.txt]
+# 日志每行一条回复："回复文本<TAB>时长ms<TAB>clip"，第三列为clip时服务端用TOKEN_CLIP发送，否则照常流式发送；
+# 不带参数时合成一段包含问候、告别、错误提示和一次性回答的对话日志
+# 按不同的缓存预算回放日志，统计命中率和节省的下行字节数，最后校验损坏文件能被检测出来
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'sim'))
+sys.path.insert(0, ROOT)
+
+from lib.clips import ClipCache, clip_key
+from audio import tone
+
+BUDGETS = (64 * 1024, 128 * 1024, 256 * 1024, 512 * 1024)
+
+COMMON = (
+    ('你好，我在呢', 1200, 0.15),
+    ('好的，再见', 900, 0.08),
+    ('抱歉，我没有听清楚', 1500, 0.06),
+    ('网络好像有点问题，请稍后再试', 2200, 0.03),
+    ('服务暂时不可用', 1400, 0.02),
+    ('请再说一遍', 1000, 0.04),
+    ('好的', 500, 0.05),
+    ('现在是北京时间', 1300, 0.03),
+)
+
+def synth_log(turns=500, seed=1):
+    rnd = random.Random(seed)
+    log = []
+    for i in range(turns):
+        x = rnd.random()
+        for text, ms, p in COMMON:
+            if x < p:
+                log.append((text, ms, True))
+                break
+            x -= p
+        else:
+            log.append((f"answer {i}", rnd.randint(2000, 8000), False))
+    return log
+
+def load_log(path):
+    log = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if not fields[0]:
+                continue
+            ms = int(fields[1]) if len(fields) > 1 else 1500
+            log.append((fields[0], ms, len(fields) > 2 and fields[2] == 'clip'))
+    return log
+
+class Audio:
+    # 按回复文本合成确定的PCM，同一文本得到同一个key
+    def __init__(self):
+        self.cache = {}
+
+    def get(self, text, ms):
+        pcm = self.cache.get(text)
+        if pcm is None:
+            pcm = tone(ms, freq=200 + zlib.crc32(text.encode()) % 600)
+            self.cache[text] = pcm
+        return pcm
+
+def replay(log, audio, budget, root, chunk=4096):
+    cache = ClipCache(root, budget, chunk)
+    streamed = 0
+    total = 0
+    hit_us = []
+    for text, ms, clip in log:
+        pcm = audio.get(text, ms)
+        total += len(pcm)
+        if not clip:
+            streamed += len(pcm)
+            continue
+        key = clip_key(pcm)
+        begin = time.perf_counter()
+        if cache.lookup(key):
+            for _ in cache.play(key):
+                hit_us.append((time.perf_counter() - begin) * 1e6)
+                break
+            continue
+        # 未命中：服务端流式发送，设备边播边存
+        streamed += len(pcm)
+        cache.begin(key)
+        for pos in range(0, len(pcm), chunk):
+            cache.write(pcm[pos:pos + chunk])
+        cache.commit()
+        cache.sync()
+    cache.sync()
+    return cache, streamed, total, hit_us
+
+def check_integrity(audio, root):
+    # 写入一条缓存后改坏一个字节，重新加载（相当于重启）后应判定为损坏并删除
+    pcm = audio.get('integrity', 1000)
+    key = clip_key(pcm)
+    cache = ClipCache(root, 64 * 1024)
+    cache.begin(key)
+    cache.write(pcm)
+    cache.commit()
+    cache.sync()
+    path = cache.path(key)
+    with open(path, 'r+b') as f:
+        f.seek(100)
+        b = f.read(1)
+        f.seek(100)
+        f.write(bytes([b[0] ^ 0xFF]))
+    cache = ClipCache(root, 64 * 1024)
+    ok = not cache.lookup(key) and cache.corrupt == 1 and not os.path.exists(path)
+    # 内容与key不符的数据不会被保存
+    cache.begin(key)
+    cache.write(pcm[:-2])
+    rejected = not cache.commit() and cache.rejected == 1
+    return ok and rejected
+
+def main():
+    log = load_log(sys.argv[1]) if len(sys.argv) > 1 else synth_log()
+    audio = Audio()
+    clips = sum(1 for _, _, clip in log if clip)
+    print(f"{len(log)} replies, {clips} sent as clips, {len({t for t, _, c in log if c})} distinct clips")
+    tmp = tempfile.mkdtemp()
+    try:
+        for budget in BUDGETS:
+            root = os.path.join(tmp, f'clips{budget}')
+            cache, streamed, total, hit_us = replay(log, audio, budget, root)
+            stats = cache.stats()
+            rate = stats['hits'] * 100 / max(stats['hits'] + stats['misses'], 1)
+            print(f"budget {budget // 1024:4d}KB: hit rate {rate:5.1f}%  evictions {stats['evictions']:4d}  "
+                  f"downlink {streamed * 100 / max(total, 1):5.1f}% of {total // 1024}KB  "
+                  f"hit->first chunk {sum(hit_us) / max(len(hit_us), 1):6.0f}us")
+        ok = check_integrity(audio, os.path.join(tmp, 'integrity'))
+        print('integrity check:', 'PASS' if ok else 'FAIL')
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    main()
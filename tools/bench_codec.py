@@ -0,0 +1,122 @@
+# 上下行压缩编解码测试（在PC上运行）：python3 tools/bench_codec.py [录音.pcm ...]
+# 按设备上的4KB分块增量编码，再用后台解码器还原，检查信噪比、压缩率和编解码速度
+# 另测下行ADPCM_DATA流式解码：随机切分帧数据，结果须与整帧解码一致
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lib.codec import AdpcmEncoder, AdpcmDecoder, AdpcmStreamDecoder, UlawEncoder, UlawDecoder
+
+RATE = 16000
+AUDIO_RATE = 24000
+CHUNK = 4096
+# 最低可接受信噪比(dB)
+MIN_SNR = {'adpcm': 18, 'ulaw': 30}
+
+def synth(seconds, rnd, rate=RATE):
+    samples = []
+    f0 = 140
+    for i in range(int(seconds * rate)):
+        x = i / rate
+        if i % (rate // 10) == 0:
+            f0 = rnd.uniform(90, 260)
+        env = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * x)
+        s = env * (6000 * math.sin(2 * math.pi * f0 * x) + 2500 * math.sin(2 * math.pi * 3.1 * f0 * x))
+        s += rnd.gauss(0, 120)
+        samples.append(max(-32768, min(32767, int(s))))
+    return struct.pack(f'<{len(samples)}h', *samples)
+
+def snr(ref, out):
+    n = min(len(ref), len(out)) // 2
+    a = struct.unpack_from(f'<{n}h', ref)
+    b = struct.unpack_from(f'<{n}h', out)
+    signal = sum(x * x for x in a)
+    noise = sum((x - y) * (x - y) for x, y in zip(a, b)) or 1
+    return 10 * math.log10(signal / noise)
+
+def roundtrip(name, encoder, decoder, pcm):
+    mv = memoryview(pcm)
+    enc = bytearray(encoder.encoded_size(CHUNK))
+    frames = []
+    begin = time.perf_counter()
+    for pos in range(0, len(pcm), CHUNK):
+        n = min(CHUNK, len(pcm) - pos)
+        size = encoder.encode(mv[pos:pos + n], n, enc)
+        frames.append(bytes(enc[:size]))
+    enc_s = time.perf_counter() - begin
+
+    out = bytearray(decoder.decoded_size(max(len(f) for f in frames)) * len(frames))
+    pos = 0
+    begin = time.perf_counter()
+    for frame in frames:
+        pos = decoder.decode(frame, len(frame), out, pos)
+    dec_s = time.perf_counter() - begin
+
+    audio_s = len(pcm) / (RATE * 2)
+    ratio = len(pcm) / sum(len(f) for f in frames)
+    quality = snr(pcm, out)
+    ok = quality >= MIN_SNR[name]
+    print(f"{name:6s} ratio {ratio:.2f}:1  snr {quality:5.1f}dB  "
+          f"encode {audio_s / enc_s:6.1f}x  decode {audio_s / dec_s:6.1f}x realtime  {'PASS' if ok else 'FAIL'}")
+    return ok
+
+def stream(pcm, rnd):
+    # 服务端按4KB PCM分帧编码，设备端按FrameReader的方式收到任意长度的切片
+    encoder = AdpcmEncoder()
+    enc = bytearray(encoder.encoded_size(CHUNK))
+    frames = []
+    mv = memoryview(pcm)
+    for pos in range(0, len(pcm), CHUNK):
+        n = min(CHUNK, len(pcm) - pos)
+        size = encoder.encode(mv[pos:pos + n], n, enc)
+        frames.append(bytes(enc[:size]))
+
+    ref = bytearray()
+    out = bytearray(AdpcmDecoder.decoded_size(len(enc)))
+    for frame in frames:
+        ref += out[:AdpcmDecoder().decode(frame, len(frame), out)]
+
+    decoder = AdpcmStreamDecoder(4096)
+    got = bytearray()
+    elapsed = 0.0
+    for frame in frames:
+        fmv = memoryview(frame)
+        decoder.begin()
+        pos = 0
+        while pos < len(frame):
+            n = rnd.randint(1, 1500)
+            begin = time.perf_counter()
+            for pcm_chunk in decoder.decode(fmv[pos:pos + n]):
+                elapsed += time.perf_counter() - begin
+                got += pcm_chunk
+                begin = time.perf_counter()
+            elapsed += time.perf_counter() - begin
+            pos += n
+
+    audio_s = len(pcm) / (AUDIO_RATE * 2)
+    ok = got == ref
+    print(f"stream {len(pcm) // 1024}KB -> {sum(len(f) for f in frames) // 1024}KB  "
+          f"decode {audio_s / elapsed:6.1f}x realtime @{AUDIO_RATE}Hz  {'PASS' if ok else 'FAIL'}")
+    return ok
+
+def main():
+    if len(sys.argv) > 1:
+        pcms = []
+        for path in sys.argv[1:]:
+            with open(path, 'rb') as f:
+                data = f.read()
+            pcms.append(data[44:] if data[:4] == b'RIFF' else data)
+        pcm = b''.join(pcms)
+    else:
+        pcm = synth(5, random.Random(3))
+    ok = roundtrip('adpcm', AdpcmEncoder(), AdpcmDecoder(), pcm)
+    ok = roundtrip('ulaw', UlawEncoder(), UlawDecoder(), pcm) and ok
+    ok = stream(synth(3, random.Random(5), AUDIO_RATE), random.Random(9)) and ok
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
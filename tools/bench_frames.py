@@ -0,0 +1,137 @@
+# 自适应帧长测试（在PC上运行）：python3 tools/bench_frames.py [轮数]
+# 设备（完整的main()，见tools/simulate.py）和本地bee服务端之间插入一个限速代理，按带宽串行化并加上RTT，
+# 在几种链路条件下对比固定4096字节帧和ADAPTIVE_FRAMES，统计上下行帧数和平均帧长、eof到开始播放的延迟和播放卡顿
+import contextlib
+import io
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+import simulate
+import machine
+import main
+
+# (名称, 带宽kbit/s, RTT ms)
+LINKS = (
+    ('fast', 20000, 10),
+    ('fair', 2000, 40),
+    ('weak', 700, 120),
+)
+RCVBUF = 16384
+
+class ThrottledProxy:
+    # 限速代理：每个方向按带宽串行化转发，再延迟RTT的一半；按链路速度读取，发送端能感受到背压
+    def __init__(self, target, kbps, rtt_ms):
+        self.target = target
+        self.bytes_per_s = kbps * 1000 / 8
+        self.delay = rtt_ms / 2000
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            upstream = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            upstream.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF)
+            upstream.connect(self.target)
+            for src, dst in ((client, upstream), (upstream, client)):
+                threading.Thread(target=self.pump, args=(src, dst), daemon=True).start()
+
+    def pump(self, src, dst):
+        pending = queue.Queue()
+        threading.Thread(target=self.deliver, args=(pending, dst), daemon=True).start()
+        ready = 0
+        while True:
+            try:
+                data = src.recv(1460)
+            except OSError:
+                data = b''
+            if not data:
+                pending.put(None)
+                return
+            now = time.monotonic()
+            ready = max(ready, now) + len(data) / self.bytes_per_s
+            pending.put((ready + self.delay, data))
+            time.sleep(max(0, ready - time.monotonic()))
+
+    def deliver(self, pending, dst):
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            due, data = item
+            time.sleep(max(0, due - time.monotonic()))
+            try:
+                dst.sendall(data)
+            except OSError:
+                break
+        try:
+            dst.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    def stop(self):
+        self.sock.close()
+
+def measure(link, adaptive, turns):
+    name, kbps, rtt_ms = link
+    main.ADAPTIVE_FRAMES = adaptive
+    proxies = []
+    def via(server):
+        proxy = ThrottledProxy((server.host, server.port), kbps, rtt_ms)
+        proxies.append(proxy)
+        return '127.0.0.1', proxy.port
+    with contextlib.redirect_stdout(io.StringIO()):
+        server, elapsed = simulate.run(turns, via=via)
+    for proxy in proxies:
+        proxy.stop()
+    speakers = [i2s for i2s in machine.I2S.sessions if i2s.mode == machine.I2S.TX]
+    rows = []
+    for i, turn in enumerate(server.turns):
+        if 'exit' in turn or i >= len(speakers):
+            continue
+        speaker = speakers[i]
+        rows.append({
+            'up_frames': turn['uplink_frames'],
+            'up_avg': turn['uplink_bytes'] // max(turn['uplink_frames'], 1),
+            'down_frames': turn.get('downlink_frames', 0),
+            'down_avg': turn.get('downlink_bytes', 0) // max(turn.get('downlink_frames', 0), 1),
+            'first_ms': (turn.get('first_downlink', turn['eof']) - turn['eof']) * 1000,
+            'play_ms': (speaker.first_write - turn['eof']) * 1000 if speaker.first_write else 0,
+            'underruns': speaker.underruns,
+            'gap_ms': speaker.gap_s * 1000,
+        })
+    return rows
+
+def main_():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    print(f"{'link':6s} {'frames':8s} {'up n':>5s} {'up avg':>7s} {'down n':>7s} {'down avg':>8s} "
+          f"{'eof->1st':>9s} {'eof->play':>9s} {'underruns':>9s} {'gap':>7s}")
+    for link in LINKS:
+        for adaptive in (False, True):
+            rows = measure(link, adaptive, turns)
+            n = max(len(rows), 1)
+            avg = {key: sum(r[key] for r in rows) / n for key in rows[0]} if rows else {}
+            if not avg:
+                print(f"{link[0]:6s} {'adaptive' if adaptive else 'fixed':8s} no completed turns")
+                continue
+            print(f"{link[0]:6s} {'adaptive' if adaptive else 'fixed':8s} {avg['up_frames']:5.0f} {avg['up_avg']:7.0f} "
+                  f"{avg['down_frames']:7.0f} {avg['down_avg']:8.0f} {avg['first_ms']:7.0f}ms {avg['play_ms']:7.0f}ms "
+                  f"{avg['underruns']:9.1f} {avg['gap_ms']:5.0f}ms")
+
+if __name__ == '__main__':
+    main_()
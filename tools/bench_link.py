@@ -0,0 +1,108 @@
+# 长连接管理测试（在PC上运行）：python3 tools/bench_link.py
+# 本地起一个会故意断开连接的bee服务端，模拟设备空闲循环调用Link.maintain()，
+# 统计重连次数、心跳、DNS解析次数，以及“按键”时已有可用连接的比例
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+# 设备上的time.ticks_*在PC上没有
+time.ticks_ms = lambda: int(time.monotonic() * 1000)
+time.ticks_add = lambda a, b: a + b
+time.ticks_diff = lambda a, b: a - b
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lib.link import Link
+from lib.protocol import Frame, Request, HEADER_SIZE
+
+class FlakyServer:
+    # 每个连接存活随机的一段时间后被服务端主动关闭，可选拒绝一部分新连接
+    def __init__(self, lifetime_s=(0.5, 2.0), refuse=0.2, seed=1):
+        self.rnd = random.Random(seed)
+        self.lifetime_s = lifetime_s
+        self.refuse = refuse
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        self.accepted = 0
+        self.keepalives = 0
+        self.running = True
+
+    def serve(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            if self.rnd.random() < self.refuse:
+                conn.close()
+                continue
+            self.accepted += 1
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        deadline = time.monotonic() + self.rnd.uniform(*self.lifetime_s)
+        frame = Frame()
+        conn.settimeout(0.05)
+        buf = b''
+        while time.monotonic() < deadline:
+            try:
+                data = conn.recv(4096)
+            except socket.timeout:
+                continue
+            if not data:
+                break
+            buf += data
+            while len(buf) >= HEADER_SIZE:
+                frame.unpack(buf)
+                if len(buf) < HEADER_SIZE + frame.length:
+                    break
+                if frame.type == Request.KEEPALIVE:
+                    self.keepalives += 1
+                buf = buf[HEADER_SIZE + frame.length:]
+        conn.close()
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+def main():
+    server = FlakyServer()
+    threading.Thread(target=server.serve, daemon=True).start()
+
+    link = Link('localhost', server.port, keepalive_ms=200, backoff_min_ms=50, backoff_max_ms=800)
+    rnd = random.Random(2)
+    presses = 0
+    ready = 0
+    wait_ms = []
+    end = time.monotonic() + 10
+    next_press = time.monotonic() + rnd.uniform(0.2, 1.0)
+    while time.monotonic() < end:
+        link.maintain()
+        if time.monotonic() >= next_press:
+            presses += 1
+            if link.socket:
+                ready += 1
+            begin = time.monotonic()
+            try:
+                link.ensure()
+                wait_ms.append((time.monotonic() - begin) * 1000)
+            except OSError:
+                pass
+            next_press = time.monotonic() + rnd.uniform(0.2, 1.0)
+        time.sleep(0.02)
+    server.stop()
+    link.close()
+
+    print('link:', link.stats())
+    print(f"server: accepted {server.accepted}, keepalives {server.keepalives}")
+    print(f"presses: {presses}, connection already up: {ready} ({ready * 100 // max(presses, 1)}%)")
+    if wait_ms:
+        print(f"press to ready: max {max(wait_ms):.1f}ms, mean {sum(wait_ms) / len(wait_ms):.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# OLED刷新开销测试（在PC上运行）：python3 tools/bench_oled.py
+# 用tools/sim里的计数I2C总线替代SoftI2C，按happy.Oled的方式滚动一行16px文字，
+# 对比整屏刷新与局部刷新每帧的传输字节数和I2C事务数，并校验面板显存与帧缓冲一致
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'sim'))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from lib.ssd1306 import SSD1306_I2C
+from lib.font import Font
+from machine import SoftI2C
+
+I2C_FREQ = 400000
+
+class LegacyI2C(SSD1306_I2C):
+    # 批量命令之前的写法：每个命令字节一个事务
+    def write_cmds(self, cmds):
+        for cmd in cmds:
+            self.write_cmd(cmd)
+
+    def write_addressed(self, cmds, buf):
+        self.write_cmds(cmds)
+        self.write_data(buf)
+
+def scroll(driver, full, frames=60):
+    i2c = SoftI2C(freq=I2C_FREQ)
+    display = driver(128, 64, i2c)
+    font = Font(display)
+    # 与main.py的状态页相同的静态内容
+    display.fill(0)
+    font.text("RESPONDING...", 0, 0)
+    font.text("ASR online", 0, 16)
+    font.text("LLM online", 0, 32)
+    display.show()
+    i2c.reset()
+
+    txt = "hello from the scrolling text row"
+    overflow = len(txt) * 8 - 128
+    for i in range(frames):
+        x = -((i * 2) % overflow)
+        display.rect(0, 48, 128, 16, 0, True)
+        font.text(txt, x, 48)
+        display.show(full)
+        if i2c.ram != display.buffer:
+            raise AssertionError(f"panel out of sync at frame {i}")
+    return i2c
+
+def main():
+    cases = (
+        ('full/per-command', LegacyI2C, True),
+        ('partial/per-command', LegacyI2C, False),
+        ('full/batched', SSD1306_I2C, True),
+        ('partial/batched', SSD1306_I2C, False),
+    )
+    for name, driver, full in cases:
+        i2c = scroll(driver, full)
+        frames = 60
+        print(f"{name:20s} {i2c.bytes / frames:7.1f} bytes/frame  {i2c.transactions / frames:5.1f} transactions/frame  "
+              f"{i2c.bus_ms() / frames:5.2f}ms bus time/frame @{I2C_FREQ // 1000}kHz")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# 帧解析吞吐测试（在PC上运行）：python3 tools/bench_reader.py
+# 通过本地socketpair发送随机分段的PCM_DATA帧，对比FrameReader与旧的recv()解析方式
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+# FrameReader用time.ticks_us统计等待时长，PC上没有
+time.ticks_us = lambda: time.monotonic_ns() // 1000
+time.ticks_diff = lambda a, b: a - b
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lib.protocol import Frame, FrameReader, Response, HEADER_SIZE
+
+FRAMES = 2000
+FRAME_LEN = 4096
+
+def build_stream():
+    frame = Frame()
+    payload = bytes(range(256)) * (FRAME_LEN // 256)
+    out = bytearray()
+    for i in range(FRAMES):
+        out += frame.pack(Response.PCM_DATA, 1 if i == FRAMES - 1 else 0, FRAME_LEN)
+        out += payload
+    return bytes(out)
+
+def writer(sock, stream, seed):
+    # 随机切分写入，制造跨TCP分段的帧头
+    rnd = random.Random(seed)
+    mv = memoryview(stream)
+    pos = 0
+    try:
+        while pos < len(mv):
+            n = rnd.randint(1, 3000)
+            sock.sendall(mv[pos:pos + n])
+            pos += n
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+def parse_reader(sock):
+    reader = FrameReader(sock.makefile('rb', buffering=0), 4096)
+    total = 0
+    while True:
+        resp = reader.read_header()
+        eof = resp.eof
+        for chunk in reader.payload(resp.length):
+            total += len(chunk)
+        if eof:
+            return total
+
+def parse_recv(sock):
+    # 旧实现：recv(8)取帧头，recv(chunk_size)逐块分配
+    total = 0
+    while True:
+        header = sock.recv(HEADER_SIZE)
+        if len(header) != HEADER_SIZE:
+            raise AssertionError("short header")
+        resp = Response.from_bytes(header)
+        read_done = 0
+        while read_done < resp.length:
+            data = sock.recv(min(4096, resp.length - read_done))
+            if not data:
+                break
+            read_done += len(data)
+        total += read_done
+        if resp.eof == 1:
+            return total
+
+def run(name, parse, stream):
+    a, b = socket.socketpair()
+    t = threading.Thread(target=writer, args=(a, stream, 1))
+    begin = time.perf_counter()
+    t.start()
+    try:
+        total = parse(b)
+        result = f"{total / (time.perf_counter() - begin) / 1e6:.1f} MB/s"
+        if total != FRAMES * FRAME_LEN:
+            result += f" (lost {FRAMES * FRAME_LEN - total} bytes)"
+    except Exception as e:
+        result = f"failed: {e!r}"
+    b.close()
+    t.join()
+    a.close()
+    print(f"{name:8s} {result}")
+
+def main():
+    stream = build_stream()
+    run('reader', parse_reader, stream)
+    run('recv', parse_recv, stream)
+
+if __name__ == '__main__':
+    main()
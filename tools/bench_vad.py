@@ -0,0 +1,139 @@
+# 端点检测收益测试（在PC上运行）：python3 tools/bench_vad.py [录音.wav|录音.pcm ...]
+# 输入为16kHz单声道16位PCM；不带参数时使用合成的语音样本
+# 统计相对固定5秒录音节省的时长，以及在语音结束前截断的比例；合成样本在词组之间插入0.4~1.0秒的停顿，
+# 截断率按句中最长停顿分组统计：停顿短于VAD的hangover时不应截断，长于hangover时截断是预期的
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lib.vad import VAD, frame_features
+
+RATE = 16000
+CHUNK = 4096
+FIXED_MS = 5000
+FRAME_MS = 16
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] == b'RIFF':
+        data = data[44:]
+    return data
+
+HANGOVER_MS = VAD(RATE).hangover_ms
+PAUSES = ((0, 400, 'no pause'), (400, HANGOVER_MS, 'pause < hangover'), (HANGOVER_MS, 10000, 'pause >= hangover'))
+
+def synth(rnd, pauses=None):
+    # 噪声底 + 若干个带包络的浊音段（模拟音节）；词组内音节间隔0.05~0.3秒，词组之间停顿0.4~1.0秒
+    # pauses给出固定的词组间停顿（秒）时用它代替随机值；返回PCM、真实语音结束时刻和最长的词组间停顿(ms)
+    lead = rnd.uniform(0.2, 0.8)
+    phrases = len(pauses) + 1 if pauses is not None else rnd.randint(1, 3)
+    noise = rnd.uniform(20, 150)
+    segments = []
+    longest = 0
+    t = lead
+    for p in range(phrases):
+        if p:
+            pause = pauses[p - 1] if pauses is not None else rnd.uniform(0.4, 1.0)
+            t += pause
+            longest = max(longest, int(pause * 1000))
+        for w in range(rnd.randint(1, 3)):
+            if w:
+                t += rnd.uniform(0.05, 0.3)
+            length = rnd.uniform(0.15, 0.4)
+            segments.append((t, t + length, rnd.uniform(80, 250), rnd.uniform(1500, 8000)))
+            t += length
+    speech_end = segments[-1][1]
+    total = min(FIXED_MS / 1000, speech_end + 1.5)
+    samples = []
+    for i in range(int(total * RATE)):
+        x = i / RATE
+        s = rnd.gauss(0, noise)
+        for begin, end, f0, amp in segments:
+            if begin <= x < end:
+                env = math.sin(math.pi * (x - begin) / (end - begin))
+                s += amp * env * (math.sin(2 * math.pi * f0 * x) + 0.5 * math.sin(4 * math.pi * f0 * x))
+        samples.append(max(-32768, min(32767, int(s))))
+    return struct.pack(f'<{len(samples)}h', *samples), int(min(speech_end, total) * 1000), longest
+
+def oracle_end(data):
+    # 真实标注缺失时，以整段录音中最后一个明显高于噪声底的帧作为语音结束
+    fb = RATE * FRAME_MS // 1000 * 2
+    levels = [frame_features(data, i, i + fb, 1)[0] for i in range(0, len(data) - fb + 1, fb)]
+    floor = sorted(levels)[len(levels) // 10] if levels else 0
+    end = 0
+    for i, level in enumerate(levels):
+        if level > max(floor * 4, 300):
+            end = (i + 1) * FRAME_MS
+    return end
+
+def endpoint(data):
+    # 按设备上的方式逐块喂给VAD，返回发送eof时的录音时长
+    vad = VAD(RATE)
+    mv = memoryview(data)
+    pos = 0
+    while pos < len(data):
+        n = min(CHUNK, len(data) - pos)
+        pos += n
+        if vad.feed(mv[pos - n:pos], n):
+            break
+    return pos * 1000 // (RATE * 2), vad.end_ms
+
+def main():
+    # (名称, PCM, 语音结束ms, 最长停顿ms，None表示未知, 是否应当截断，None表示不检查)
+    fixtures = []
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            data = load(path)
+            fixtures.append((os.path.basename(path), data, oracle_end(data), None, None))
+    else:
+        rnd = random.Random(7)
+        for i in range(40):
+            data, end, longest = synth(rnd)
+            fixtures.append((f'synth{i:02d}', data, end, longest, None))
+        # 固定样本：句中停顿远短于hangover不应截断，停顿1秒应在停顿处截断
+        data, end, longest = synth(random.Random(1), [0.3])
+        fixtures.append(('short_pause', data, end, longest, False))
+        data, end, longest = synth(random.Random(1), [1.0])
+        fixtures.append(('long_pause', data, end, longest, True))
+
+    saved = 0
+    truncated = 0
+    cost = 0.0
+    groups = {label: [0, 0] for _, _, label in PAUSES}
+    failed = 0
+    for name, data, speech_end, longest, expect in fixtures:
+        begin = time.perf_counter()
+        stop_ms, _ = endpoint(data)
+        cost += time.perf_counter() - begin
+        cut = stop_ms < speech_end
+        if cut:
+            truncated += 1
+            print(f"{name}: truncated at {stop_ms}ms, speech ends at {speech_end}ms, longest pause {longest}ms")
+        if longest is not None:
+            for low, high, label in PAUSES:
+                if low <= longest < high:
+                    groups[label][0] += 1
+                    groups[label][1] += cut
+        if expect is not None and cut != expect:
+            failed += 1
+            print(f"{name}: expected {'a cut' if expect else 'no cut'}, stopped at {stop_ms}ms of {speech_end}ms")
+        saved += max(0, FIXED_MS - stop_ms)
+
+    count = len(fixtures)
+    audio_s = sum(len(f[1]) for f in fixtures) / (RATE * 2)
+    print(f"fixtures: {count}")
+    print(f"saved: {saved // count}ms per turn (vs fixed {FIXED_MS}ms)")
+    print(f"truncated: {truncated}/{count} ({truncated * 100 // count}%)")
+    for label, (n, cut) in groups.items():
+        if n:
+            print(f"  {label:>18} (hangover {HANGOVER_MS}ms): {cut}/{n} truncated")
+    print(f"expected fixtures: {'ok' if not failed else f'{failed} failed'}")
+    print(f"vad cost: {cost * 1000 / audio_s:.2f}ms per audio second (host)")
+
+if __name__ == '__main__':
+    main()
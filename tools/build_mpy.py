@@ -0,0 +1,66 @@
+# 生成预编译的部署目录（在PC上运行）：python3 tools/build_mpy.py [输出目录] [--march rv32imc]
+# lib里的@micropython.native函数需要按目标架构生成机器码，ESP32-C3为rv32imc（mpy-cross 1.22起支持）
+# lib/*.py用mpy-cross编译成.mpy，设备上导入时不再解析源码，省下启动时间和解析用的堆内存；
+# main.py编译为app.mpy，另生成两行的main.py调用app.main()；resource/和boot.py原样复制
+# mpy-cross的版本需与设备固件一致：pip install mpy-cross==<固件版本>，或把固件源码里编译出的mpy-cross放进PATH
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def find_mpy_cross():
+    path = shutil.which('mpy-cross')
+    if path:
+        return [path]
+    try:
+        import mpy_cross
+        return [sys.executable, '-m', 'mpy_cross']
+    except ImportError:
+        return None
+
+def compile_file(cmd, src, dst, march):
+    args = cmd + ['-o', dst]
+    if march:
+        args.append(f'-march={march}')
+    # -s指定源文件名，报错时的回溯信息不带本机路径
+    args += ['-s', os.path.basename(src), src]
+    subprocess.run(args, check=True)
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    march = 'rv32imc'
+    if '--march' in sys.argv:
+        march = sys.argv[sys.argv.index('--march') + 1]
+        args.remove(march)
+    out = args[0] if args else os.path.join(ROOT, 'build')
+    cmd = find_mpy_cross()
+    if cmd is None:
+        print('mpy-cross not found: pip install mpy-cross (same version as the firmware)')
+        sys.exit(1)
+
+    if os.path.exists(out):
+        shutil.rmtree(out)
+    os.makedirs(os.path.join(out, 'lib'))
+    total_src = 0
+    total_mpy = 0
+    for name in sorted(os.listdir(os.path.join(ROOT, 'lib'))):
+        if not name.endswith('.py'):
+            continue
+        src = os.path.join(ROOT, 'lib', name)
+        dst = os.path.join(out, 'lib', name[:-3] + '.mpy')
+        compile_file(cmd, src, dst, march)
+        total_src += os.path.getsize(src)
+        total_mpy += os.path.getsize(dst)
+        print(f"{'lib/' + name:20s} {os.path.getsize(src):7d} -> {os.path.getsize(dst):7d}")
+
+    compile_file(cmd, os.path.join(ROOT, 'main.py'), os.path.join(out, 'app.mpy'), march)
+    with open(os.path.join(out, 'main.py'), 'w') as f:
+        f.write('import app\napp.main()\n')
+    shutil.copy(os.path.join(ROOT, 'boot.py'), out)
+    shutil.copytree(os.path.join(ROOT, 'resource'), os.path.join(out, 'resource'))
+    print(f"lib: {total_src} bytes of source -> {total_mpy} bytes of bytecode, output in {out}")
+
+if __name__ == '__main__':
+    main()
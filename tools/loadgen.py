@@ -0,0 +1,261 @@
+# bee协议压测（在PC上运行）：python3 tools/loadgen.py [--devices N] [--turns T] [--host H --port P] ...
+# 每个模拟设备一条TCP连接：按16kHz实时速度（--speed倍，0为不限速）分帧上传一段录音，最后一帧eof=1；
+# 再按24kHz的播放速度消费回复的PCM_DATA/ADPCM_DATA，播放缓冲（同I2S_BUF_SIZE）满时不再读socket；
+# 收到EXIT_CHAT结束这次对话，停顿--idle秒后开始下一次；TOKEN_CLIP按设备逻辑回CLIP_HIT/CLIP_MISS
+# 不给--host时在本地起tools/sim/server.py的服务端自测，--echo回放录音，--exit-every每几轮回一次EXIT_CHAT
+# 结束后打印每轮延迟的分位数、上下行吞吐、播放卡顿和错误率
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'sim'))
+
+from lib.protocol import Frame, Request, Response, HEADER_SIZE
+from lib.codec import AdpcmEncoder, UlawEncoder, ADPCM_HEADER_SIZE
+from audio import speech
+
+MIC_RATE = 16000
+PLAY_RATE = 24000
+CHUNK = 4096                # 同main.py的SOCKET_BUF_SIZE：每帧上传的PCM字节数
+PLAY_BUFFER = 32768         # 同main.py的I2S_BUF_SIZE：设备能缓存的待播放字节数
+
+FORMATS = {'pcm': Request.PCM_FORMAT, 'adpcm': Request.ADPCM_FORMAT, 'ulaw': Request.ULAW_FORMAT}
+
+def encode_frames(pcm, format):
+    # 录音预先切帧编码，所有设备共用：[(帧数据, 对应的PCM字节数)]
+    frames = []
+    encoder = AdpcmEncoder() if format == Request.ADPCM_FORMAT else UlawEncoder() if format == Request.ULAW_FORMAT else None
+    for pos in range(0, len(pcm), CHUNK):
+        chunk = pcm[pos:pos + CHUNK]
+        if encoder:
+            buf = bytearray(encoder.encoded_size(len(chunk)))
+            n = encoder.encode(chunk, len(chunk), buf)
+            chunk = bytes(buf[:n])
+        frames.append((chunk, min(CHUNK, len(pcm) - pos)))
+    return frames
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+class Stats:
+    def __init__(self):
+        self.turns = []             # 每轮一个dict：first/last/total（ms）、underruns、result
+        self.errors = {}
+        self.sessions = 0
+        self.uplink_bytes = 0
+        self.downlink_bytes = 0
+        self.clip_hits = 0
+        self.clip_misses = 0
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, devices, elapsed):
+        done = len(self.turns)
+        errors = sum(self.errors.values())
+        exits = sum(1 for t in self.turns if t['result'] == 'exit')
+        lines = [f"{devices} devices  {done} turns ok  {exits} exit_chat  {self.sessions} sessions  "
+                 f"errors {errors} ({errors * 100 / max(done + errors, 1):.1f}%) {self.errors or ''}  elapsed {elapsed:.1f}s",
+                 f"uplink {self.uplink_bytes / elapsed / 1024:8.1f} KB/s   downlink {self.downlink_bytes / elapsed / 1024:8.1f} KB/s   "
+                 f"turns {done / elapsed:.2f}/s   clips hit {self.clip_hits} miss {self.clip_misses}",
+                 f"{'ms':24s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s}"]
+        for key, name in (('first', 'eof -> first audio'), ('last', 'eof -> last audio'),
+                          ('total', 'turn (upload..played)')):
+            values = [t[key] for t in self.turns if key in t]
+            lines.append(f"{name:24s} " + ' '.join(f"{percentile(values, p):8.0f}" for p in (50, 90, 99, 100)))
+        stalled = sum(1 for t in self.turns if t.get('underruns'))
+        lines.append(f"playback underruns: {stalled} of {done} turns")
+        return '\n'.join(lines)
+
+class Device:
+    def __init__(self, id, args, frames, format, stats):
+        self.id = id
+        self.args = args
+        self.frames = frames
+        self.format = format
+        self.stats = stats
+        self.clips = {}             # key -> 采样数，模拟设备的本地缓存
+        self.frame = Frame()
+        self.rnd = random.Random(id)
+
+    async def run(self, delay):
+        await asyncio.sleep(delay)
+        args = self.args
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(args.host, args.port), args.timeout)
+        except (OSError, asyncio.TimeoutError):
+            self.stats.error('connect')
+            return
+        self.stats.sessions += 1
+        try:
+            for i in range(args.turns):
+                try:
+                    result = await asyncio.wait_for(self.turn(reader, writer), args.timeout)
+                except asyncio.TimeoutError:
+                    self.stats.error('timeout')
+                    return
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    self.stats.error('closed')
+                    return
+                except ValueError:
+                    self.stats.error('protocol')
+                    return
+                self.stats.turns.append(result)
+                if i + 1 == args.turns:
+                    break
+                if result['result'] == 'exit':
+                    # 对话结束，等用户下次按键
+                    await asyncio.sleep(args.idle * self.rnd.uniform(0.5, 1.5))
+                    self.stats.sessions += 1
+        finally:
+            writer.close()
+
+    async def turn(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        await self.upload(writer, loop, begin)
+        eof = loop.time()
+        result = await self.receive(reader, writer, loop, eof)
+        result['total'] = (loop.time() - begin) * 1000
+        return result
+
+    async def upload(self, writer, loop, begin):
+        speed = self.args.speed
+        recorded = 0
+        for n, (data, pcm_len) in enumerate(self.frames):
+            recorded += pcm_len
+            if speed:
+                # 一帧录满之后才能发出
+                delay = begin + recorded / (MIC_RATE * 2) / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            eof = 1 if n + 1 == len(self.frames) else 0
+            writer.write(bytes(self.frame.pack(self.format, eof, len(data))))
+            writer.write(data)
+            await writer.drain()
+            self.stats.uplink_bytes += HEADER_SIZE + len(data)
+
+    async def send(self, writer, type, data=b''):
+        writer.write(bytes(self.frame.pack(type, 0, len(data))))
+        writer.write(data)
+        await writer.drain()
+
+    async def receive(self, reader, writer, loop, eof):
+        # play_end: 已收到的音频按播放速度预计播完的时刻
+        speed = self.args.speed or 0
+        play_end = 0
+        first = last = None
+        underruns = 0
+        storing = None
+        frame = self.frame
+        while True:
+            frame.unpack(await reader.readexactly(HEADER_SIZE))
+            data = await reader.readexactly(frame.length) if frame.length else b''
+            now = loop.time()
+            self.stats.downlink_bytes += HEADER_SIZE + frame.length
+            if frame.type == Response.EXIT_CHAT:
+                await asyncio.sleep(max(0, play_end - loop.time()))
+                return {'result': 'exit', 'underruns': underruns}
+            if frame.type == Response.TOKEN:
+                if not data or data[0] != Response.TOKEN_CLIP:
+                    continue
+                if len(data) == 1:
+                    # 未命中的一段音频发完，记入缓存
+                    if storing:
+                        self.clips[storing[0]] = storing[1]
+                    storing = None
+                    continue
+                key = bytes(data[1:])
+                if key in self.clips:
+                    self.stats.clip_hits += 1
+                    await self.send(writer, Request.CLIP_HIT, key)
+                    first = first or now
+                    last = now
+                    play_end = max(play_end, now) + self.clips[key] / PLAY_RATE / (speed or 1)
+                else:
+                    self.stats.clip_misses += 1
+                    await self.send(writer, Request.CLIP_MISS, key)
+                    storing = [key, 0]
+                continue
+            if frame.type == Response.PCM_DATA:
+                samples = frame.length // 2
+            elif frame.type == Response.ADPCM_DATA:
+                samples = max(frame.length - ADPCM_HEADER_SIZE, 0) * 2
+            else:
+                raise ValueError(f"unexpected response type {frame.type}")
+            if samples:
+                first = first or now
+                last = now
+                if storing:
+                    storing[1] += samples
+                if play_end and now > play_end:
+                    underruns += 1
+                play_end = max(play_end, now) + samples / PLAY_RATE / (speed or 1)
+                # 播放缓冲满了设备就不再读socket，把压力留给TCP窗口和服务端
+                wait = play_end - now - PLAY_BUFFER / (PLAY_RATE * 2) / (speed or 1)
+                if speed and wait > 0:
+                    await asyncio.sleep(wait)
+            if frame.eof:
+                break
+        if speed:
+            await asyncio.sleep(max(0, play_end - loop.time()))
+        result = {'result': 'ok', 'underruns': underruns}
+        if first:
+            result['first'] = (first - eof) * 1000
+            result['last'] = (last - eof) * 1000
+        return result
+
+async def run(args, frames, format):
+    stats = Stats()
+    devices = [Device(i, args, frames, format, stats) for i in range(args.devices)]
+    begin = time.monotonic()
+    await asyncio.gather(*(d.run(args.ramp * i / max(args.devices, 1)) for i, d in enumerate(devices)))
+    return stats, time.monotonic() - begin
+
+def main():
+    parser = argparse.ArgumentParser(description='bee protocol load generator')
+    parser.add_argument('--devices', type=int, default=10)
+    parser.add_argument('--turns', type=int, default=3, help='turns per device')
+    parser.add_argument('--host', help='bee server; a local stand-in server is started if omitted')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--speech', type=float, default=2.0, help='seconds of speech per turn')
+    parser.add_argument('--speed', type=float, default=1.0, help='upload/playback pace relative to real time, 0 = unpaced')
+    parser.add_argument('--format', choices=FORMATS, default='pcm')
+    parser.add_argument('--ramp', type=float, default=1.0, help='seconds over which devices connect')
+    parser.add_argument('--idle', type=float, default=1.0, help='pause after EXIT_CHAT before the next session')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-turn timeout in seconds')
+    parser.add_argument('--echo', action='store_true', help='local server: reply with the uploaded audio')
+    parser.add_argument('--tts-ms', type=int, default=1500, help='local server: reply length')
+    parser.add_argument('--think-ms', type=int, default=200, help='local server: processing delay')
+    parser.add_argument('--clips', action='store_true', help='local server: send replies as TOKEN_CLIP')
+    parser.add_argument('--exit-every', type=int, help='local server: EXIT_CHAT every N turns per connection')
+    args = parser.parse_args()
+
+    server = None
+    if not args.host:
+        from server import BeeServer
+        replies = (('greeting', 1200), ('answer', args.tts_ms), ('sorry', 900)) if args.clips else None
+        server = BeeServer(tts_ms=args.tts_ms, think_ms=args.think_ms, echo=args.echo, replies=replies,
+                           clips=args.clips, exit_every=args.exit_every).start()
+        args.host, args.port = server.host, server.port
+    format = FORMATS[args.format]
+    frames = encode_frames(speech(args.speech)[:int(args.speech * MIC_RATE) * 2], format)
+    print(f"{args.devices} devices -> {args.host}:{args.port}  {args.turns} turns each  "
+          f"{args.speech}s {args.format} speech  speed {args.speed or 'unpaced'}")
+    try:
+        stats, elapsed = asyncio.run(run(args, frames, format))
+    finally:
+        if server:
+            server.stop()
+    print(stats.report(args.devices, elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+# 会话录制文件（main.py的SESSION_FILE，格式见lib/session.py）的查看和回放（在PC上运行）：
+#   python3 tools/session.py info 录制文件
+#   python3 tools/session.py server 录制文件 [--port P] [--speed X] [--jitter MS] [--stall MS] [--stall-every N] [--record 输出]
+#   python3 tools/session.py device 录制文件 --host H [--port P] [...]
+# server扮演服务端：等设备连上后按录制的时间间隔发送下行帧；device扮演设备：向服务端发送录制的上行帧
+# 对方的帧不要求逐个对上：只在对方的eof帧和控制帧（CLIP_HIT/MISS、TOKEN、EXIT_CHAT）处等待同类型的帧到达，
+# 中间的音频帧和FRAME_HINT（发不发、何时发取决于实测吞吐）有多少读多少，换一段录音或换一台设备也能回放
+# --speed：1为原始节奏，大于1加速，0为不等待；--jitter在每个发出的帧前加0~MS的随机延迟，--stall每N帧卡顿一次
+# 录制时保存了数据则按字节原样发送，否则用同样长度的静音代替
+# 结束后逐轮对比录制和回放的“上行eof→首个下行音频”和下行帧间最大间隔（卡顿）
+import argparse
+import hashlib
+import os
+import random
+import select
+import socket
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'sim'))
+
+import upy
+upy.install()
+
+from lib.protocol import Frame, Request, Response, HEADER_SIZE
+from lib.session import SessionRecorder, read, UPLINK, DOWNLINK, CONNECT, DIRECTIONS
+from server import recv_exact
+
+AUDIO = {UPLINK: (Request.PCM_FORMAT, Request.ADPCM_FORMAT, Request.ULAW_FORMAT),
+         DOWNLINK: (Response.PCM_DATA, Response.ADPCM_DATA)}
+
+def load(path):
+    frame = Frame()
+    records = []
+    with open(path, 'rb') as f:
+        for direction, t, header, data in read(f):
+            if direction == CONNECT:
+                records.append((direction, t, 0, 0, 0, header, data))
+                continue
+            frame.unpack(header)
+            records.append((direction, t, frame.type, frame.eof, frame.length, header, data))
+    return records
+
+def turns(events):
+    # events: (方向, 微秒, 类型, eof, 长度)；以上行eof分轮，统计到首个下行音频的延迟和下行音频帧间最大间隔
+    result = []
+    current = None
+    last_audio = None
+    for direction, t, type, eof, length in events:
+        if direction == UPLINK and eof and type in AUDIO[UPLINK]:
+            current = {'eof': t, 'first': None, 'gap': 0, 'frames': 0}
+            result.append(current)
+            last_audio = None
+        elif direction == DOWNLINK and current and type in AUDIO[DOWNLINK] and length:
+            if current['first'] is None:
+                current['first'] = t - current['eof']
+            if last_audio is not None:
+                current['gap'] = max(current['gap'], t - last_audio)
+            last_audio = t
+            current['frames'] += 1
+    return result
+
+def info(records):
+    counts = {}
+    payload = 0
+    for direction, t, type, eof, length, header, data in records:
+        key = (DIRECTIONS[direction], type)
+        counts[key] = counts.get(key, 0) + 1
+        if data:
+            payload += len(data)
+    duration = records[-1][1] / 1e6 if records else 0
+    print(f"{len(records)} records over {duration:.1f}s, {payload} payload bytes saved")
+    for (direction, type), n in sorted(counts.items()):
+        print(f"  {direction:8s} type {type:2d}: {n}")
+    for i, turn in enumerate(turns([r[:5] for r in records])):
+        first = f"{turn['first'] / 1000:.0f}ms" if turn['first'] is not None else '-'
+        print(f"  turn {i + 1}: eof->first audio {first}  max gap {turn['gap'] / 1000:.0f}ms  {turn['frames']} frames")
+
+class Replayer:
+    def __init__(self, records, role, args):
+        self.records = records
+        self.ours = DOWNLINK if role == 'server' else UPLINK
+        self.theirs = UPLINK if role == 'server' else DOWNLINK
+        self.role = role
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        self.listener = None
+        self.sock = None
+        self.frame = Frame()
+        self.events = []            # 回放中实际发送和收到的帧
+        self.begin = time.monotonic()
+        self.sent = 0
+        self.received = hashlib.sha256()
+        self.recorder = SessionRecorder(args.record, True, 1 << 30, role == 'device') if args.record else None
+        if role == 'server':
+            self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.listener.bind((args.bind, args.port))
+            self.listener.listen(1)
+            print(f"replaying as server on {args.bind}:{self.listener.getsockname()[1]}")
+
+    def now(self):
+        return int((time.monotonic() - self.begin) * 1e6)
+
+    def connect(self):
+        if self.sock:
+            self.sock.close()
+        if self.role == 'server':
+            self.sock, addr = self.listener.accept()
+            print('device connected from', addr)
+        else:
+            self.sock = socket.create_connection((self.args.host, self.args.port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.recorder:
+            self.recorder.connect()
+
+    def receive(self):
+        # 读一个对方的帧，心跳不计
+        header = recv_exact(self.sock, HEADER_SIZE)
+        self.frame.unpack(header)
+        type, eof, length = self.frame.type, self.frame.eof, self.frame.length
+        data = recv_exact(self.sock, length) if length else b''
+        if type == Request.KEEPALIVE and self.theirs == UPLINK:
+            return None
+        self.events.append((self.theirs, self.now(), type, eof, length))
+        self.received.update(data)
+        if self.recorder:
+            self.recorder.received(header, length)
+            self.recorder.data(data)
+        return type, eof
+
+    def drain(self):
+        while select.select([self.sock], [], [], 0)[0]:
+            self.receive()
+
+    def wait_for(self, type, eof):
+        while True:
+            got = self.receive()
+            if got == (type, eof):
+                return
+
+    def send(self, header, data, length):
+        if data is None:
+            data = bytes(length)
+        self.sock.sendall(header)
+        if data:
+            self.sock.sendall(data)
+        self.frame.unpack(header)
+        self.events.append((self.ours, self.now(), self.frame.type, self.frame.eof, length))
+        if self.recorder:
+            self.recorder.sent(header, data)
+        self.sent += 1
+
+    def delay(self):
+        # 按压力参数附加的延迟（秒）
+        extra = self.rnd.uniform(0, self.args.jitter) if self.args.jitter else 0
+        if self.args.stall and self.args.stall_every and self.sent and self.sent % self.args.stall_every == 0:
+            extra += self.args.stall
+        return extra / 1000
+
+    def run(self):
+        speed = self.args.speed
+        anchor_rec = None           # 最近一个实际发生的事件在录制中的时刻(us)和回放中的时刻(秒)
+        anchor_real = None
+        for direction, t, type, eof, length, header, data in self.records:
+            if direction == CONNECT:
+                self.connect()
+                anchor_rec, anchor_real = t, time.monotonic()
+                continue
+            if self.sock is None:
+                self.connect()
+                anchor_rec, anchor_real = t, time.monotonic()
+            if direction == self.theirs:
+                if type == Request.KEEPALIVE and direction == UPLINK:
+                    continue
+                if eof or type not in AUDIO[direction] and type != Request.FRAME_HINT:
+                    self.wait_for(type, eof)
+                    anchor_rec, anchor_real = t, time.monotonic()
+                else:
+                    self.drain()
+                continue
+            due = anchor_real + ((t - anchor_rec) / 1e6 / speed if speed else 0) + self.delay()
+            while True:
+                wait = due - time.monotonic()
+                if wait <= 0:
+                    break
+                # 等待期间继续读对方的帧，免得对方发送阻塞
+                if select.select([self.sock], [], [], wait)[0]:
+                    self.receive()
+            self.send(header, data, length)
+            anchor_rec, anchor_real = t, time.monotonic()
+        # 回放结束后再收一会儿对方剩下的帧
+        end = time.monotonic() + self.args.linger
+        while time.monotonic() < end and select.select([self.sock], [], [], end - time.monotonic())[0]:
+            try:
+                self.receive()
+            except EOFError:
+                break
+        self.sock.close()
+        if self.recorder:
+            self.recorder.close()
+
+def compare(records, replayer):
+    recorded = turns([r[:5] for r in records])
+    replayed = turns(replayer.events)
+    print(f"{'turn':>4s} {'first(rec)':>11s} {'first(rep)':>11s} {'gap(rec)':>9s} {'gap(rep)':>9s}")
+    for i in range(max(len(recorded), len(replayed))):
+        row = [f"{i + 1:4d}"]
+        for turn in (recorded[i] if i < len(recorded) else None, replayed[i] if i < len(replayed) else None):
+            row.append(f"{turn['first'] / 1000:9.0f}ms" if turn and turn['first'] is not None else f"{'-':>11s}")
+        for turn in (recorded[i] if i < len(recorded) else None, replayed[i] if i < len(replayed) else None):
+            row.append(f"{turn['gap'] / 1000:7.0f}ms" if turn else f"{'-':>9s}")
+        print(' '.join(row))
+    # 对方发来的数据与录制的是否逐字节一致（录制时保存了数据才能比较）
+    theirs = [r for r in records if r[0] == replayer.theirs and not (r[2] == Request.KEEPALIVE and r[0] == UPLINK)]
+    if theirs and all(r[6] is not None for r in theirs):
+        expected = hashlib.sha256(b''.join(r[6] for r in theirs)).digest()
+        print('payload from peer:', 'identical' if expected == replayer.received.digest() else 'differs')
+
+def main():
+    parser = argparse.ArgumentParser(description='inspect and replay bee session recordings')
+    parser.add_argument('mode', choices=('info', 'server', 'device'))
+    parser.add_argument('file')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--bind', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--speed', type=float, default=1.0, help='1 = original pacing, >1 faster, 0 = no waiting')
+    parser.add_argument('--jitter', type=float, default=0, help='random extra delay per sent frame, ms')
+    parser.add_argument('--stall', type=float, default=0, help='stall length, ms')
+    parser.add_argument('--stall-every', type=int, default=0, help='stall before every N-th sent frame')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--linger', type=float, default=1.0, help='seconds to keep reading after the last frame')
+    parser.add_argument('--record', help='record the replay to a new session file')
+    args = parser.parse_args()
+
+    records = load(args.file)
+    if args.mode == 'info':
+        info(records)
+        return
+    replayer = Replayer(records, args.mode, args)
+    try:
+        replayer.run()
+    except (EOFError, OSError) as e:
+        print('replay stopped:', e)
+    compare(records, replayer)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# 模拟用的音频素材：16位小端单声道PCM
+import math
+import random
+import struct
+
+def speech(seconds, rate=16000, seed=1, noise=60):
+    # 几个带包络的浊音段，后面跟静音，供麦克风替身播放
+    rnd = random.Random(seed)
+    samples = []
+    t = 0.3
+    segments = []
+    while t < seconds:
+        length = rnd.uniform(0.15, 0.45)
+        segments.append((t, min(t + length, seconds), rnd.uniform(90, 250)))
+        t += length + rnd.uniform(0.05, 0.25)
+    for i in range(int((seconds + 1.0) * rate)):
+        x = i / rate
+        s = rnd.gauss(0, noise)
+        for begin, end, f0 in segments:
+            if begin <= x < end:
+                env = math.sin(math.pi * (x - begin) / (end - begin))
+                s += 6000 * env * (math.sin(2 * math.pi * f0 * x) + 0.4 * math.sin(6 * math.pi * f0 * x))
+        samples.append(max(-32768, min(32767, int(s))))
+    return struct.pack(f'<{len(samples)}h', *samples)
+
+def tone(ms, rate=24000, freq=440, amp=8000):
+    n = rate * ms // 1000
+    return struct.pack(f'<{n}h', *(int(amp * math.sin(2 * math.pi * freq * i / rate)) for i in range(n)))
@@ -0,0 +1,88 @@
+# PC上的framebuf模块替身：实现本仓库用到的单色格式和绘图接口，像素语义与设备一致
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        self.buf = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = stride or width
+
+    def _index(self, x, y):
+        if self.format == MONO_VLSB:
+            return (y >> 3) * self.stride + x, y & 7
+        index = (x + y * self.stride) >> 3
+        offset = x & 7
+        if self.format == MONO_HLSB:
+            offset = 7 - offset
+        return index, offset
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        index, offset = self._index(x, y)
+        if c is None:
+            return (self.buf[index] >> offset) & 1
+        if c:
+            self.buf[index] |= 1 << offset
+        else:
+            self.buf[index] &= ~(1 << offset) & 0xFF
+
+    def fill(self, c):
+        v = 0xFF if c else 0
+        for i in range(len(self.buf)):
+            self.buf[i] = v
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(y, 0), min(y + h, self.height)):
+            for xx in range(max(x, 0), min(x + w, self.width)):
+                self.pixel(xx, yy, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        steps = max(abs(x2 - x1), abs(y2 - y1), 1)
+        for i in range(steps + 1):
+            self.pixel(x1 + (x2 - x1) * i // steps, y1 + (y2 - y1) * i // steps, c)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + fbuf.width, self.width)
+        y1 = min(y + fbuf.height, self.height)
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                c = fbuf.pixel(xx - x, yy - y)
+                if c != key:
+                    self.pixel(xx, yy, c)
+
+    def scroll(self, dx, dy):
+        src = FrameBuffer(bytearray(self.buf), self.width, self.height, self.format, self.stride)
+        self.blit(src, dx, dy)
+
+    def text(self, s, x, y, c=1):
+        # 没有设备上的8x8字库，用字符编码的位图近似，只保证每个字符占8x8且透明背景
+        for ch in s:
+            code = ord(ch)
+            for row in range(8):
+                bits = (code * (row + 3)) & 0xFF
+                for col in range(8):
+                    if bits & (0x80 >> col):
+                        self.pixel(x + col, y + row, c)
+            x += 8
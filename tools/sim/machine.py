@@ -0,0 +1,223 @@
+# PC上的machine模块替身
+import asyncio
+import copy
+import threading
+import time
+
+class Pin:
+    # handlers记录各引脚注册的中断回调，模拟程序用press()触发按键
+    handlers = {}
+    IN = 1
+    OUT = 3
+    PULL_UP = 2
+    IRQ_FALLING = 2
+    IRQ_RISING = 1
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self.pull = pull
+        self._value = 1 if pull == Pin.PULL_UP else 0
+        if value is not None:
+            self._value = value
+        self.handler = None
+        self.trigger = 0
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def irq(self, handler=None, trigger=3):
+        self.handler = handler
+        self.trigger = trigger
+        Pin.handlers[self.id] = self
+
+    @staticmethod
+    def press(id):
+        pin = Pin.handlers.get(id)
+        if pin and pin.handler:
+            pin.handler(pin)
+
+class I2S:
+    # 按真实采样率产生和消耗数据：RX从rx_source读出PCM（之后是静音），读得慢了会像DMA一样丢掉最旧的数据；
+    # TX按播放速度排空内部缓冲，写满时阻塞，设置irq后变为非阻塞并在播完时回调
+    RX = 0
+    TX = 1
+    MONO = 0
+    STEREO = 1
+
+    # sessions按配置顺序记录每次构造或init()，init()前的统计保存为快照
+    rx_source = b''
+    sessions = []
+
+    def __init__(self, id, sck=None, ws=None, sd=None, mode=RX, bits=16, format=MONO, rate=16000, ibuf=20000):
+        self.id = id
+        self.mode = mode
+        self.rate = rate
+        self.bytes_per_s = rate * bits // 8 * (2 if format == I2S.STEREO else 1)
+        self.ibuf = ibuf
+        self.handler = None
+        self.start = time.monotonic()
+        self.pos = 0
+        self.dropped = 0
+        self.queue_end = None
+        self.written = 0
+        self.underruns = 0
+        self.gap_s = 0.0
+        self.first_write = None
+        I2S.sessions.append(self)
+
+    def init(self, **kwargs):
+        for i, session in enumerate(I2S.sessions):
+            if session is self:
+                I2S.sessions[i] = copy.copy(self)
+        self.__init__(self.id, **kwargs)
+
+    def deinit(self):
+        pass
+
+    def irq(self, handler):
+        self.handler = handler
+
+    def produced(self):
+        return int((time.monotonic() - self.start) * self.bytes_per_s) & ~1
+
+    def rx_wait(self, n):
+        produced = self.produced()
+        if produced - self.pos > self.ibuf:
+            self.dropped += produced - self.pos - self.ibuf
+            self.pos = produced - self.ibuf
+        return max(0.0, (self.pos + n - produced) / self.bytes_per_s)
+
+    def rx_copy(self, buf, n):
+        src = I2S.rx_source[self.pos:self.pos + n]
+        buf[:len(src)] = src
+        buf[len(src):n] = bytes(n - len(src))
+        self.pos += n
+        return n
+
+    def readinto(self, buf):
+        n = len(buf) & ~1
+        delay = self.rx_wait(n)
+        if delay:
+            time.sleep(delay)
+        return self.rx_copy(buf, n)
+
+    async def areadinto(self, buf):
+        n = len(buf) & ~1
+        delay = self.rx_wait(n)
+        if delay:
+            await asyncio.sleep(delay)
+        return self.rx_copy(buf, n)
+
+    def write(self, buf):
+        n = len(buf)
+        now = time.monotonic()
+        if self.queue_end is None:
+            self.first_write = now
+            self.queue_end = now
+        elif self.queue_end < now:
+            # 设置irq后是收尾的排空写入，不算播放中断
+            if self.handler is None:
+                self.underruns += 1
+                self.gap_s += now - self.queue_end
+            self.queue_end = now
+        need = n / self.bytes_per_s
+        space = self.ibuf / self.bytes_per_s - (self.queue_end - now)
+        if self.handler is None and need > space:
+            time.sleep(need - space)
+        self.queue_end += need
+        self.written += n
+        if self.handler:
+            threading.Timer(max(0.0, self.queue_end - time.monotonic()), self.handler, [self]).start()
+        return n
+
+class I2C:
+    # 记录事务数和字节数，并按SSD1306的控制字节规则模拟显存，用来统计和校验刷新开销
+    # 每字节9位，每个事务另有起止位和地址字节，按此估算总线时间
+    SSD1306_ARGS = {0x20: 1, 0x21: 2, 0x22: 2, 0x81: 1, 0x8D: 1, 0xA8: 1, 0xD3: 1, 0xD5: 1, 0xD9: 1, 0xDA: 1, 0xDB: 1}
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000, width=128, pages=8):
+        self.id = id
+        self.freq = freq
+        self.transactions = 0
+        self.bytes = 0
+        self.width = width
+        self.ram = bytearray(width * pages)
+        self.window = [0, width - 1, 0, pages - 1]
+        self.col = 0
+        self.page = 0
+        self.cmd = []
+
+    def reset(self):
+        self.transactions = 0
+        self.bytes = 0
+
+    def bus_ms(self):
+        return (self.bytes * 9 + self.transactions * 20) * 1000 / self.freq
+
+    def command(self, byte):
+        self.cmd.append(byte)
+        if len(self.cmd) <= self.SSD1306_ARGS.get(self.cmd[0], 0):
+            return
+        op = self.cmd[0]
+        if op == 0x21:
+            self.window[0:2] = self.cmd[1:3]
+            self.col = self.cmd[1]
+        elif op == 0x22:
+            self.window[2:4] = self.cmd[1:3]
+            self.page = self.cmd[1]
+        self.cmd = []
+
+    def data(self, byte):
+        self.ram[self.page * self.width + self.col] = byte
+        self.col += 1
+        if self.col > self.window[1]:
+            self.col = self.window[0]
+            self.page = self.page + 1 if self.page < self.window[3] else self.window[2]
+
+    def transfer(self, data):
+        self.transactions += 1
+        self.bytes += len(data) + 1
+        i = 0
+        while i < len(data):
+            control = data[i]
+            handle = self.data if control & 0x40 else self.command
+            if control & 0x80:
+                handle(data[i + 1])
+                i += 2
+            else:
+                for byte in data[i + 1:]:
+                    handle(byte)
+                return
+
+    def writeto(self, addr, buf, stop=True):
+        self.transfer(bytes(buf))
+        return len(buf)
+
+    def writevto(self, addr, vector, stop=True):
+        self.transfer(b''.join(bytes(b) for b in vector))
+
+    def scan(self):
+        return [0x3C]
+
+class SoftI2C(I2C):
+    def __init__(self, scl=None, sda=None, freq=400000, timeout=50000):
+        super().__init__(-1, scl, sda, freq)
+
+def freq():
+    return 160000000
+
+def reset():
+    raise SystemExit('machine.reset()')
+
+def unique_id():
+    return b'\x00\x11\x22\x33\x44\x55'
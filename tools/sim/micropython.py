@@ -0,0 +1,16 @@
+# PC上的micropython模块替身
+def const(x):
+    return x
+
+def native(f):
+    return f
+
+def viper(f):
+    return f
+
+def schedule(func, arg):
+    func(arg)
+    return True
+
+def alloc_emergency_exception_buf(size):
+    pass
@@ -0,0 +1,72 @@
+# PC上的network模块替身：本机网络直接可用，按下面的时长模拟关联和DHCP的耗时
+STA_IF = 0
+AP_IF = 1
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 1010
+
+import time
+
+class WLAN:
+    # 耗时参数（秒）：scan为一次全信道扫描，connect为不指定BSSID时的扫描加关联，
+    # bssid_connect为指定BSSID直连，dhcp为获取地址（设置了静态IP时跳过）
+    scan_s = 0.0
+    connect_s = 0.0
+    bssid_connect_s = 0.0
+    dhcp_s = 0.0
+    ssid = None                 # 可连接的SSID，None时任意SSID都能连上
+    bssid = b'\x02\x11\x22\x33\x44\x55'
+    channel = 6
+
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._active = False
+        self._connected_at = None
+        self._static = False
+        self._config = {'mac': b'\x00\x11\x22\x33\x44\x55', 'channel': 1, 'ssid': ''}
+        self._ifconfig = ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = bool(value)
+
+    def connect(self, ssid=None, key=None, *, bssid=None):
+        self._config['ssid'] = ssid
+        if (WLAN.ssid is not None and ssid != WLAN.ssid) or (bssid is not None and bssid != WLAN.bssid):
+            # 找不到AP，一直连不上
+            self._connected_at = float('inf')
+            return
+        delay = WLAN.bssid_connect_s if bssid is not None else WLAN.connect_s
+        if not self._static:
+            delay += WLAN.dhcp_s
+        self._connected_at = time.monotonic() + delay
+
+    def disconnect(self):
+        self._connected_at = None
+
+    def isconnected(self):
+        return self._connected_at is not None and time.monotonic() >= self._connected_at
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return -50
+        return STAT_GOT_IP if self.isconnected() else STAT_IDLE
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig
+        self._ifconfig = tuple(config)
+        self._static = True
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config.get(args[0])
+        self._config.update(kwargs)
+
+    def scan(self):
+        time.sleep(WLAN.scan_s)
+        ssid = (WLAN.ssid or 'sim').encode()
+        return [(ssid, WLAN.bssid, WLAN.channel, -50, 3, 0),
+                (ssid, b'\x02\x11\x22\x33\x44\x66', 11, -70, 3, 0),
+                (b'neighbour', b'\x02\x99\x22\x33\x44\x55', 1, -60, 3, 0)]
@@ -0,0 +1,22 @@
+# PC上的ntptime模块替身：reachable为False时模拟服务器不可达，每次等满timeout后失败
+# time_scale用来按比例缩短等待，calls记录请求次数
+host = 'pool.ntp.org'
+NTP_DELTA = 3155673600
+timeout = 1
+reachable = True
+delay_s = 0.0
+time_scale = 1.0
+calls = 0
+
+def settime():
+    global calls
+    import time as _time
+    calls += 1
+    if not reachable:
+        _time.sleep(timeout * time_scale)
+        raise OSError(110)
+    _time.sleep(delay_s * time_scale)
+
+def time():
+    import time as _time
+    return int(_time.time())
@@ -0,0 +1,290 @@
+# 本地bee协议服务端替身：收完一轮上行音频（eof=1）后回一段TTS音频，echo=True时回放收到的录音
+# 每轮的关键时间点记录在turns里，供模拟和压测脚本统计延迟
+import array
+import os
+import select
+import socket
+import sys
+import threading
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from lib.protocol import Frame, Request, Response, Caps, HEADER_SIZE, MAX_LENGTH
+from lib.clips import clip_key
+from audio import tone
+
+def recv_exact(conn, n):
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    got = 0
+    while got < n:
+        r = conn.recv_into(mv[got:], n - got)
+        if not r:
+            raise EOFError("Connection closed")
+        got += r
+    return buf
+
+def resample(pcm, src, dst):
+    # 最近邻重采样16位PCM，回显用，不追求音质
+    samples = array.array('h', bytes(pcm[:len(pcm) & ~1]))
+    n = len(samples) * dst // src
+    return array.array('h', (samples[i * src // dst] for i in range(n))).tobytes()
+
+class BeeServer:
+    # tts_ms: 每轮回复的音频时长；pace: 回复的发送速度相对实时的倍数，0表示不限速
+    # think_ms: 收到eof后模拟ASR/LLM/TTS处理的等待；exit_after: 第几轮后回EXIT_CHAT
+    # replies: 每轮依次使用的回复(名称, 时长ms)，不同名称合成不同的音频；clips: 用TOKEN_CLIP让设备播放缓存的音频
+    # echo: 把本轮上行的16kHz PCM转成24kHz作为回复，压缩格式的上行仍回TTS音频
+    # exit_every: 每条连接每隔几轮回一次EXIT_CHAT，压测时代替按总轮数计的exit_after
+    # hello: 应答设备的能力声明，False时模拟不认识声明的老服务端；prefer: 协商时优先选择的
+    # uplink/frame/mic_rate/play_rate，设备不支持的项按老协议的默认值选
+    # text: 每轮回复的文字，按词拆成TOKEN_TEXT，eof后ttft_ms发第一段、之后每token_ms一段，和音频帧穿插发送
+    def __init__(self, host='127.0.0.1', port=0, tts_ms=1500, chunk=4096, pace=0, think_ms=200,
+                 exit_after=None, is_local=0, replies=None, clips=False, echo=False, exit_every=None,
+                 hello=True, prefer=None, text=None, ttft_ms=80, token_ms=40):
+        self.tts = tone(tts_ms)
+        self.replies = replies
+        self.clips = clips
+        self.echo = echo
+        self.audio = {}
+        self.chunk = chunk
+        self.pace = pace
+        self.think_ms = think_ms
+        self.exit_after = exit_after
+        self.exit_every = exit_every
+        self.is_local = is_local
+        self.hello = hello
+        self.prefer = prefer or {}
+        self.peers = {}             # 连接 -> 协商结果，没有协商的连接按老协议
+        self.hints = {}             # 连接 -> 设备最近一次FRAME_HINT给出的下行帧长
+        self.text = text
+        self.ttft_ms = ttft_ms
+        self.token_ms = token_ms
+        self.hellos = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(128)
+        self.host = host
+        self.port = self.sock.getsockname()[1]
+        self.turns = []
+        self.keepalives = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.serve, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+    def serve(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        frame = Frame()
+        count = 0
+        try:
+            while self.running:
+                turn = self.receive_turn(conn, frame)
+                if turn is None:
+                    continue
+                count += 1
+                turn['exit_chat'] = bool(self.exit_every and count % self.exit_every == 0)
+                with self.lock:
+                    self.turns.append(turn)
+                    index = len(self.turns)
+                self.respond(conn, frame, turn, index)
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.peers.pop(conn, None)
+            self.hints.pop(conn, None)
+            conn.close()
+
+    def receive_turn(self, conn, frame):
+        turn = {'uplink_bytes': 0, 'uplink_frames': 0, 'formats': set()}
+        pcm = bytearray()
+        while True:
+            frame.unpack(recv_exact(conn, HEADER_SIZE))
+            data = recv_exact(conn, frame.length) if frame.length else b''
+            if frame.type == Request.KEEPALIVE:
+                if frame.flags & Caps.HELLO_FLAG and self.hello:
+                    caps = self.negotiate(Caps.parse_offer(data))
+                    self.peers[conn] = caps
+                    self.hellos += 1
+                    answer = caps.pack()
+                    conn.sendall(frame.pack(Response.HELLO, 0, len(answer), self.is_local))
+                    conn.sendall(answer)
+                else:
+                    self.keepalives += 1
+                if not turn['uplink_frames']:
+                    return None
+                continue
+            if frame.type == Request.FRAME_HINT:
+                self.hint(conn, data)
+                continue
+            now = time.monotonic()
+            turn.setdefault('first_uplink', now)
+            turn['uplink_bytes'] += frame.length
+            turn['uplink_frames'] += 1
+            turn['formats'].add(frame.type)
+            if self.echo and frame.type == Request.PCM_FORMAT:
+                pcm += data
+            if frame.eof:
+                turn['eof'] = now
+                caps = self.peers.get(conn)
+                if self.echo and turn['formats'] == {Request.PCM_FORMAT}:
+                    turn['echo'] = resample(pcm, caps.mic_rate if caps else 16000, 24000)
+                return turn
+
+    def negotiate(self, offer):
+        def pick(key, offered, default):
+            value = self.prefer.get(key, default)
+            return value if value in offered else default if default in offered else offered[0]
+        uplink = pick('uplink', offer['uplinks'], Request.PCM_FORMAT)
+        mic_rate = pick('mic_rate', offer['mic_rates'], 16000)
+        play_rate = pick('play_rate', offer['play_rates'], 24000)
+        frame = min(self.prefer.get('frame', 4096), offer['max_up'])
+        features = offer['features'] & ((Caps.FEATURE_CLIPS if self.clips else 0) | Caps.FEATURE_FRAME_HINT
+                                        | (Caps.FEATURE_TEXT if self.text else 0))
+        return Caps(uplink, Response.PCM_DATA, frame, mic_rate, play_rate, features, Caps.VERSION)
+
+    def reply(self, index, turn=None):
+        if turn and turn.get('echo'):
+            return turn.pop('echo')
+        if not self.replies:
+            return self.tts
+        name, ms = self.replies[(index - 1) % len(self.replies)]
+        if name not in self.audio:
+            self.audio[name] = tone(ms, freq=200 + zlib.crc32(name.encode()) % 600)
+        return self.audio[name]
+
+    def read_request(self, conn, frame):
+        # 读一个设备发来的请求帧，跳过心跳和帧长提示
+        while True:
+            frame.unpack(recv_exact(conn, HEADER_SIZE))
+            data = recv_exact(conn, frame.length) if frame.length else b''
+            if frame.type == Request.FRAME_HINT:
+                self.hint(conn, data)
+            elif frame.type != Request.KEEPALIVE:
+                return frame.type, data
+
+    def hint(self, conn, data):
+        if len(data) >= 2:
+            self.hints[conn] = data[0] | data[1] << 8
+
+    def poll_hints(self, conn, frame):
+        # 下行发送过程中设备可能发来FRAME_HINT，不阻塞地读掉
+        while select.select([conn], [], [], 0)[0]:
+            frame.unpack(recv_exact(conn, HEADER_SIZE))
+            data = recv_exact(conn, frame.length) if frame.length else b''
+            if frame.type == Request.FRAME_HINT:
+                self.hint(conn, data)
+
+    def tokens(self, conn, turn):
+        # 按时间排好的(发送时刻, TOKEN_TEXT数据)；协商过的设备没有声明文字能力时不发，没有协商的照发（老设备忽略）
+        caps = self.peers.get(conn)
+        if not self.text or caps and not caps.features & Caps.FEATURE_TEXT:
+            return []
+        words = self.text.split(' ')
+        begin = turn['eof'] + self.ttft_ms / 1000
+        return [(begin + i * self.token_ms / 1000,
+                 bytes([Response.TOKEN_TEXT]) + (word if i == len(words) - 1 else word + ' ').encode())
+                for i, word in enumerate(words)]
+
+    def send_text(self, conn, frame, turn, until=None, flush=False):
+        # 发出已到时刻的文字；until给出时边等边发直到该时刻，flush时剩下的全部发出
+        pending = turn.get('tokens')
+        while pending:
+            due, token = pending[0]
+            if not flush:
+                delay = due - time.monotonic()
+                if delay > 0:
+                    if until is None or due > until:
+                        break
+                    time.sleep(delay)
+            pending.pop(0)
+            # 帧头和数据一次发出，分两次写小包会被Nagle和延迟确认卡住约40ms
+            conn.sendall(bytes(frame.pack(Response.TOKEN, 0, len(token), self.is_local)) + token)
+            turn.setdefault('first_token', time.monotonic())
+        if until is not None:
+            time.sleep(max(0, until - time.monotonic()))
+
+    def respond(self, conn, frame, turn, index):
+        turn['tokens'] = self.tokens(conn, turn)
+        self.send_text(conn, frame, turn, until=turn['eof'] + self.think_ms / 1000)
+        if turn.pop('exit_chat', False) or self.exit_after and index >= self.exit_after:
+            conn.sendall(frame.pack(Response.EXIT_CHAT, 1, 0, self.is_local))
+            turn['exit'] = time.monotonic()
+            return
+        pcm = self.reply(index, turn)
+        turn['downlink_bytes'] = 0
+        caps = self.peers.get(conn)
+        rate = caps.play_rate if caps else 24000
+        if rate != 24000:
+            pcm = resample(pcm, 24000, rate)
+        # 协商过的设备没有声明缓存能力时不发TOKEN_CLIP；没有协商的按老协议照发
+        if not self.clips or caps and not caps.features & Caps.FEATURE_CLIPS:
+            self.stream(conn, frame, pcm, turn, True, rate)
+            return
+        token = bytes([Response.TOKEN_CLIP]) + clip_key(pcm)
+        conn.sendall(frame.pack(Response.TOKEN, 0, len(token), self.is_local))
+        conn.sendall(token)
+        type, _ = self.read_request(conn, frame)
+        turn['clip'] = 'hit' if type == Request.CLIP_HIT else 'miss'
+        if type == Request.CLIP_MISS:
+            self.stream(conn, frame, pcm, turn, False, rate)
+            conn.sendall(frame.pack(Response.TOKEN, 0, 1, self.is_local))
+            conn.sendall(bytes([Response.TOKEN_CLIP]))
+        self.send_text(conn, frame, turn, flush=True)
+        conn.sendall(frame.pack(Response.PCM_DATA, 1, 0, self.is_local))
+        turn['last_downlink'] = time.monotonic()
+
+    def stream(self, conn, frame, pcm, turn, last, rate=24000):
+        # 设备发过FRAME_HINT时按提示的帧长发送，否则固定用chunk
+        mv = memoryview(pcm)
+        begin = time.monotonic()
+        pos = 0
+        turn.setdefault('downlink_frames', 0)
+        while pos < len(pcm):
+            self.poll_hints(conn, frame)
+            size = min(self.hints.get(conn, self.chunk), MAX_LENGTH) & ~1
+            data = mv[pos:pos + size]
+            eof = 1 if last and pos + size >= len(pcm) else 0
+            if self.pace:
+                # 按实时速度的pace倍发送
+                due = begin + pos / (rate * 2) / self.pace
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self.send_text(conn, frame, turn, flush=bool(eof))
+            conn.sendall(frame.pack(Response.PCM_DATA, eof, len(data), self.is_local))
+            conn.sendall(data)
+            turn.setdefault('first_downlink', time.monotonic())
+            turn['downlink_frames'] += 1
+            pos += size
+        turn['last_downlink'] = time.monotonic()
+        turn['downlink_bytes'] += len(pcm)
+
+if __name__ == '__main__':
+    # python3 tools/sim/server.py [端口] [--echo]
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    server = BeeServer(host='0.0.0.0', port=int(args[0]) if args else 3000, echo='--echo' in sys.argv).start()
+    print(f"bee server listening on {server.host}:{server.port}{' (echo)' if server.echo else ''}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,147 @@
+# 在CPython上补齐MicroPython特有的接口：time.ticks_*、asyncio.sleep_ms、
+# asyncio.StreamReader/StreamWriter包装I2S和socket、socket.readinto/write
+# 用法：把tools/sim放到sys.path最前面，再调用install()
+import asyncio
+import gc
+import socket
+import threading
+import time
+
+_origin = time.monotonic_ns()
+
+def ticks_ms():
+    return (time.monotonic_ns() - _origin) // 1000000
+
+def ticks_us():
+    return (time.monotonic_ns() - _origin) // 1000
+
+def ticks_diff(a, b):
+    return a - b
+
+def ticks_add(a, b):
+    return a + b
+
+def sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
+
+async def async_sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+async def wait_for_ms(aw, timeout):
+    return await asyncio.wait_for(aw, timeout / 1000)
+
+class ThreadSafeFlag:
+    # MicroPython的asyncio.ThreadSafeFlag：可以在中断（这里是其他线程）里set，唤醒一个等待者
+    def __init__(self):
+        self.state = False
+        self.lock = threading.Lock()
+        self.waiter = None
+
+    def set(self):
+        with self.lock:
+            self.state = True
+            waiter = self.waiter
+        if waiter:
+            waiter[0].call_soon_threadsafe(self.wake, waiter[1])
+
+    @staticmethod
+    def wake(fut):
+        if not fut.done():
+            fut.set_result(None)
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        with self.lock:
+            if self.state:
+                self.state = False
+                return
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self.waiter = (loop, fut)
+        try:
+            await fut
+        finally:
+            self.waiter = None
+        self.state = False
+
+class StreamReader:
+    # MicroPython的asyncio.StreamReader(obj)：I2S替身提供areadinto，socket按非阻塞读轮询
+    def __init__(self, obj, extra=None):
+        self.s = obj
+
+    async def readinto(self, buf):
+        if hasattr(self.s, 'areadinto'):
+            return await self.s.areadinto(buf)
+        while True:
+            try:
+                return self.s.readinto(buf)
+            except BlockingIOError:
+                await asyncio.sleep(0.001)
+
+class StreamWriter:
+    # MicroPython的asyncio.StreamWriter(sock, {})：先尝试直接写，写不完的部分在drain()里发完
+    def __init__(self, obj, extra=None):
+        self.s = obj
+        self.out_buf = b''
+
+    def write(self, buf):
+        if not self.out_buf:
+            try:
+                ret = self.s.send(buf)
+            except BlockingIOError:
+                ret = 0
+            if ret == len(buf):
+                return
+            buf = buf[ret:]
+        self.out_buf += bytes(buf)
+
+    async def drain(self):
+        while self.out_buf:
+            try:
+                ret = self.s.send(self.out_buf)
+                self.out_buf = self.out_buf[ret:]
+            except BlockingIOError:
+                await asyncio.sleep(0.001)
+
+class Socket(socket.socket):
+    # MicroPython的socket是流对象，带readinto/write
+    def readinto(self, buf):
+        return self.recv_into(buf)
+
+    def write(self, buf):
+        return self.send(buf)
+
+HEAP_SIZE = 16 * 1024 * 1024  # 模拟用的堆大小，CPython对象比MicroPython大得多
+
+def mem_alloc():
+    import tracemalloc
+    return tracemalloc.get_traced_memory()[0]
+
+def mem_free():
+    return max(0, HEAP_SIZE - mem_alloc())
+
+def install(trace_heap=False):
+    # trace_heap=True时用tracemalloc模拟gc.mem_alloc/mem_free，数值是CPython对象的大小，只适合做相对比较；
+    # CPython靠引用计数随时释放，lib/memory.py按“已分配减少”统计的GC次数在PC上偏多
+    if trace_heap:
+        import tracemalloc
+        tracemalloc.start()
+        gc.mem_alloc = mem_alloc
+        gc.mem_free = mem_free
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_ms = sleep_ms
+    time.sleep_us = sleep_us
+    asyncio.sleep_ms = async_sleep_ms
+    asyncio.wait_for_ms = wait_for_ms
+    asyncio.ThreadSafeFlag = ThreadSafeFlag
+    asyncio.StreamReader = StreamReader
+    asyncio.StreamWriter = StreamWriter
+    socket.socket = Socket
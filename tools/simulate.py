@@ -0,0 +1,139 @@
+# 在PC上跑完整的main()对话循环：python3 tools/simulate.py [轮数] [--press 秒] [--clips] [--heap] [--record 文件]
+#                                [--legacy] [--uplink pcm|adpcm|ulaw] [--frame 字节] [--mic-rate Hz] [--play-rate Hz]
+#                                [--text [文字]]
+# machine/network/framebuf等模块用tools/sim里的替身，本地起一个bee服务端回复TTS音频，
+# 按一次键后连续对话，服务端在最后一轮回EXIT_CHAT，回到空闲界面后结束并打印每轮的时间统计；
+# --press给出第二次按键的时刻（录音中提前结束录音，等待或播放中取消回复）；
+# --clips时服务端轮流使用几条固定回复并通过TOKEN_CLIP让设备使用本地缓存；
+# --record把会话连同数据录制到文件（main.py的SESSION_FILE），可用tools/session.py回放，结束后逐帧检查一遍；
+# --legacy模拟不应答能力声明的老服务端，--uplink等指定服务端在协商中的选择；
+# --text让服务端在音频之前流式发送回复文字（TOKEN_TEXT），报告里加上eof到第一段文字的时间
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools', 'sim'))
+os.chdir(ROOT)
+
+import upy
+upy.install(trace_heap='--heap' in sys.argv)
+
+import audio
+import machine
+from server import BeeServer
+from lib.protocol import Frame, Request
+from lib.session import read, CONNECT
+
+import main
+
+BUTTON_PIN = 9
+
+REPLIES = (('greeting', 1200), ('answer', 1500), ('sorry', 900))
+TEXT = "Sure. Here is a short answer streamed from the model while the speech is still being synthesized."
+UPLINKS = {'pcm': Request.PCM_FORMAT, 'adpcm': Request.ADPCM_FORMAT, 'ulaw': Request.ULAW_FORMAT}
+
+def run(turns=3, speech_s=2.0, tts_ms=1500, pace=2, think_ms=200, second_press_s=None, clips=False, record=None,
+        hello=True, prefer=None, via=None, text=None):
+    # via(server)返回设备实际连接的(host, port)，用于在中间插入限速代理；返回(server, 耗时秒数)
+    server = BeeServer(tts_ms=tts_ms, pace=pace, think_ms=think_ms, exit_after=turns + 1,
+                       replies=REPLIES if clips else None, clips=clips, hello=hello, prefer=prefer,
+                       text=text).start()
+    main.Connection.HOST, main.Connection.PORT = via(server) if via else (server.host, server.port)
+    machine.I2S.sessions.clear()
+    tmp = tempfile.mkdtemp()
+    main.CLIP_CACHE_DIR = os.path.join(tmp, 'clips')
+    main.WIFI_CACHE_FILE = os.path.join(tmp, 'wifi.json')
+    if record:
+        main.SESSION_FILE = record
+        main.SESSION_PAYLOAD = True
+        main.SESSION_MAX_BYTES = 64 * 1024 * 1024
+    machine.I2S.rx_source = audio.speech(speech_s)
+
+    # 开始对话后再回到空闲界面时退出main()
+    started = threading.Event()
+    show = main.Oled.show
+    def watch(self, text, x=0, y=0):
+        if text == "RECORDING...":
+            started.set()
+        elif text == "BUTTON WAKEUP..." and started.is_set():
+            raise SystemExit
+        show(self, text, x, y)
+    main.Oled.show = watch
+
+    threading.Timer(0.3, machine.Pin.press, [BUTTON_PIN]).start()
+    if second_press_s:
+        threading.Timer(0.3 + second_press_s, machine.Pin.press, [BUTTON_PIN]).start()
+    begin = time.monotonic()
+    try:
+        main.main()
+    except SystemExit:
+        pass
+    finally:
+        main.Oled.show = show
+    elapsed = time.monotonic() - begin
+    server.stop()
+    return server, elapsed
+
+def report(server, elapsed):
+    mics = [i2s for i2s in machine.I2S.sessions if i2s.mode == machine.I2S.RX]
+    speakers = [i2s for i2s in machine.I2S.sessions if i2s.mode == machine.I2S.TX]
+    print(f"\n{len(server.turns)} turns in {elapsed:.2f}s, connections {server.connections}, keepalives {server.keepalives}")
+    print(f"{'turn':>4} {'clip':>4} {'uplink':>8} {'frames':>6} {'speech->eof':>11} {'eof->play':>9} {'underruns':>9} {'gap':>7} {'dropped':>7}"
+          f" {'eof->text':>9}")
+    for i, turn in enumerate(server.turns):
+        mic = mics[i] if i < len(mics) else None
+        speaker = speakers[i] if i < len(speakers) else None
+        speech_eof = (turn['eof'] - mic.start) * 1000 if mic else 0
+        line = f"{i + 1:>4} {turn.get('clip', '-'):>4} {turn['uplink_bytes']:>8} {turn['uplink_frames']:>6} {speech_eof:>9.0f}ms"
+        if speaker and speaker.first_write and 'exit' not in turn:
+            line += (f" {(speaker.first_write - turn['eof']) * 1000:>7.0f}ms {speaker.underruns:>9}"
+                     f" {speaker.gap_s * 1000:>5.0f}ms")
+        else:
+            line += f" {'exit':>9} {'-':>9} {'-':>7}"
+        line += f" {mic.dropped if mic else 0:>7}"
+        line += f" {(turn['first_token'] - turn['eof']) * 1000:>7.0f}ms" if 'first_token' in turn else f" {'-':>9}"
+        print(line)
+
+def check_recording(path):
+    # 录制文件要能逐帧解析，保存的数据长度和帧头一致，否则tools/session.py回放会错位
+    frame = Frame()
+    n = 0
+    with open(path, 'rb') as f:
+        for direction, t, header, data in read(f):
+            if direction == CONNECT:
+                continue
+            frame.unpack(header)
+            if data is not None and len(data) != frame.length:
+                raise ValueError(f"record {n}: {len(data)} bytes saved for a {frame.length}-byte frame")
+            n += 1
+    print(f"recording: {n} frames ok")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('turns', type=int, nargs='?', default=3)
+    parser.add_argument('--press', type=float, help='第二次按键距第一次的秒数')
+    parser.add_argument('--clips', action='store_true')
+    parser.add_argument('--heap', action='store_true', help='用tracemalloc统计堆分配（在导入main之前生效）')
+    parser.add_argument('--record', help='会话录制文件')
+    parser.add_argument('--legacy', action='store_true', help='服务端不应答能力声明')
+    parser.add_argument('--uplink', choices=UPLINKS)
+    parser.add_argument('--frame', type=int)
+    parser.add_argument('--mic-rate', type=int)
+    parser.add_argument('--play-rate', type=int)
+    parser.add_argument('--text', nargs='?', const=TEXT, help='服务端流式发送的回复文字')
+    args = parser.parse_args()
+    prefer = {}
+    if args.uplink:
+        prefer['uplink'] = UPLINKS[args.uplink]
+    for key in ('frame', 'mic_rate', 'play_rate'):
+        if getattr(args, key):
+            prefer[key] = getattr(args, key)
+    report(*run(args.turns, second_press_s=args.press, clips=args.clips, record=args.record, hello=not args.legacy,
+                prefer=prefer, text=args.text))
+    if args.record:
+        check_recording(args.record)
@@ -0,0 +1,105 @@
+# 延迟跟踪统计（在PC上运行）：python3 tools/trace_hist.py trace.bin|串口日志.txt ...
+# 输入为设备写出的二进制记录文件（main.py的TRACE_FILE），或包含"trace ..."摘要行的串口日志
+# 对每个阶段的耗时输出分位数和直方图
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lib.trace import STAGES, is_record, record_size, unpack, parse
+
+# (名称, 起点, 终点)
+INTERVALS = (
+    ('connect', 'press', 'conn'),
+    ('mic start', 'conn', 'mic'),
+    ('speech', 'mic', 'eof'),
+    ('server', 'eof', 'resp'),
+    ('eof->token', 'eof', 'token'),
+    ('eof->audio', 'eof', 'audio'),
+    ('token->audio', 'token', 'audio'),
+    ('buffering', 'resp', 'play'),
+    ('eof->play', 'eof', 'play'),
+    ('playback', 'play', 'drain'),
+    ('turn', 'press', 'drain'),
+)
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+BAR = 40
+
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if is_record(data):
+        records = []
+        i = 0
+        while is_record(data, i):
+            records.append(unpack(data, i))
+            i += record_size(data, i)
+        return records
+    records = []
+    for line in data.decode('utf-8', 'replace').splitlines():
+        record = parse(line)
+        if record:
+            records.append(record)
+    return records
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def histogram(name, values):
+    print(f"\n{name}: n={len(values)} p50 {percentile(values, 50):.1f}ms p90 {percentile(values, 90):.1f}ms "
+          f"p99 {percentile(values, 99):.1f}ms max {max(values):.1f}ms")
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for v in values:
+        i = 0
+        while i < len(BUCKETS_MS) and v >= BUCKETS_MS[i]:
+            i += 1
+        counts[i] += 1
+    top = max(counts)
+    low = 0
+    for i, count in enumerate(counts):
+        high = BUCKETS_MS[i] if i < len(BUCKETS_MS) else None
+        if count:
+            label = f"{low}-{high}ms" if high else f">={low}ms"
+            print(f"  {label:>13} {count:>5} {'#' * max(1, count * BAR // top)}")
+        low = high
+
+def main():
+    if len(sys.argv) < 2:
+        print(f"usage: {sys.argv[0]} trace.bin|log.txt ...")
+        return
+    records = []
+    for path in sys.argv[1:]:
+        records.extend(load(path))
+    if not records:
+        print('no trace records')
+        return
+
+    results = {}
+    for record in records:
+        results[record['result']] = results.get(record['result'], 0) + 1
+    print(f"{len(records)} turns: " + ', '.join(f"{k} {v}" for k, v in sorted(results.items())))
+
+    for name, begin, end in INTERVALS:
+        values = []
+        for record in records:
+            points = record['points']
+            # 连续对话的轮次没有按键时刻，以本轮开始（0）为起点
+            a = points.get(begin)
+            if a is None and begin == 'press':
+                a = 0.0
+            b = points.get(end)
+            if a is not None and b is not None:
+                values.append(b - a)
+        if values:
+            histogram(name, values)
+
+    print()
+    for stage in STAGES:
+        total = sum(record['bytes'].get(stage, 0) for record in records)
+        chunks = sum(record['chunks'].get(stage, 0) for record in records)
+        print(f"{stage:>5}: {total / len(records):9.0f} bytes/turn  {chunks / len(records):6.1f} chunks/turn  "
+              f"{total / max(chunks, 1):7.0f} bytes/chunk")
+
+if __name__ == '__main__':
+    main()